@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# Compara memoria e vazao do cleaner lendo o csv inteiro (whole) e em blocos (stream).
+# Cada modo roda em um processo separado para o pico de RSS nao se misturar.
+#
+#   python benchmarks/bench_cleaner_streaming.py --rows 500000 --extra-columns 120
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src/shared/python'))
+sys.path.insert(0, os.path.join(ROOT, 'src/lambda/cleaner'))
+
+
+def generate_health_csv(path, rows, extra_columns):
+    from datalake_common.schemas import HEALTH_AUTO_EXPORT
+
+    # O export real tem mais de uma centena de metricas, o cleaner so usa 9
+    columns = HEALTH_AUTO_EXPORT.source_columns + [f'Extra Metric {i} (count)' for i in range(extra_columns)]
+    start = datetime(2015, 1, 1)
+
+    with open(path, 'w') as file:
+        file.write(','.join(columns) + '\n')
+        for i in range(rows):
+            date = (start + timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S')
+            values = [f'{random.uniform(0, 10000):.3f}' for _ in range(len(columns) - 1)]
+            file.write(date + ',' + ','.join(values) + '\n')
+
+
+def run_mode(mode, source_path, destination):
+    import cleaner
+
+    started = time.perf_counter()
+    rows = cleaner.process_health_data(source_path, destination, streaming=(mode == 'stream'))['rows']
+    elapsed = time.perf_counter() - started
+
+    # ru_maxrss em KB no linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'mode': mode, 'rows': rows, 'seconds': elapsed, 'peak_rss_mb': peak_rss_mb}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--extra-columns', type=int, default=120)
+    parser.add_argument('--chunk-rows', type=int, default=250000)
+    parser.add_argument('--run-mode')
+    parser.add_argument('--source')
+    parser.add_argument('--destination')
+    args = parser.parse_args()
+
+    if args.run_mode:
+        return run_mode(args.run_mode, args.source, args.destination)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        source_path = os.path.join(workdir, 'HealthAutoExport-bench.csv')
+        generate_health_csv(source_path, args.rows, args.extra_columns)
+        size_mb = os.path.getsize(source_path) / 1024 / 1024
+        print(f'csv: {args.rows} linhas, {size_mb:.1f} MB')
+
+        # append isola a comparacao no caminho de leitura. Os valores aleatorios
+        # nao passam nas regras de qualidade, entao elas ficam desligadas aqui
+        env = dict(os.environ, STREAMING_CHUNK_ROWS=str(args.chunk_rows), CLEANER_WRITE_MODE='append',
+                   CLEANER_QUALITY_CHECKS='false')
+        for mode in ('whole', 'stream'):
+            destination = os.path.join(workdir, f'cleaned-{mode}')
+            output = subprocess.run(
+                [sys.executable, __file__, '--run-mode', mode, '--source', source_path, '--destination', destination],
+                env=env, check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:>6}: {result['seconds']:.2f} s, "
+                  f"{result['rows'] / result['seconds']:,.0f} linhas/s, "
+                  f"{size_mb / result['seconds']:.1f} MB/s, "
+                  f"pico RSS {result['peak_rss_mb']:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
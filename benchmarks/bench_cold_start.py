@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# Mede o cold start do cleaner: tempo de import do modulo e da primeira chamada
+# de process_dataset, cada repeticao em um processo python novo (como uma
+# instancia nova da lambda).
+#
+#   legacy: pacote com awswrangler, importado junto com o modulo
+#   optimized: pacote so com pyarrow/pandas/boto3 (CLEANER_IO=arrow)
+#
+#   python benchmarks/bench_cold_start.py --repeats 10
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+PACKAGES = ['legacy', 'optimized']
+
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+import cleaner
+if sys.argv[1] == 'legacy':
+    cleaner.wrangler()
+imported = time.perf_counter()
+cleaner.process_dataset(sys.argv[2], sys.argv[3], cleaner.SCHEMAS[cleaner.get_dataset(sys.argv[2])])
+finished = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - started,
+    "first_call_seconds": finished - imported,
+    "modules": len(sys.modules),
+    "awswrangler": "awswrangler" in sys.modules
+}))
+'''
+
+
+def run_child(package, source_path, destination):
+    env = dict(os.environ, CLEANER_IO='wrangler' if package == 'legacy' else 'arrow',
+               PYTHONPATH=os.pathsep.join([os.path.join(ROOT, 'src/shared/python'),
+                                           os.path.join(ROOT, 'src/lambda/cleaner')]))
+    output = subprocess.run([sys.executable, '-c', CHILD, package, source_path, destination],
+                            env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output-json')
+    args = parser.parse_args()
+
+    import generate_data
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        files = generate_data.generate(os.path.join(workdir, 'raw'), days=1, health_rows_per_day=24)
+        source_path = next(path for path, _ in files if 'HealthAutoExport' in path)
+
+        for package in PACKAGES:
+            runs = [
+                run_child(package, source_path, os.path.join(workdir, f'{package}-{repeat}'))
+                for repeat in range(args.repeats)
+            ]
+            result = {
+                'package': package,
+                'import_seconds': statistics.median(run['import_seconds'] for run in runs),
+                'first_call_seconds': statistics.median(run['first_call_seconds'] for run in runs),
+                'modules': runs[0]['modules'],
+                'awswrangler': runs[0]['awswrangler']
+            }
+            results.append(result)
+            print(f"{package:>9}: import {result['import_seconds']:.3f} s, "
+                  f"primeira chamada {result['first_call_seconds']:.3f} s, "
+                  f"{result['modules']} modulos carregados")
+
+    if args.output_json:
+        with open(args.output_json, 'w') as file:
+            json.dump({'args': vars(args), 'results': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# Compara o layout legacy e o tuned dos parquet gravados pelo cleaner: tamanho
+# dos arquivos, row groups que um filtro de uma hora precisa ler (pelo min/max
+# das estatisticas) e tempo de leitura no Spark local com o schema do process.
+# O cleaner roda no s3 do moto com o awswrangler, como a lambda, e os arquivos
+# sao baixados para o Spark ler do disco.
+#
+#   python benchmarks/bench_parquet_layout.py --days 30 --health-rows-per-day 1440 --repeats 5
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for source_dir in ['src/shared/python', 'src/lambda/cleaner', 'benchmarks']:
+    sys.path.insert(0, os.path.join(ROOT, source_dir))
+
+import generate_data
+
+LAYOUTS = ['legacy', 'tuned']
+START = date(2025, 1, 1)
+
+
+def clean(layout, files, s3_client, output):
+    import cleaner
+
+    cleaner.PARQUET_LAYOUT = layout
+    cleaner.IO_BACKEND = 'wrangler'
+    bucket = f'benchmark-cleaned-{layout}'
+    s3_client.create_bucket(Bucket=bucket)
+    for path, _ in files:
+        cleaner.process_dataset(path, f's3://{bucket}', cleaner.SCHEMAS[cleaner.get_dataset(path)])
+
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket):
+        for item in page.get('Contents', []):
+            path = os.path.join(output, item['Key'])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            s3_client.download_file(bucket, item['Key'], path)
+
+
+def parquet_files(path):
+    return sorted(
+        os.path.join(directory, name)
+        for directory, _, names in os.walk(path) for name in names if name.endswith('.parquet')
+    )
+
+
+def row_groups_read(path, column, start, end):
+    # Row groups que o leitor nao consegue descartar pelo min/max da coluna
+    import pyarrow.parquet as pq
+
+    total, read = 0, 0
+    for file in parquet_files(path):
+        metadata = pq.ParquetFile(file).metadata
+        index = metadata.schema.to_arrow_schema().get_field_index(column)
+        for group in range(metadata.num_row_groups):
+            stats = metadata.row_group(group).column(index).statistics
+            total += 1
+            if stats is None or not stats.has_min_max or (stats.min < end and stats.max >= start):
+                read += 1
+    return total, read
+
+
+def float32_saving(path, workdir):
+    # Referencia: os mesmos arquivos regravados com as metricas em float64 e em
+    # float32 pelo mesmo writer (so tamanho, o DoubleType do process nao le float32)
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sizes = {'float64': 0, 'float32': 0}
+    for index, file in enumerate(parquet_files(path)):
+        table = pq.read_table(file).replace_schema_metadata(None)
+        float32 = pa.schema([
+            field.with_type(pa.float32()) if field.type == pa.float64() else field for field in table.schema
+        ])
+        for name, version in (('float64', table), ('float32', table.cast(float32))):
+            target = os.path.join(workdir, f'{name}-{index}.parquet')
+            pq.write_table(version, target, compression='zstd', coerce_timestamps='ms', allow_truncated_timestamps=True)
+            sizes[name] += os.path.getsize(target)
+    return 1 - sizes['float32'] / sizes['float64']
+
+
+def timed(action, repeats):
+    runs = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        action()
+        runs.append(time.perf_counter() - started)
+    return statistics.median(runs)
+
+
+def spark_scans(spark, path, schema, window):
+    from pyspark.sql import functions as F
+
+    metrics = [column.normalized for column in schema.columns if column.dtype == 'double']
+
+    def full_scan():
+        spark.read.schema(schema.spark_read_schema()).parquet(path) \
+            .agg(*[F.avg(column) for column in metrics]).collect()
+
+    def window_scan():
+        spark.read.schema(schema.spark_read_schema()).parquet(path) \
+            .where(F.col(schema.date_column).between(*window)).agg(F.count('*')).collect()
+
+    return full_scan, window_scan
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--health-rows-per-day', type=int, default=1440)
+    parser.add_argument('--workouts-per-day', type=int, default=2)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output-json')
+    args = parser.parse_args()
+
+    import boto3
+    from moto import mock_aws
+    from pyspark.sql import SparkSession
+
+    from datalake_common.schemas import SCHEMAS
+
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+
+    # Uma hora no meio do periodo, sem filtro nas colunas de particao
+    middle = datetime.combine(START + timedelta(days=args.days // 2), datetime.min.time()) + timedelta(hours=10)
+    window = (middle, middle + timedelta(hours=1) - timedelta(seconds=1))
+
+    spark = SparkSession.builder.master('local[*]').appName('ParquetLayoutBenchmark') \
+        .config('spark.ui.showConsoleProgress', 'false').getOrCreate()
+    spark.sparkContext.setLogLevel('ERROR')
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir, mock_aws():
+        s3_client = boto3.client('s3')
+        s3_client.create_bucket(Bucket='benchmark-raw')
+        files = generate_data.generate('s3://benchmark-raw/', args.days, START,
+                                       health_rows_per_day=args.health_rows_per_day,
+                                       workouts_per_day=args.workouts_per_day, s3_client=s3_client)
+
+        for layout in LAYOUTS:
+            clean(layout, files, s3_client, os.path.join(workdir, layout))
+
+        scans = {
+            (layout, name): spark_scans(spark, os.path.join(workdir, layout, name), schema, window)
+            for layout in LAYOUTS for name, schema in SCHEMAS.items()
+        }
+        # Aquecimento da JVM antes das medicoes, senao o primeiro layout sai mais lento
+        for scan in scans.values():
+            for action in scan:
+                action()
+
+        for (layout, name), (full_scan, window_scan) in scans.items():
+            path = os.path.join(workdir, layout, name)
+            row_groups, read = row_groups_read(path, SCHEMAS[name].date_column, *window)
+            result = {
+                'layout': layout,
+                'dataset': name,
+                'files': len(parquet_files(path)),
+                'bytes': sum(os.path.getsize(file) for file in parquet_files(path)),
+                'row_groups': row_groups,
+                'row_groups_read': read,
+                'full_scan_seconds': timed(full_scan, args.repeats),
+                'window_scan_seconds': timed(window_scan, args.repeats)
+            }
+            if layout == 'tuned':
+                result['float32_saving'] = float32_saving(path, workdir)
+            results.append(result)
+            print(f"{layout:>6} {name:>16}: {result['bytes'] / 1024:,.0f} KiB, "
+                  f"row groups lidos {read}/{row_groups}, "
+                  f"scan {result['full_scan_seconds'] * 1000:.0f} ms, "
+                  f"janela de 1h {result['window_scan_seconds'] * 1000:.0f} ms" +
+                  (f", float32 -{result['float32_saving']:.1%}" if 'float32_saving' in result else ''))
+
+    spark.stop()
+
+    if args.output_json:
+        with open(args.output_json, 'w') as file:
+            json.dump({'args': vars(args), 'results': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
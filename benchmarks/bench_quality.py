@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# Mede o custo das regras de qualidade do cleaner (datalake_common.quality) sobre
+# um frame ja limpo, comparado com a limpeza do mesmo frame sem as regras.
+#
+#   python benchmarks/bench_quality.py --rows 1000000 --bad-fraction 0.01
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src/shared/python'))
+sys.path.insert(0, os.path.join(ROOT, 'src/lambda/cleaner'))
+
+
+def health_frame(rows, bad_fraction, seed=42):
+    from datalake_common.schemas import HEALTH_AUTO_EXPORT
+
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Date': pd.date_range('2015-01-01', periods=rows, freq='min').strftime('%Y-%m-%d %H:%M:%S'),
+        'Dietary Energy (kJ)': rng.uniform(0, 500, rows),
+        'Resting Energy (kJ)': rng.uniform(0, 300, rows),
+        'Active Energy (kJ)': rng.uniform(0, 200, rows),
+        'Heart Rate [Max] (bpm)': rng.uniform(60, 190, rows),
+        'Heart Rate [Min] (bpm)': rng.uniform(45, 70, rows),
+        'Walking + Running Distance (km)': rng.uniform(0, 1, rows),
+        'Walking Speed (km/hr)': rng.uniform(3, 6, rows),
+        'Apple Stand Hour (hours)': rng.uniform(0, 1, rows)
+    })
+    # Batimentos impossiveis em uma fracao das linhas
+    bad = rng.random(rows) < bad_fraction
+    df.loc[bad, 'Heart Rate [Max] (bpm)'] = 400.0
+    return df[HEALTH_AUTO_EXPORT.source_columns]
+
+
+def timed(function, repeats):
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--bad-fraction', type=float, default=0.01)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    import cleaner
+    from datalake_common.quality import split_quality
+    from datalake_common.schemas import HEALTH_AUTO_EXPORT
+
+    raw = health_frame(args.rows, args.bad_fraction)
+
+    def clean():
+        df = cleaner.clean_column_names(raw.copy(), HEALTH_AUTO_EXPORT)
+        return cleaner.add_partition_columns(df, HEALTH_AUTO_EXPORT.date_column)
+
+    df = clean()
+    clean_seconds = timed(clean, args.repeats)
+    quality_seconds = timed(lambda: split_quality(df, HEALTH_AUTO_EXPORT.rules), args.repeats)
+    _, quarantine, _ = split_quality(df, HEALTH_AUTO_EXPORT.rules)
+
+    per_million = 1000000 / args.rows
+    print(f'{args.rows} linhas, {len(HEALTH_AUTO_EXPORT.rules)} regras, {len(quarantine)} em quarentena')
+    print(f'limpeza: {clean_seconds * per_million * 1000:.0f} ms por milhao de linhas')
+    print(f'regras:  {quality_seconds * per_million * 1000:.0f} ms por milhao de linhas '
+          f'({quality_seconds / clean_seconds:.1%} da limpeza)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# Gera arquivos sinteticos no formato do Health Auto Export (HealthAutoExport-*.csv
+# e Workouts-*.csv), um par por dia e por usuario, em um diretorio local ou no S3.
+#
+#   python benchmarks/generate_data.py --days 30 --users 2 --output /tmp/raw
+#   python benchmarks/generate_data.py --days 30 --output s3://bucket/raw/
+import argparse
+import io
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src/shared/python'))
+
+from datalake_common.schemas import HEALTH_AUTO_EXPORT, WORKOUTS
+
+# Outras metricas do export real que o cleaner descarta
+HEALTH_EXTRA_COLUMNS = [
+    'Active Energy Burned (kJ)',
+    'Blood Oxygen Saturation (%)',
+    'Environmental Audio Exposure (dBASPL)',
+    'Flights Climbed (count)',
+    'Headphone Audio Exposure (dBASPL)',
+    'Heart Rate [Avg] (bpm)',
+    'Heart Rate Variability (ms)',
+    'Physical Effort (kcal/hr·kg)',
+    'Resting Heart Rate (bpm)',
+    'Respiratory Rate (count/min)',
+    'Sleep Analysis [Asleep] (hr)',
+    'Sleep Analysis [In Bed] (hr)',
+    'Step Count (count)',
+    'Time in Daylight (min)',
+    'Walking Asymmetry Percentage (%)',
+    'Walking Double Support Percentage (%)',
+    'Walking Heart Rate Average (bpm)',
+    'Walking Step Length (cm)'
+]
+
+WORKOUT_EXTRA_COLUMNS = ['End', 'Elevation Ascended (m)', 'Flights Climbed (count)', 'Swim Stroke Count (count)']
+
+WORKOUT_TYPES = {
+    # tipo: (kcal por minuto, passos por minuto, km por minuto)
+    'Running': (11.0, 160, 0.17),
+    'Walking': (4.5, 110, 0.09),
+    'Cycling': (8.0, 0, 0.4),
+    'Traditional Strength Training': (6.0, 10, 0.0),
+    'Swimming': (9.0, 0, 0.04),
+    'Yoga': (3.0, 5, 0.0)
+}
+
+
+def health_header(extra_columns=0):
+    return HEALTH_AUTO_EXPORT.source_columns + HEALTH_EXTRA_COLUMNS + [
+        f'Extra Metric {index} (count)' for index in range(extra_columns)
+    ]
+
+
+def health_row(rng, timestamp, rows_per_day, extra_values):
+    # Valores diarios divididos pela granularidade (1 linha = dia, 1440 = minuto)
+    scale = 1 / rows_per_day
+    heart_min = rng.uniform(45, 70)
+    values = [
+        timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+        f'{rng.uniform(6000, 11000) * scale:.3f}',
+        f'{rng.uniform(6500, 7500) * scale:.3f}',
+        f'{rng.uniform(800, 4000) * scale:.3f}',
+        f'{rng.uniform(heart_min + 40, 190):.0f}',
+        f'{heart_min:.0f}',
+        f'{rng.uniform(1, 15) * scale:.3f}',
+        f'{rng.uniform(3.5, 6):.3f}',
+        f'{rng.randint(6, 16) * scale:.3f}'
+    ]
+    return values + [f'{rng.uniform(0, 100):.3f}' for _ in range(extra_values)]
+
+
+def write_health_csv(file, day, rows_per_day=1, extra_columns=0, rng=None, offset_seconds=0):
+    rng = rng or random.Random()
+    header = health_header(extra_columns)
+    extra_values = len(header) - len(HEALTH_AUTO_EXPORT.source_columns)
+    step = timedelta(days=1) / rows_per_day
+    start = datetime(day.year, day.month, day.day) + timedelta(seconds=offset_seconds)
+
+    file.write(','.join(header) + '\n')
+    for index in range(rows_per_day):
+        file.write(','.join(health_row(rng, start + step * index, rows_per_day, extra_values)) + '\n')
+
+    return rows_per_day
+
+
+def write_workouts_csv(file, day, workouts_per_day=2, rng=None):
+    rng = rng or random.Random()
+    header = WORKOUTS.source_columns + WORKOUT_EXTRA_COLUMNS
+
+    file.write(','.join(header) + '\n')
+    for _ in range(workouts_per_day):
+        workout_type = rng.choice(list(WORKOUT_TYPES))
+        kcal, steps, km = WORKOUT_TYPES[workout_type]
+        minutes = rng.randint(15, 90)
+        start = datetime(day.year, day.month, day.day, rng.randint(5, 21), rng.randint(0, 59), rng.randint(0, 59))
+        end = start + timedelta(minutes=minutes)
+
+        values = [
+            workout_type,
+            start.strftime('%Y-%m-%d %H:%M:%S'),
+            f'{minutes // 60:02d}:{minutes % 60:02d}:00',
+            f'{kcal * minutes * rng.uniform(0.8, 1.2):.3f}',
+            f'{rng.uniform(3, 12):.3f}',
+            f'{rng.uniform(140, 190):.0f}',
+            f'{rng.uniform(100, 150):.0f}',
+            f'{steps * minutes * rng.uniform(0.8, 1.2):.0f}',
+            f'{km * minutes * rng.uniform(0.8, 1.2):.3f}',
+            end.strftime('%Y-%m-%d %H:%M:%S'),
+            f'{rng.uniform(0, 200):.1f}',
+            f'{rng.randint(0, 30)}',
+            '0'
+        ]
+        file.write(','.join(values) + '\n')
+
+    return workouts_per_day
+
+
+def health_file_name(day):
+    return f'HealthAutoExport-{day:%Y-%m-%d}-{day:%Y-%m-%d}.csv'
+
+
+def workouts_file_name(day):
+    return f'Workouts-{day:%Y%m%d}_000000-{day:%Y%m%d}_235959.csv'
+
+
+def put_file(output, key, body, s3_client=None):
+    if output.startswith('s3://'):
+        bucket, _, prefix = output[len('s3://'):].partition('/')
+        s3_client.put_object(Bucket=bucket, Key=f'{prefix}{key}', Body=body.encode('utf-8'))
+        return f's3://{bucket}/{prefix}{key}'
+
+    path = os.path.join(output, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as file:
+        file.write(body)
+    return path
+
+
+def generate(output, days=7, start=date(2025, 1, 1), users=1, health_rows_per_day=1,
+             workouts_per_day=2, extra_columns=0, seed=42, s3_client=None):
+    # Retorna os caminhos gerados com a quantidade de linhas de cada arquivo
+    if output.startswith('s3://') and s3_client is None:
+        import boto3
+        s3_client = boto3.client('s3')
+
+    rng = random.Random(seed)
+    files = []
+    for user in range(users):
+        user_prefix = f'user-{user:03d}/' if users > 1 else ''
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+
+            body = io.StringIO()
+            # O lake nao tem coluna de usuario, o deslocamento evita que o upsert
+            # do cleaner trate linhas de usuarios diferentes como duplicadas
+            rows = write_health_csv(body, day, health_rows_per_day, extra_columns, rng, offset_seconds=user)
+            files.append((put_file(output, user_prefix + health_file_name(day), body.getvalue(), s3_client), rows))
+
+            body = io.StringIO()
+            rows = write_workouts_csv(body, day, workouts_per_day, rng)
+            files.append((put_file(output, user_prefix + workouts_file_name(day), body.getvalue(), s3_client), rows))
+
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', required=True, help='diretorio local ou s3://bucket/prefixo/')
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--start', type=date.fromisoformat, default=date(2025, 1, 1))
+    parser.add_argument('--users', type=int, default=1)
+    parser.add_argument('--health-rows-per-day', type=int, default=1)
+    parser.add_argument('--workouts-per-day', type=int, default=2)
+    parser.add_argument('--extra-columns', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    files = generate(args.output, args.days, args.start, args.users, args.health_rows_per_day,
+                     args.workouts_per_day, args.extra_columns, args.seed)
+
+    print(f'{len(files)} arquivos, {sum(rows for _, rows in files)} linhas em {args.output}')
+
+
+if __name__ == '__main__':
+    main()
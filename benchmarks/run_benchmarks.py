@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# Roda as transformacoes do cleaner e do process.py sobre dados sinteticos e
+# registra linhas/s, pico de RSS e quantidade de arquivos gerados por etapa.
+#
+#   python benchmarks/run_benchmarks.py --days 90 --health-rows-per-day 1440 --output-json bench.json
+#   python benchmarks/run_benchmarks.py --backend moto --days 30
+#   python benchmarks/run_benchmarks.py --baseline bench.json --max-regression 0.2
+#
+# A etapa do process.py roda com Spark local e so no backend local (precisa de
+# pyspark e de um JAVA_HOME valido); sem pyspark ela e ignorada.
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for source_dir in ['src/shared/python', 'src/lambda/cleaner', 'src/lambda/process_light', 'src/glue_job', 'benchmarks']:
+    sys.path.insert(0, os.path.join(ROOT, source_dir))
+
+import generate_data
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+def process_tree_rss(pid):
+    # RSS do processo e dos filhos (a JVM do Spark e filha do python)
+    children = {}
+    for stat_path in glob.glob('/proc/[0-9]*/stat'):
+        try:
+            with open(stat_path) as file:
+                fields = file.read().rsplit(')', 1)[1].split()
+            children.setdefault(int(fields[1]), []).append(int(stat_path.split('/')[2]))
+        except (OSError, IndexError):
+            continue
+
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/statm') as file:
+                total += int(file.read().split()[1]) * PAGE_SIZE
+        except OSError:
+            pass
+        pending += children.get(current, [])
+    return total
+
+
+@contextmanager
+def measure(stage, results):
+    peak = {'rss': process_tree_rss(os.getpid())}
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.05):
+            peak['rss'] = max(peak['rss'], process_tree_rss(os.getpid()))
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    result = {'stage': stage}
+    started = time.perf_counter()
+    try:
+        yield result
+    finally:
+        done.set()
+        sampler.join()
+        result['seconds'] = time.perf_counter() - started
+        result['peak_rss_mb'] = peak['rss'] / 1024 / 1024
+        if result.get('rows'):
+            result['rows_per_second'] = result['rows'] / result['seconds']
+        results.append(result)
+
+
+def count_files(path, s3_client=None):
+    if path.startswith('s3://'):
+        bucket, _, prefix = path[len('s3://'):].partition('/')
+        paginator = s3_client.get_paginator('list_objects_v2')
+        return sum(
+            1 for page in paginator.paginate(Bucket=bucket, Prefix=prefix)
+            for item in page.get('Contents', []) if item['Key'].endswith('.parquet')
+        )
+    return len(glob.glob(os.path.join(path, '**', '*.parquet'), recursive=True))
+
+
+def run_cleaner(files, cleaned_path, results, s3_client=None):
+    import cleaner
+
+    with measure('cleaner', results) as result:
+        rows = 0
+        for path, _ in files:
+            dataset = cleaner.get_dataset(path)
+            rows += cleaner.process_dataset(path, cleaned_path, cleaner.SCHEMAS[dataset])['rows']
+
+        result['rows'] = rows
+        result['output_files'] = count_files(cleaned_path, s3_client)
+
+
+def run_process(cleaned_path, curated_path, start_date, end_date, results):
+    try:
+        from pyspark.sql import SparkSession
+    except ImportError:
+        print('pyspark nao instalado, etapa process ignorada')
+        return
+
+    import process
+
+    # O startup do Spark entra na medicao, no glue ele tambem e pago a cada execucao
+    with measure('process', results) as result:
+        spark = SparkSession.builder.master('local[*]').appName('AppleHealthBenchmark') \
+            .config('spark.ui.showConsoleProgress', 'false').getOrCreate()
+        spark.sparkContext.setLogLevel('ERROR')
+
+        args = process.resolve_args(['--SOURCE_BUCKET', cleaned_path, '--DESTINATION_BUCKET', curated_path,
+                                     '--START_DATE', start_date, '--END_DATE', end_date])
+        process.run(spark, args)
+        result['rows'] = spark.read.parquet(f'{cleaned_path}/HealthAutoExport/').count() + \
+            spark.read.parquet(f'{cleaned_path}/Workouts/').count()
+        result['output_files'] = count_files(curated_path)
+
+    spark.stop()
+
+
+def run_process_light(cleaned_path, curated_path, start_date, end_date, results):
+    import process_light
+
+    with measure('light', results) as result:
+        result['rows'] = process_light.run(cleaned_path, curated_path, start_date, end_date)['rows']
+        result['output_files'] = count_files(curated_path)
+
+
+def run_local(args, results):
+    with tempfile.TemporaryDirectory() as workdir:
+        raw_path = os.path.join(workdir, 'raw')
+        cleaned_path = os.path.join(workdir, 'cleaned')
+
+        with measure('generate', results) as result:
+            files = generate_data.generate(raw_path, args.days, users=args.users,
+                                           health_rows_per_day=args.health_rows_per_day,
+                                           workouts_per_day=args.workouts_per_day,
+                                           extra_columns=args.extra_columns)
+            result['rows'] = sum(rows for _, rows in files)
+            result['output_files'] = len(files)
+
+        run_cleaner(files, cleaned_path, results)
+
+        # Mesmas transformacoes no engine leve (pandas/pyarrow) usado pela lambda
+        end_date = (date(2025, 1, 1) + timedelta(days=args.days - 1)).isoformat()
+        run_process_light(cleaned_path, os.path.join(workdir, 'curated-light'), '2025-01-01', end_date, results)
+
+        if not args.skip_process:
+            run_process(cleaned_path, os.path.join(workdir, 'curated'), '2025-01-01', end_date, results)
+
+
+def run_moto(args, results):
+    import boto3
+    from moto import mock_aws
+
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+
+    with mock_aws():
+        s3_client = boto3.client('s3')
+        for bucket in ('benchmark-raw', 'benchmark-cleaned'):
+            s3_client.create_bucket(Bucket=bucket)
+
+        with measure('generate', results) as result:
+            files = generate_data.generate('s3://benchmark-raw/', args.days, users=args.users,
+                                           health_rows_per_day=args.health_rows_per_day,
+                                           workouts_per_day=args.workouts_per_day,
+                                           extra_columns=args.extra_columns, s3_client=s3_client)
+            result['rows'] = sum(rows for _, rows in files)
+            result['output_files'] = len(files)
+
+        run_cleaner(files, 's3://benchmark-cleaned', results, s3_client)
+
+
+def check_regressions(results, baseline_path, max_regression):
+    with open(baseline_path) as file:
+        baseline = {result['stage']: result for result in json.load(file)['results']}
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['stage'])
+        if not previous or not previous.get('rows_per_second') or not result.get('rows_per_second'):
+            continue
+        if result['rows_per_second'] < previous['rows_per_second'] * (1 - max_regression):
+            regressions.append(
+                f"{result['stage']}: {result['rows_per_second']:,.0f} linhas/s contra "
+                f"{previous['rows_per_second']:,.0f} no baseline"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backend', choices=['local', 'moto'], default='local')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--users', type=int, default=1)
+    parser.add_argument('--health-rows-per-day', type=int, default=24)
+    parser.add_argument('--workouts-per-day', type=int, default=2)
+    parser.add_argument('--extra-columns', type=int, default=0)
+    parser.add_argument('--skip-process', action='store_true')
+    parser.add_argument('--output-json')
+    parser.add_argument('--baseline', help='json de uma execucao anterior para comparar')
+    parser.add_argument('--max-regression', type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = []
+    if args.backend == 'moto':
+        run_moto(args, results)
+    else:
+        run_local(args, results)
+
+    for result in results:
+        print(f"{result['stage']:>9}: {result['seconds']:7.2f} s, "
+              f"{result.get('rows_per_second', 0):>12,.0f} linhas/s, "
+              f"pico RSS {result['peak_rss_mb']:6.0f} MB, "
+              f"{result.get('output_files', 0)} arquivos")
+
+    if args.output_json:
+        with open(args.output_json, 'w') as file:
+            json.dump({'args': vars(args), 'results': results}, file, indent=2)
+
+    if args.baseline:
+        regressions = check_regressions(results, args.baseline, args.max_regression)
+        for regression in regressions:
+            print(f'REGRESSAO {regression}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Definicoes do datalake_common (tabelas do curated, schemas dos datasets) usadas
+# tambem pelas lambdas e pelo glue job: o app do cdk le do mesmo codigo em vez
+# de manter copias
+SHARED_PYTHON = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'shared', 'python')
+if SHARED_PYTHON not in sys.path:
+    sys.path.append(SHARED_PYTHON)
@@ -5,6 +5,24 @@ from aws_cdk import (
     aws_glue as _glue
 )
 
+# Tabelas do curated: colunas e tipos na ordem dos arquivos parquet, as mesmas
+# definicoes que o process usa para gravar. As particoes sao registradas pelo
+# process a cada execucao (usadas pelo Spark e pelo athena sem projecao), o
+# crawler fica so para mudancas de schema
+from datalake_common.transforms import CURATED_TABLES
+
+DATABASE_NAME = 'heath_data'
+
+PARTITION_KEYS = [('year', 'int'), ('month', 'int'), ('day', 'int')]
+
+# Intervalos da projecao de particoes do athena (particoes sem zero a esquerda,
+# como o Spark e o process_light gravam)
+PROJECTION_RANGES = {
+    'year': '2014,2099',
+    'month': '1,12',
+    'day': '1,31'
+}
+
 
 class DataCatalogs(Construct):
 
@@ -12,10 +30,15 @@ class DataCatalogs(Construct):
     def get_crawler_name(self):
         return self.crawler.name
 
+    @property
+    def get_database_name(self):
+        return DATABASE_NAME
+
     def __init__(self,
                  scope: Construct,
                  id: str,
                  curated_bucket: _s3.Bucket,
+                 partition_projection: bool = False,
                  **kwargs
                  ):
         super().__init__(scope, id, **kwargs)
@@ -29,15 +52,71 @@ class DataCatalogs(Construct):
                               _iam.ManagedPolicy.from_aws_managed_policy_name('AmazonS3FullAccess')]
         )
 
+        database = _glue.CfnDatabase(
+            self, 'curated-database',
+            catalog_id=curated_bucket.stack.account,
+            database_input=_glue.CfnDatabase.DatabaseInputProperty(name=DATABASE_NAME)
+        )
+
+        # Tabelas criadas uma vez no deploy, com o nome que o crawler dava (pasta em minusculo)
+        self.tables = {}
+        for table, columns in CURATED_TABLES.items():
+            location = f"s3://{curated_bucket.bucket_name}/{table}/"
+            parameters = {"classification": "parquet"}
+            if partition_projection:
+                parameters.update(self.projection_parameters(location))
+
+            self.tables[table] = _glue.CfnTable(
+                self, f'{table}-table',
+                catalog_id=curated_bucket.stack.account,
+                database_name=DATABASE_NAME,
+                table_input=_glue.CfnTable.TableInputProperty(
+                    name=table.lower(),
+                    table_type="EXTERNAL_TABLE",
+                    parameters=parameters,
+                    partition_keys=[_glue.CfnTable.ColumnProperty(name=name, type=dtype)
+                                    for name, dtype in PARTITION_KEYS],
+                    storage_descriptor=_glue.CfnTable.StorageDescriptorProperty(
+                        columns=[_glue.CfnTable.ColumnProperty(name=name, type=dtype) for name, dtype in columns],
+                        location=location,
+                        input_format="org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat",
+                        output_format="org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat",
+                        serde_info=_glue.CfnTable.SerdeInfoProperty(
+                            serialization_library="org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe"
+                        )
+                    )
+                )
+            )
+            self.tables[table].add_dependency(database)
+
+        # Crawler sobre as tabelas ja existentes, para atualizar o schema quando as
+        # colunas mudarem. Nao roda mais a cada execucao da step function
         self.crawler = _glue.CfnCrawler(
             self, 'curated-crawler',
             name=f'{self.stack_name}-curated-crawler',
             role=glue_role.role_arn,
-            database_name='heath_data',
             targets={
-                's3Targets': [
-                    {"path": f's3://{curated_bucket.bucket_name}/HealthData/'},
-                    {"path": f's3://{curated_bucket.bucket_name}/Workouts/'}
-                ]
-            }
+                'catalogTargets': [{
+                    'databaseName': DATABASE_NAME,
+                    'tables': [table.lower() for table in CURATED_TABLES]
+                }]
+            },
+            schema_change_policy=_glue.CfnCrawler.SchemaChangePolicyProperty(
+                update_behavior='UPDATE_IN_DATABASE',
+                delete_behavior='LOG'
+            ),
+            configuration='{"Version": 1.0, "CrawlerOutput": {"Partitions": {"AddOrUpdateBehavior": "InheritFromTable"}}}'
         )
+        for table in self.tables.values():
+            self.crawler.add_dependency(table)
+
+    def projection_parameters(self, location):
+        # Com a projecao o athena calcula as particoes pelos intervalos e pelo
+        # template do caminho: um dia gravado pelo process ja pode ser consultado,
+        # sem crawler e sem buscar as particoes no catalogo
+        parameters = {"projection.enabled": "true"}
+        for column, value_range in PROJECTION_RANGES.items():
+            parameters[f"projection.{column}.type"] = "integer"
+            parameters[f"projection.{column}.range"] = value_range
+        parameters["storage.location.template"] = f"{location}year=${{year}}/month=${{month}}/day=${{day}}/"
+        return parameters
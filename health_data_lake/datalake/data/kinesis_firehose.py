@@ -2,9 +2,32 @@ from constructs import Construct
 from aws_cdk import (
     aws_kinesisfirehose as _kinesis_firehose,
     aws_iam as _iam,
+    aws_glue as _glue,
+    aws_lambda as _lambda,
     aws_s3 as _s3
 )
 
+from datalake_common.schemas import HEALTH_AUTO_EXPORT
+
+# Dataset dos registros json recebidos pelo firehose
+INGEST_DATASET = HEALTH_AUTO_EXPORT.name
+
+# Colunas dos registros (nomes normalizados e tipos do schema), usadas na
+# conversao para parquet
+INGEST_COLUMNS = [(column.normalized, column.dtype) for column in HEALTH_AUTO_EXPORT.columns]
+
+# Particao pela data do evento (campo date "yyyy-MM-dd HH:mm:ss"), sem zero a
+# esquerda como as particoes gravadas pelo cleaner
+PARTITION_QUERY = '{year: (.date[0:4] | tonumber), month: (.date[5:7] | tonumber), day: (.date[8:10] | tonumber)}'
+
+# Conversao de formato e particionamento dinamico exigem buffer de pelo menos 64 MB
+MIN_BUFFER_SIZE_MB = 64
+
+# Buffer do firehose antes de cada invocacao da lambda de transformacao
+# (o payload sincrono da lambda e limitado a 6 MB)
+TRANSFORM_BUFFER_SIZE_MB = 1
+TRANSFORM_BUFFER_INTERVAL_SECONDS = 60
+
 
 class DatalakeDeliveryStream(Construct):
 
@@ -16,12 +39,28 @@ class DatalakeDeliveryStream(Construct):
                  scope: Construct,
                  id: str,
                  raw_bucket: _s3.Bucket,
+                 record_format: str = 'json',
+                 dynamic_partitioning: bool = False,
+                 compression: str = None,
+                 buffer_interval_seconds: int = 120,
+                 buffer_size_mb: int = None,
+                 transform_lambda: _lambda.Function = None,
                  **kwargs
                  ):
         super().__init__(scope, id, **kwargs)
 
         self.stack_name = scope.to_string()
 
+        if record_format not in ('json', 'parquet'):
+            raise ValueError(f'Formato {record_format} nao suportado, use json ou parquet')
+
+        convert_to_parquet = record_format == 'parquet'
+
+        if buffer_size_mb is None:
+            buffer_size_mb = 128 if convert_to_parquet or dynamic_partitioning else 2
+        if (convert_to_parquet or dynamic_partitioning) and buffer_size_mb < MIN_BUFFER_SIZE_MB:
+            raise ValueError(f'Parquet e particionamento dinamico exigem buffer de pelo menos {MIN_BUFFER_SIZE_MB} MB')
+
         kinesis_firehose_role = _iam.Role(
             self, 'kinesis-firehose-role',
             assumed_by=_iam.ServicePrincipal("firehose.amazonaws.com")
@@ -48,17 +87,190 @@ class DatalakeDeliveryStream(Construct):
             )]
         )
 
+        if transform_lambda is not None:
+            transform_policy = self.record_transformation(transform_lambda, kinesis_firehose_role,
+                                                          record_format, dynamic_partitioning)
+
+        if dynamic_partitioning:
+            # Com a lambda de transformacao as chaves vem nos metadados de cada registro
+            key_source = 'partitionKeyFromLambda' if transform_lambda is not None else 'partitionKeyFromQuery'
+            prefix = f"data/{INGEST_DATASET}/year=!{{{key_source}:year}}/" \
+                     f"month=!{{{key_source}:month}}/day=!{{{key_source}:day}}/"
+            error_output_prefix = "errors/!{firehose:error-output-type}/!{timestamp:yyyy/MM/dd}/"
+        else:
+            # Prefixo do dataset tambem sem particionamento: o cleaner roteia pelo
+            # nome do dataset na chave (o firehose acrescenta yyyy/MM/dd/HH/)
+            prefix = f"data/{INGEST_DATASET}/"
+            error_output_prefix = "errors/"
+
+        data_format_conversion = None
+        if convert_to_parquet:
+            data_format_conversion = self.parquet_conversion(raw_bucket, kinesis_firehose_role, compression)
+            # Com parquet a compressao fica no serializer e o objeto no s3 nao e comprimido de novo
+            compression_format = 'UNCOMPRESSED'
+        else:
+            compression_format = compression or 'UNCOMPRESSED'
+
+        processors = []
+        if transform_lambda is not None:
+            # A lambda ja entrega um json por linha e as chaves de particao
+            processors.append(_kinesis_firehose.CfnDeliveryStream.ProcessorProperty(
+                type="Lambda",
+                parameters=[
+                    _kinesis_firehose.CfnDeliveryStream.ProcessorParameterProperty(
+                        parameter_name="LambdaArn", parameter_value=transform_lambda.function_arn),
+                    _kinesis_firehose.CfnDeliveryStream.ProcessorParameterProperty(
+                        parameter_name="BufferSizeInMBs", parameter_value=str(TRANSFORM_BUFFER_SIZE_MB)),
+                    _kinesis_firehose.CfnDeliveryStream.ProcessorParameterProperty(
+                        parameter_name="BufferIntervalInSeconds", parameter_value=str(TRANSFORM_BUFFER_INTERVAL_SECONDS))
+                ]
+            ))
+        elif dynamic_partitioning:
+            processors.append(_kinesis_firehose.CfnDeliveryStream.ProcessorProperty(
+                type="MetadataExtraction",
+                parameters=[
+                    _kinesis_firehose.CfnDeliveryStream.ProcessorParameterProperty(
+                        parameter_name="MetadataExtractionQuery", parameter_value=PARTITION_QUERY),
+                    _kinesis_firehose.CfnDeliveryStream.ProcessorParameterProperty(
+                        parameter_name="JsonParsingEngine", parameter_value="JQ-1.6")
+                ]
+            ))
+            if not convert_to_parquet:
+                # Um registro por linha nos arquivos json
+                processors.append(_kinesis_firehose.CfnDeliveryStream.ProcessorProperty(
+                    type="AppendDelimiterToRecord",
+                    parameters=[_kinesis_firehose.CfnDeliveryStream.ProcessorParameterProperty(
+                        parameter_name="Delimiter", parameter_value="\\n")]
+                ))
+
+        processing_configuration = None
+        if processors:
+            processing_configuration = _kinesis_firehose.CfnDeliveryStream.ProcessingConfigurationProperty(
+                enabled=True,
+                processors=processors
+            )
+
         self._delivery_stream = _kinesis_firehose.CfnDeliveryStream(
             self, "IngestionDataStream",
             delivery_stream_name=f"{self.stack_name}-ingestion-data-stream",
             extended_s3_destination_configuration=_kinesis_firehose.CfnDeliveryStream.ExtendedS3DestinationConfigurationProperty(
                 bucket_arn=raw_bucket.bucket_arn,
                 role_arn=kinesis_firehose_role.role_arn,
-                prefix="data/",
-                error_output_prefix="errors/",
+                prefix=prefix,
+                error_output_prefix=error_output_prefix,
+                compression_format=compression_format,
+                file_extension=".parquet" if convert_to_parquet else None,
                 buffering_hints=_kinesis_firehose.CfnDeliveryStream.BufferingHintsProperty(
-                    interval_in_seconds=120,
-                    size_in_m_bs=2
+                    interval_in_seconds=buffer_interval_seconds,
+                    size_in_m_bs=buffer_size_mb
+                ),
+                data_format_conversion_configuration=data_format_conversion,
+                dynamic_partitioning_configuration=_kinesis_firehose.CfnDeliveryStream.DynamicPartitioningConfigurationProperty(
+                    enabled=True
+                ) if dynamic_partitioning else None,
+                processing_configuration=processing_configuration
+            )
+        )
+
+        # O firehose valida as permissoes da role na criacao do stream
+        self._delivery_stream.node.add_dependency(kinesis_firehose_policy)
+        if convert_to_parquet:
+            self._delivery_stream.node.add_dependency(self.kinesis_firehose_glue_policy)
+        if transform_lambda is not None:
+            self._delivery_stream.node.add_dependency(transform_policy)
+
+    def record_transformation(self, transform_lambda, role, record_format, dynamic_partitioning):
+        # A lambda precisa saber o formato de saida (agrega registros so em json)
+        # e se deve devolver as chaves de particao
+        transform_lambda.add_environment("RECORD_FORMAT", record_format)
+        transform_lambda.add_environment("DYNAMIC_PARTITIONING", "true" if dynamic_partitioning else "false")
+
+        return _iam.Policy(
+            self, 'kinesis-firehose-transform-policy',
+            roles=[role],
+            statements=[_iam.PolicyStatement(
+                effect=_iam.Effect.ALLOW,
+                actions=[
+                    "lambda:InvokeFunction",
+                    "lambda:GetFunctionConfiguration"
+                ],
+                resources=[
+                    transform_lambda.function_arn,
+                    f'{transform_lambda.function_arn}:*'
+                ]
+            )]
+        )
+
+    def parquet_conversion(self, raw_bucket, role, compression):
+        # Schema dos registros no catalogo do glue, usado pelo firehose para gerar o parquet
+        database_name = f"{self.stack_name}_ingest".replace('-', '_')
+
+        database = _glue.CfnDatabase(
+            self, 'ingest-database',
+            catalog_id=raw_bucket.stack.account,
+            database_input=_glue.CfnDatabase.DatabaseInputProperty(name=database_name)
+        )
+
+        table = _glue.CfnTable(
+            self, 'ingest-table',
+            catalog_id=raw_bucket.stack.account,
+            database_name=database_name,
+            table_input=_glue.CfnTable.TableInputProperty(
+                name=INGEST_DATASET.lower(),
+                table_type="EXTERNAL_TABLE",
+                storage_descriptor=_glue.CfnTable.StorageDescriptorProperty(
+                    columns=[_glue.CfnTable.ColumnProperty(name=name, type=dtype) for name, dtype in INGEST_COLUMNS],
+                    location=f"s3://{raw_bucket.bucket_name}/data/{INGEST_DATASET}/",
+                    input_format="org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat",
+                    output_format="org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat",
+                    serde_info=_glue.CfnTable.SerdeInfoProperty(
+                        serialization_library="org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe"
+                    )
+                )
+            )
+        )
+        table.add_dependency(database)
+
+        self.kinesis_firehose_glue_policy = _iam.Policy(
+            self, 'kinesis-firehose-glue-policy',
+            roles=[role],
+            statements=[_iam.PolicyStatement(
+                effect=_iam.Effect.ALLOW,
+                actions=[
+                    "glue:GetTable",
+                    "glue:GetTableVersion",
+                    "glue:GetTableVersions"
+                ],
+                resources=[
+                    f"arn:aws:glue:{raw_bucket.stack.region}:{raw_bucket.stack.account}:catalog",
+                    f"arn:aws:glue:{raw_bucket.stack.region}:{raw_bucket.stack.account}:database/{database_name}",
+                    f"arn:aws:glue:{raw_bucket.stack.region}:{raw_bucket.stack.account}:table/{database_name}/*"
+                ]
+            )]
+        )
+
+        return _kinesis_firehose.CfnDeliveryStream.DataFormatConversionConfigurationProperty(
+            enabled=True,
+            input_format_configuration=_kinesis_firehose.CfnDeliveryStream.InputFormatConfigurationProperty(
+                deserializer=_kinesis_firehose.CfnDeliveryStream.DeserializerProperty(
+                    hive_json_ser_de=_kinesis_firehose.CfnDeliveryStream.HiveJsonSerDeProperty(
+                        timestamp_formats=["yyyy-MM-dd HH:mm:ss"]
+                    )
+                )
+            ),
+            output_format_configuration=_kinesis_firehose.CfnDeliveryStream.OutputFormatConfigurationProperty(
+                serializer=_kinesis_firehose.CfnDeliveryStream.SerializerProperty(
+                    parquet_ser_de=_kinesis_firehose.CfnDeliveryStream.ParquetSerDeProperty(
+                        compression=compression or 'SNAPPY'
+                    )
                 )
+            ),
+            schema_configuration=_kinesis_firehose.CfnDeliveryStream.SchemaConfigurationProperty(
+                catalog_id=raw_bucket.stack.account,
+                database_name=database_name,
+                table_name=INGEST_DATASET.lower(),
+                region=raw_bucket.stack.region,
+                role_arn=role.role_arn,
+                version_id="LATEST"
             )
         )
@@ -0,0 +1,33 @@
+from constructs import Construct
+from aws_cdk import (
+    RemovalPolicy,
+    aws_dynamodb as _dynamodb
+)
+
+
+class PartitionLockTable(Construct):
+
+    @property
+    def get_table_name(self):
+        return self.table.table_name
+
+    def __init__(self,
+                 scope: Construct,
+                 id: str,
+                 **kwargs
+                 ):
+        super().__init__(scope, id, **kwargs)
+
+        self.stack_name = scope.to_string()
+
+        # Reservas de particoes entre execucoes (datalake_common.locks): um item
+        # por dataset e dia, removido pelo TTL depois do vencimento da reserva e
+        # de toda a fila de espera (purge_at)
+        self.table = _dynamodb.Table(
+            self, 'partition-locks-table',
+            table_name=f'{self.stack_name}-partition-locks',
+            partition_key=_dynamodb.Attribute(name='lock_key', type=_dynamodb.AttributeType.STRING),
+            billing_mode=_dynamodb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute='purge_at',
+            removal_policy=RemovalPolicy.DESTROY
+        )
@@ -4,8 +4,10 @@ from aws_cdk import (
     aws_events_targets as _events_targets,
     aws_events as _events,
     aws_s3 as _s3,
-    aws_stepfunctions as _stf,
-
+    aws_lambda as _lambda,
+    aws_lambda_event_sources as _lambda_event_sources,
+    aws_sqs as _sqs,
+    Duration
 )
 
 
@@ -37,3 +39,120 @@ class StfEventBridgeS3(Construct):
         )
 
         event_rule.add_target(_events_targets.SfnStateMachine(machine=state_machine))
+
+
+class StfBatchedEventBridgeS3(Construct):
+
+    @property
+    def get_queue(self):
+        return self.queue
+
+    def __init__(self,
+                 scope: Construct,
+                 id: str,
+                 raw_bucket: _s3.Bucket,
+                 dispatch_batch_lambda: _lambda.Function,
+                 batch_window: Duration = Duration.minutes(5),
+                 batch_size: int = 1000,
+                 **kwargs
+                 ):
+        super().__init__(scope, id, **kwargs)
+
+        self.stack_name = scope.to_string()
+
+        # Eventos que falharam no dispatch varias vezes ficam para analise
+        dead_letter_queue = _sqs.Queue(
+            self, "Raw objects dead letter queue",
+            queue_name=f"{self.stack_name}-raw-objects-dlq",
+            retention_period=Duration.days(14)
+        )
+
+        # Visibilidade de 6x o timeout da lambda, como recomendado para event source do sqs
+        self.queue = _sqs.Queue(
+            self, "Raw objects queue",
+            queue_name=f"{self.stack_name}-raw-objects",
+            visibility_timeout=Duration.seconds(
+                batch_window.to_seconds() + 6 * dispatch_batch_lambda.timeout.to_seconds()),
+            dead_letter_queue=_sqs.DeadLetterQueue(queue=dead_letter_queue, max_receive_count=5)
+        )
+
+        event_rule = _events.Rule(
+            self, "Event buffer s3 objects",
+            rule_name=f"{self.stack_name}-event-rule",
+            event_pattern=_events.EventPattern(
+                source=["aws.s3"],
+                detail_type=["Object Created"],
+                detail={
+                    "bucket": {
+                        "name": [raw_bucket.bucket_name]
+                    }
+                }
+            )
+        )
+
+        event_rule.add_target(_events_targets.SqsQueue(self.queue))
+
+        # Os eventos sao acumulados ate batch_window ou batch_size, o que vier
+        # primeiro: uma execucao da step function por lote em vez de uma por
+        # arquivo, sem glue jobs concorrentes a cada flush do firehose. A lambda
+        # devolve so as mensagens que falharam, o resto do lote sai da fila
+        dispatch_batch_lambda.add_event_source(_lambda_event_sources.SqsEventSource(
+            self.queue,
+            batch_size=batch_size,
+            max_batching_window=batch_window,
+            max_concurrency=2,
+            report_batch_item_failures=True
+        ))
+
+
+class CompactionSchedule(Construct):
+
+    def __init__(self,
+                 scope: Construct,
+                 id: str,
+                 compactor_lambda: _lambda.Function,
+                 schedule: _events.Schedule = None,
+                 **kwargs
+                 ):
+        super().__init__(scope, id, **kwargs)
+
+        self.stack_name = scope.to_string()
+
+        # Sem particoes no evento o compactador varre todos os prefixos configurados
+        event_rule = _events.Rule(
+            self, "Event invoke compactor schedule",
+            rule_name=f"{self.stack_name}-compaction-rule",
+            schedule=schedule or _events.Schedule.cron(minute="0", hour="3")
+        )
+
+        event_rule.add_target(_events_targets.LambdaFunction(compactor_lambda))
+
+
+class CrawlerCompletionRule(Construct):
+
+    def __init__(self,
+                 scope: Construct,
+                 id: str,
+                 crawler_name: str,
+                 crawler_callback_lambda: _lambda.Function,
+                 **kwargs
+                 ):
+        super().__init__(scope, id, **kwargs)
+
+        self.stack_name = scope.to_string()
+
+        # Fim do crawler retoma as execucoes da step function que esperam o task token
+        event_rule = _events.Rule(
+            self, "Event crawler state change",
+            rule_name=f"{self.stack_name}-crawler-completion-rule",
+            event_pattern=_events.EventPattern(
+                source=["aws.glue"],
+                detail_type=["Glue Crawler State Change"],
+                detail={
+                    "crawlerName": [crawler_name],
+                    "state": ["Succeeded", "Failed"]
+                }
+            )
+        )
+
+        event_rule.add_target(_events_targets.LambdaFunction(crawler_callback_lambda))
@@ -1,3 +1,5 @@
+import math
+
 from constructs import Construct
 from aws_cdk import (
     aws_stepfunctions as _stf,
@@ -21,7 +23,20 @@ class DatalakeProcessSTF(Construct):
                  cleaner_lambda: _lambda.Function,
                  process_glue_job: _glue.CfnJob,
                  invoke_crawler_lambda: _lambda.Function,
-                 check_crawler_lambda: _lambda.Function,
+                 compactor_lambda: _lambda.Function = None,
+                 enable_compaction: bool = False,
+                 plan_process_lambda: _lambda.Function = None,
+                 process_light_lambda: _lambda.Function = None,
+                 run_crawler: bool = False,
+                 crawler_timeout: Duration = Duration.minutes(10),
+                 clean_batch_size: int = 10,
+                 max_concurrency: int = 4,
+                 max_objects: int = 200,
+                 process_timeout: Duration = Duration.minutes(15),
+                 claim_partitions_lambda: _lambda.Function = None,
+                 release_partitions_lambda: _lambda.Function = None,
+                 lock_poll_interval: Duration = Duration.seconds(30),
+                 max_lock_wait: Duration = Duration.minutes(30),
                  **kwargs
                  ):
         super().__init__(scope, id, **kwargs)
@@ -33,23 +48,87 @@ class DatalakeProcessSTF(Construct):
             lambda_function=cleaner_lambda,
             output_path="$.Payload",
         )
+        # O cleaner falha com PartitionBusy quando um dia ficou ocupado por outra
+        # execucao alem do LOCK_WAIT_SECONDS; o retry pula os arquivos ja no ledger
+        busy_retry = {
+            "errors": ["PartitionBusy"],
+            "interval": Duration.seconds(30),
+            "max_attempts": 6,
+            "backoff_rate": 2
+        }
+        clear_task.add_retry(**busy_retry)
 
-        process_task = _stf_tasks.GlueStartJobRun(
-            self, "Process Data Task",
-            glue_job_name=process_glue_job.name,
-            integration_pattern=_stf.IntegrationPattern.RUN_JOB
+        # Lista de objetos na entrada ({"objects": [{"bucket", "key"}, ...]}), para
+        # reprocessar um backlog: lotes de clean_batch_size arquivos limpos em
+        # paralelo pelo Map, depois um unico process sobre o resultado combinado
+        split_task = _stf.Pass(
+            self, "Split Objects Batches",
+            parameters={
+                "batches": _stf.JsonPath.array_partition(_stf.JsonPath.list_at("$.objects"), clean_batch_size)
+            }
         )
 
-        invoke_crawler_task = _stf_tasks.LambdaInvoke(
-            self, "Invoke Crawler Catalog Task",
-            lambda_function=invoke_crawler_lambda,
+        clean_batch_task = _stf_tasks.LambdaInvoke(
+            self, "Clear Data Batch Task",
+            lambda_function=cleaner_lambda,
+            output_path="$.Payload",
+        )
+        clean_batch_task.add_retry(**busy_retry)
+
+        clean_map = _stf.Map(
+            self, "Clear Data Batches Map",
+            items_path="$.batches",
+            item_selector={
+                "objects": _stf.JsonPath.object_at("$$.Map.Item.Value"),
+                "batch": True
+            },
+            max_concurrency=max_concurrency,
+            # Resultados de todos os lotes em uma lista so
+            result_selector={
+                "results": _stf.JsonPath.list_at("$[*].results[*]")
+            }
+        )
+        clean_map.item_processor(clean_batch_task)
+
+        # Intervalo de datas do conjunto, no mesmo formato da saida do Clear Data Task
+        summary_task = _stf_tasks.LambdaInvoke(
+            self, "Summarize Clear Data Task",
+            lambda_function=cleaner_lambda,
+            payload=_stf.TaskInput.from_object({
+                "results": _stf.JsonPath.object_at("$.results")
+            }),
             output_path="$.Payload",
         )
 
-        check_crawler_task = _stf_tasks.LambdaInvoke(
-            self, "Check Crawler Catalog Task",
-            lambda_function=check_crawler_lambda,
-            result_path="$.check_crawler_result"
+        # Com o plan configurado cada execucao do job usa os workers calculados
+        # pelo volume de entrada, senao a capacidade definida no job
+        sized_runs = plan_process_lambda is not None and process_light_lambda is not None \
+            and process_glue_job.worker_type is not None
+        worker_configuration = _stf_tasks.WorkerConfigurationProperty(
+            worker_type_v2=_stf_tasks.WorkerTypeV2.of(process_glue_job.worker_type),
+            number_of_workers=_stf.JsonPath.number_at("$.plan.workers")
+        ) if sized_runs else None
+
+        process_task = _stf_tasks.GlueStartJobRun(
+            self, "Process Data Task",
+            glue_job_name=process_glue_job.name,
+            integration_pattern=_stf.IntegrationPattern.RUN_JOB,
+            worker_configuration=worker_configuration,
+            # Todos os dias alterados pelo cleaner em uma unica execucao do job
+            arguments=_stf.TaskInput.from_object({
+                "--MODE": "range",
+                "--START_DATE": _stf.JsonPath.string_at("$.start_date"),
+                "--END_DATE": _stf.JsonPath.string_at("$.end_date")
+            }),
+            result_path="$.process_result"
+        )
+        # Execucoes em dias diferentes rodam o job ao mesmo tempo (reservas por
+        # particao); acima do max_concurrent_runs a execucao espera e tenta de novo
+        process_task.add_retry(
+            errors=["Glue.ConcurrentRunsExceededException"],
+            interval=Duration.seconds(60),
+            max_attempts=10,
+            backoff_rate=1.5
         )
 
         succeed_job = _stf.Succeed(
@@ -57,22 +136,187 @@ class DatalakeProcessSTF(Construct):
             comment='AWS Batch Job succeeded'
         )
 
-        wait_crawler_job = _stf.Wait(
-            self, "Wait Crawler 20 Seconds",
-            time=_stf.WaitTime.duration(
-                Duration.seconds(20))
+        # Com o engine leve configurado, volumes pequenos sao processados na lambda
+        # (pandas/pyarrow) em vez de pagar o startup do Spark no glue job
+        if plan_process_lambda is not None and process_light_lambda is not None:
+            date_range_payload = _stf.TaskInput.from_object({
+                "start_date": _stf.JsonPath.string_at("$.start_date"),
+                "end_date": _stf.JsonPath.string_at("$.end_date")
+            })
+
+            plan_task = _stf_tasks.LambdaInvoke(
+                self, "Plan Process Task",
+                lambda_function=plan_process_lambda,
+                payload=date_range_payload,
+                result_path="$.plan",
+                result_selector={
+                    "engine.$": "$.Payload.engine",
+                    "input_bytes.$": "$.Payload.input_bytes",
+                    "workers.$": "$.Payload.workers"
+                }
+            )
+
+            process_light_task = _stf_tasks.LambdaInvoke(
+                self, "Process Light Task",
+                lambda_function=process_light_lambda,
+                payload=date_range_payload,
+                result_path="$.process_result",
+                result_selector={
+                    "engine.$": "$.Payload.engine",
+                    "rows.$": "$.Payload.rows"
+                }
+            )
+
+            process_step = plan_task.next(
+                _stf.Choice(self, 'Process Engine?')
+                    .when(_stf.Condition.string_equals('$.plan.engine', 'light'), process_light_task)
+                    .otherwise(process_task)
+                    .afterwards()
+            )
+        else:
+            process_step = process_task
+
+        # Compactacao opcional das particoes escritas nesta execucao
+        if enable_compaction:
+            compaction_task = _stf_tasks.LambdaInvoke(
+                self, "Compact Partitions Task",
+                lambda_function=compactor_lambda,
+                # Com as reservas configuradas a compactacao roda dentro das reservas
+                # do curated da execucao (owner), no cleaned reserva os dias do cleaner
+                payload=_stf.TaskInput.from_object({
+                    "results": _stf.JsonPath.object_at("$.results"),
+                    **({"owner": _stf.JsonPath.string_at("$$.Execution.Name")}
+                       if claim_partitions_lambda is not None and release_partitions_lambda is not None else {})
+                }),
+                result_path="$.compaction_result",
+                result_selector={
+                    "files_before.$": "$.Payload.files_before",
+                    "files_after.$": "$.Payload.files_after",
+                    "bytes_before.$": "$.Payload.bytes_before",
+                    "bytes_after.$": "$.Payload.bytes_after"
+                }
+            )
+            process_chain = process_step.next(compaction_task)
+        else:
+            process_chain = process_step
+
+        # Tempo de uma execucao com max_objects arquivos: lotes limpos em ondas de
+        # max_concurrency, process e crawler uma vez so
+        clean_waves = math.ceil(math.ceil(max_objects / clean_batch_size) / max_concurrency)
+        cleaner_timeout = cleaner_lambda.timeout or Duration.seconds(3)
+        timeout_seconds = clean_waves * cleaner_timeout.to_seconds() + process_timeout.to_seconds()
+        # Retries do PartitionBusy no clean (os lotes do Map tentam em paralelo):
+        # todas as esperas com o backoff e uma lambda a mais por tentativa. Sem
+        # isso a execucao vence no meio dos retries e nao libera as reservas
+        timeout_seconds += sum(
+            int(busy_retry["interval"].to_seconds() * busy_retry["backoff_rate"] ** attempt)
+            for attempt in range(busy_retry["max_attempts"])
+        ) + busy_retry["max_attempts"] * cleaner_timeout.to_seconds()
+        if run_crawler:
+            timeout_seconds += crawler_timeout.to_seconds()
+        if claim_partitions_lambda is not None:
+            timeout_seconds += max_lock_wait.to_seconds()
+
+        # Reserva das particoes do curated antes do process: com outra execucao
+        # regravando os mesmos meses a execucao espera na fila, em dias distantes
+        # as duas seguem em paralelo. A reserva e liberada no fim, com sucesso ou
+        # falha, e vence sozinha no timeout da execucao
+        if claim_partitions_lambda is not None and release_partitions_lambda is not None:
+            lock_payload = {
+                "start_date": _stf.JsonPath.string_at("$.start_date"),
+                "end_date": _stf.JsonPath.string_at("$.end_date"),
+                "owner": _stf.JsonPath.string_at("$$.Execution.Name")
+            }
+
+            claim_task = _stf_tasks.LambdaInvoke(
+                self, "Claim Partitions Task",
+                lambda_function=claim_partitions_lambda,
+                # A reserva vale ate o timeout da execucao; a posicao na fila vence
+                # em 3 esperas, uma execucao abortada na espera nao segura a fila
+                payload=_stf.TaskInput.from_object({
+                    **lock_payload,
+                    "ttl_seconds": timeout_seconds,
+                    "waiter_ttl_seconds": 3 * lock_poll_interval.to_seconds()
+                }),
+                result_path="$.locks",
+                result_selector={
+                    "claimed.$": "$.Payload.claimed",
+                    "waiting.$": "$.Payload.waiting"
+                }
+            )
+
+            release_task = _stf_tasks.LambdaInvoke(
+                self, "Release Partitions Task",
+                lambda_function=release_partitions_lambda,
+                payload=_stf.TaskInput.from_object(lock_payload),
+                result_path=_stf.JsonPath.DISCARD
+            )
+
+            release_on_error_task = _stf_tasks.LambdaInvoke(
+                self, "Release Partitions On Error Task",
+                lambda_function=release_partitions_lambda,
+                payload=_stf.TaskInput.from_object(lock_payload),
+                result_path=_stf.JsonPath.DISCARD
+            )
+
+            process_parallel = _stf.Parallel(
+                self, "Process Partitions",
+                result_path=_stf.JsonPath.DISCARD
+            ).branch(process_chain)
+            process_parallel.add_catch(
+                release_on_error_task.next(_stf.Fail(self, "Process Failed", error="ProcessFailed")),
+                result_path="$.error"
+            )
+
+            wait_partitions = _stf.Wait(
+                self, "Wait For Partitions",
+                time=_stf.WaitTime.duration(lock_poll_interval)
+            )
+
+            claim_task.next(
+                _stf.Choice(self, 'Partitions Claimed?')
+                    .when(_stf.Condition.is_present('$.locks.waiting[0]'), wait_partitions.next(claim_task))
+                    .otherwise(process_parallel.next(release_task))
+            )
+            process_chain = _stf.Chain.custom(claim_task, [release_task], claim_task)
+
+        # O process registra as particoes gravadas no catalogo. O crawler so e
+        # necessario quando o schema das tabelas muda
+        if run_crawler:
+            # A execucao fica parada no task token ate o evento de fim do crawler
+            # (regra CrawlerCompletionRule), sem lambda consultando o status
+            crawler_task = _stf_tasks.LambdaInvoke(
+                self, "Run Crawler Catalog Task",
+                lambda_function=invoke_crawler_lambda,
+                integration_pattern=_stf.IntegrationPattern.WAIT_FOR_TASK_TOKEN,
+                payload=_stf.TaskInput.from_object({
+                    "task_token": _stf.JsonPath.task_token,
+                    "execution": _stf.JsonPath.string_at("$$.Execution.Name")
+                }),
+                result_path="$.crawler_result",
+                task_timeout=_stf.Timeout.duration(crawler_timeout)
+            )
+
+            catalog_chain = crawler_task.next(succeed_job)
+        else:
+            catalog_chain = succeed_job
+
+        # Sem particoes novas (arquivos ja processados ou ignorados) nao ha o que processar
+        no_new_partitions = _stf.Succeed(
+            self, "No New Partitions",
+            comment='Nothing to process'
         )
 
-        definition = clear_task \
-            .next(process_task) \
-            .next(invoke_crawler_task) \
-            .next(check_crawler_task) \
-            .next(_stf.Choice(self, 'Crawler Complete?')
-                .when(_stf.Condition.string_equals('$.check_crawler_result.Payload', 'SUCCEEDED'),
-                    succeed_job)
-                .otherwise(wait_crawler_job
-                            .next(check_crawler_task)
-                        )
+        clean_step = _stf.Choice(self, 'Objects Batch?') \
+            .when(_stf.Condition.is_present('$.objects'), split_task.next(clean_map).next(summary_task)) \
+            .otherwise(clear_task) \
+            .afterwards()
+
+        definition = clean_step \
+            .next(_stf.Choice(self, 'New Partitions?')
+                .when(_stf.Condition.is_present('$.start_date'),
+                    process_chain.next(catalog_chain))
+                .otherwise(no_new_partitions)
             )
 
         stepfunctions_role = _iam.Role(
@@ -90,5 +334,5 @@ class DatalakeProcessSTF(Construct):
             state_machine_name=f"{self.stack_name}-state-machine",
             definition_body=_stf.DefinitionBody.from_chainable(definition),
             role=stepfunctions_role,
-            timeout=Duration.minutes(15)
+            timeout=Duration.seconds(timeout_seconds)
         )
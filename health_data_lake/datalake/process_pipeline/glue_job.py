@@ -1,10 +1,10 @@
 from constructs import Construct
 from aws_cdk import (
+    Fn,
     aws_s3 as _s3,
     aws_iam as _iam,
     aws_glue as _glue,
-    aws_s3_deployment as _s3_deployment,
-    Duration
+    aws_s3_deployment as _s3_deployment
 )
 
 class DatalakeGlueJobs(Construct):
@@ -19,6 +19,11 @@ class DatalakeGlueJobs(Construct):
         cleaned_bucket: _s3.Bucket, 
         curated_bucket: _s3.Bucket,
         support_bucket: _s3.Bucket,
+        catalog_database: str = '',
+        worker_type: str = 'G.1X',
+        number_of_workers: int = 10,
+        auto_scaling: bool = True,
+        flex: bool = False,
         **kwargs
     ):
 
@@ -36,6 +41,19 @@ class DatalakeGlueJobs(Construct):
             destination_key_prefix="glue_job/" 
         )
 
+        # Modulos compartilhados com o cleaner (schemas dos datasets), enviados
+        # como zip para o glue importar via --extra-py-files
+        shared_modules = _s3_deployment.BucketDeployment(
+            self, "deploy_glue_shared_modules_s3",
+            sources=[_s3_deployment.Source.asset("./src/shared/python")],
+            destination_bucket=support_bucket,
+            destination_key_prefix="shared/",
+            extract=False
+        )
+
+        shared_modules_path = support_bucket.s3_url_for_object(
+            f"shared/{Fn.select(0, shared_modules.object_keys)}")
+
         # Caminho do script no S3
         script_path = support_bucket.s3_url_for_object("glue_job/process.py")
 
@@ -65,11 +83,32 @@ class DatalakeGlueJobs(Construct):
                 "--TempDir": f"s3://{support_bucket.bucket_name}/tmp/",
                 "--job-language": "python",
                 "--enable-continuous-cloudwatch-log": "true",
-                "--enable-metrics": "true"
+                "--enable-metrics": "true",
+                "--extra-py-files": shared_modules_path,
+                "--SOURCE_BUCKET": f"s3://{cleaned_bucket.bucket_name}",
+                "--DESTINATION_BUCKET": f"s3://{curated_bucket.bucket_name}",
+                # range: --START_DATE/--END_DATE / all_new: particoes ainda nao processadas
+                "--MODE": "range",
+                # Recalcula as tabelas semanais, mensais e de medias moveis dos dias processados
+                "--ROLLUPS": "true",
+                # Registra as particoes gravadas no catalogo, sem rodar o crawler
+                "--CATALOG_DATABASE": catalog_database,
+                # Estatisticas por particao do HealthData e do Workouts em _index/ no curated
+                "--PARTITION_INDEX": "true",
+                # Tamanho alvo dos parquet do curated (um arquivo por dia ate esse limite)
+                "--TARGET_FILE_BYTES": str(128 * 1024 * 1024),
+                # Com auto scaling o number_of_workers e o maximo, o glue libera os
+                # workers ociosos durante a execucao
+                "--enable-auto-scaling": "true" if auto_scaling else "false"
             },
             execution_property=_glue.CfnJob.ExecutionPropertyProperty(
-                max_concurrent_runs=1
+                max_concurrent_runs=3
             ),
             glue_version="3.0",
-            max_capacity=2 
+            # Cada execucao da step function sobrescreve o numero de workers pelo
+            # volume de entrada medido no plan (GLUE_MIN_WORKERS..GLUE_MAX_WORKERS)
+            worker_type=worker_type,
+            number_of_workers=number_of_workers,
+            # FLEX: capacidade ociosa mais barata, com inicio sem garantia de horario
+            execution_class="FLEX" if flex else "STANDARD"
         )
@@ -3,7 +3,7 @@ from aws_cdk import (
     aws_lambda as _lambda,
     aws_s3 as _s3,
     aws_iam as _iam,
-    aws_glue as _glue,
+    BundlingOptions,
     Duration
 )
 
@@ -11,7 +11,9 @@ class DatalakeLambdas(Construct):
 
     @property
     def functions_list(self):
-        return self.cleaner_lambda, self.invoke_crawler_lambda, self.check_crawler_lambda
+        return self.cleaner_lambda, self.invoke_crawler_lambda, self.crawler_callback_lambda, self.compactor_lambda, \
+            self.plan_process_lambda, self.process_light_lambda, self.firehose_transform_lambda, \
+            self.dispatch_batch_lambda, self.claim_partitions_lambda, self.release_partitions_lambda
 
     def __init__(self, 
         scope: Construct, 
@@ -21,6 +23,11 @@ class DatalakeLambdas(Construct):
         curated_bucket: _s3.Bucket,
         support_bucket: _s3.Bucket,
         crawler_name: str,
+        catalog_database: str = '',
+        cleaner_package: str = 'legacy',
+        lock_table_name: str = '',
+        glue_min_workers: int = 2,
+        glue_max_workers: int = 10,
         **kwargs
     ):
 
@@ -28,6 +35,8 @@ class DatalakeLambdas(Construct):
 
         self.stack_name = scope.to_string()
 
+        lock_table_arn = f'arn:aws:dynamodb:{scope.region}:{scope.account}:table/{lock_table_name}'
+
 # ========================================================================
 # ====================== CLEANER LAMBDA FUNCTION =========================
 # ========================================================================
@@ -48,7 +57,8 @@ class DatalakeLambdas(Construct):
                         "s3:ListBucketMultipartUploads",
                         "s3:ListMultipartUploadParts",
                         "s3:AbortMultipartUpload",
-                        "s3:PutObject"
+                        "s3:PutObject",
+                        "s3:DeleteObject"
                     ],
                     resources= [
                         raw_bucket.bucket_arn,
@@ -57,6 +67,35 @@ class DatalakeLambdas(Construct):
                         f'{cleaned_bucket.bucket_arn}/*'
                     ]
             ),
+            _iam.PolicyStatement(
+                    effect= _iam.Effect.ALLOW,
+                    actions= [
+                        "s3:GetObject",
+                        "s3:PutObject"
+                    ],
+                    resources= [
+                        f'{support_bucket.bucket_arn}/ledger/*'
+                    ]
+            ),
+            _iam.PolicyStatement(
+                    effect= _iam.Effect.ALLOW,
+                    actions= [
+                        "s3:ListBucket"
+                    ],
+                    resources= [
+                        support_bucket.bucket_arn
+                    ]
+            ),
+            _iam.PolicyStatement(
+                    effect= _iam.Effect.ALLOW,
+                    actions= [
+                        "dynamodb:GetItem",
+                        "dynamodb:PutItem"
+                    ],
+                    resources= [
+                        lock_table_arn
+                    ]
+            ),
             _iam.PolicyStatement(
                     effect= _iam.Effect.ALLOW,
                     actions= [
@@ -75,6 +114,34 @@ class DatalakeLambdas(Construct):
                   compatible_runtimes = [_lambda.Runtime.PYTHON_3_9],
         )      
 
+        # Modulos compartilhados com o glue job (schemas dos datasets)
+        shared_lambda_layer = _lambda.LayerVersion(self, 'shared-layer',
+                  code = _lambda.AssetCode('src/shared'),
+                  compatible_runtimes = [_lambda.Runtime.PYTHON_3_9],
+        )
+
+        # legacy: camada do awswrangler / optimized: camada so com pyarrow e pandas,
+        # menor e com import mais rapido no cold start (benchmarks/bench_cold_start.py)
+        if cleaner_package == 'optimized':
+            cleaner_arrow_layer = _lambda.LayerVersion(self, 'cleaner-arrow-layer',
+                      code = _lambda.Code.from_asset('src/lambda/layers/cleaner-arrow',
+                          bundling=BundlingOptions(
+                              image=_lambda.Runtime.PYTHON_3_9.bundling_image,
+                              command=['bash', '-c',
+                                       'pip install -r requirements.txt -t /asset-output/python --no-compile && '
+                                       'cd /asset-output/python && rm -rf pyarrow/include pyarrow/tests pandas/tests '
+                                       '*.dist-info/RECORD']
+                          )),
+                      compatible_runtimes = [_lambda.Runtime.PYTHON_3_9],
+            )
+            cleaner_layers = [cleaner_arrow_layer, shared_lambda_layer]
+            cleaner_io = 'arrow'
+        elif cleaner_package == 'legacy':
+            cleaner_layers = [wrangler_lambda_layer, shared_lambda_layer]
+            cleaner_io = 'wrangler'
+        else:
+            raise ValueError(f'cleaner_package invalido: {cleaner_package}')
+
         self.cleaner_lambda = _lambda.Function(
             self, 'cleaner-obs-sample',
             function_name=f'{self.stack_name}-cleaner-obs-sample',
@@ -84,9 +151,25 @@ class DatalakeLambdas(Construct):
             code=_lambda.Code.from_asset('src/lambda/cleaner/'),
             handler='cleaner.handler',
             role=cleaner_lambda_role,
-            layers = [wrangler_lambda_layer],
+            layers = cleaner_layers,
             environment={
-                "DESTINATION_BUCKET_NAME": cleaned_bucket.bucket_name
+                "CLEANER_IO": cleaner_io,
+                "DESTINATION_BUCKET_NAME": cleaned_bucket.bucket_name,
+                "LEDGER_BUCKET_NAME": support_bucket.bucket_name,
+                "LEDGER_PREFIX": "ledger/cleaner/",
+                "CLEANER_READ_MODE": "auto",
+                "STREAMING_THRESHOLD_BYTES": str(64 * 1024 * 1024),
+                "STREAMING_CHUNK_ROWS": "250000",
+                "CLEANER_MAX_WORKERS": "4",
+                "CLEANER_WRITE_MODE": "upsert",
+                "CLEANER_PARQUET_LAYOUT": "tuned",
+                "CLEANER_PARQUET_COMPRESSION": "zstd",
+                "CLEANER_PARQUET_ROW_GROUP_ROWS": "50000",
+                "CLEANER_QUALITY_CHECKS": "true",
+                "QUARANTINE_PREFIX": "quarantine/",
+                "LOCK_TABLE_NAME": lock_table_name,
+                "LOCK_WAIT_SECONDS": "120",
+                "LOCK_TTL_SECONDS": "300"
             }
         )
 
@@ -113,6 +196,17 @@ class DatalakeLambdas(Construct):
                         f'arn:aws:glue:{scope.region}:{scope.account}:crawler/{crawler_name}'
                     ]
             ),
+            _iam.PolicyStatement(
+                    effect= _iam.Effect.ALLOW,
+                    actions= [
+                        "s3:PutObject",
+                        "s3:GetObject",
+                        "s3:DeleteObject"
+                    ],
+                    resources= [
+                        f'{support_bucket.bucket_arn}/callbacks/crawler/*'
+                    ]
+            ),
             _iam.PolicyStatement(
                     effect= _iam.Effect.ALLOW,
                     actions= [
@@ -137,33 +231,69 @@ class DatalakeLambdas(Construct):
             code=_lambda.Code.from_asset('src/lambda/invoke_crawler/'),
             handler='invoke_crawler.handler',
             role=invoke_crawler_lambda_role,
+            layers = [shared_lambda_layer],
             environment={
-                "CRAWLER_NAME": crawler_name
+                "CRAWLER_NAME": crawler_name,
+                # Task token da execucao, retomada pela crawler-callback no fim do crawl
+                "CALLBACK_BUCKET_NAME": support_bucket.bucket_name,
+                "CALLBACK_PREFIX": "callbacks/crawler/"
             }
         )
 
 # ========================================================================
-# =============== CHECK CRAWLER SERVERLESS LAMBDA =======================
-# ======================================================================== 
+# ============== CRAWLER CALLBACK SERVERLESS LAMBDA ======================
+# ========================================================================
 
-# ======================== CHECK LAMBDA ROLE ============================
-        check_crawler_lambda_role = _iam.Role(
-            self, 'check-crawler-lambda-role',
+# ===================== CRAWLER CALLBACK LAMBDA ROLE =====================
+        crawler_callback_lambda_role = _iam.Role(
+            self, 'crawler-callback-lambda-role',
             assumed_by= _iam.ServicePrincipal("lambda.amazonaws.com")
         )
 
-        check_crawler_lambda_policy = _iam.Policy(
-            self, 'check-crawler-lambda-role-policy',
-            roles=[check_crawler_lambda_role],
+        crawler_callback_lambda_policy = _iam.Policy(
+            self, 'crawler-callback-lambda-role-policy',
+            roles=[crawler_callback_lambda_role],
             statements=[_iam.PolicyStatement(
                     effect= _iam.Effect.ALLOW,
                     actions= [
+                        "s3:GetObject",
+                        "s3:PutObject",
+                        "s3:DeleteObject"
+                    ],
+                    resources= [
+                        f'{support_bucket.bucket_arn}/callbacks/crawler/*'
+                    ]
+            ),
+            # Crawl seguinte para as execucoes que chegaram com o crawler rodando
+            _iam.PolicyStatement(
+                    effect= _iam.Effect.ALLOW,
+                    actions= [
+                        "glue:StartCrawler",
                         "glue:GetCrawler"
                     ],
                     resources= [
                         f'arn:aws:glue:{scope.region}:{scope.account}:crawler/{crawler_name}'
                     ]
             ),
+            _iam.PolicyStatement(
+                    effect= _iam.Effect.ALLOW,
+                    actions= [
+                        "s3:ListBucket"
+                    ],
+                    resources= [
+                        support_bucket.bucket_arn
+                    ]
+            ),
+            _iam.PolicyStatement(
+                    effect= _iam.Effect.ALLOW,
+                    actions= [
+                        "states:SendTaskSuccess",
+                        "states:SendTaskFailure"
+                    ],
+                    resources= [
+                        f'arn:aws:states:{scope.region}:{scope.account}:stateMachine:{self.stack_name}-state-machine'
+                    ]
+            ),
             _iam.PolicyStatement(
                     effect= _iam.Effect.ALLOW,
                     actions= [
@@ -177,21 +307,386 @@ class DatalakeLambdas(Construct):
             )]
         )
 
-# ===================== CHECK LAMBDA FUNCTION ===========================
+# =================== CRAWLER CALLBACK LAMBDA FUNCTION ===================
 
-        self.check_crawler_lambda = _lambda.Function(
-            self, 'check-crawler',
-            function_name=f'{self.stack_name}-check-crawler',
+        # Chamada pelo evento "Glue Crawler State Change", substitui o polling do crawler
+        self.crawler_callback_lambda = _lambda.Function(
+            self, 'crawler-callback',
+            function_name=f'{self.stack_name}-crawler-callback',
             runtime=_lambda.Runtime.PYTHON_3_9,
             memory_size=256,
-            timeout=Duration.minutes(5),
-            code=_lambda.Code.from_asset('src/lambda/check_crawler/'),
-            handler='check_crawler.handler',
-            role=check_crawler_lambda_role,
+            timeout=Duration.minutes(1),
+            code=_lambda.Code.from_asset('src/lambda/crawler_callback/'),
+            handler='crawler_callback.handler',
+            role=crawler_callback_lambda_role,
+            layers = [shared_lambda_layer],
+            environment={
+                "CALLBACK_BUCKET_NAME": support_bucket.bucket_name,
+                "CALLBACK_PREFIX": "callbacks/crawler/"
+            }
+        )
+
+# ========================================================================
+# ============== DISPATCH BATCH SERVERLESS LAMBDA ========================
+# ========================================================================
+
+# ===================== DISPATCH BATCH LAMBDA ROLE =======================
+        dispatch_batch_lambda_role = _iam.Role(
+            self, 'dispatch-batch-lambda-role',
+            assumed_by= _iam.ServicePrincipal("lambda.amazonaws.com")
+        )
+
+        dispatch_batch_lambda_policy = _iam.Policy(
+            self, 'dispatch-batch-lambda-role-policy',
+            roles=[dispatch_batch_lambda_role],
+            statements=[_iam.PolicyStatement(
+                    effect= _iam.Effect.ALLOW,
+                    actions= [
+                        "states:StartExecution"
+                    ],
+                    resources= [
+                        f'arn:aws:states:{scope.region}:{scope.account}:stateMachine:{self.stack_name}-state-machine'
+                    ]
+            ),
+            _iam.PolicyStatement(
+                    effect= _iam.Effect.ALLOW,
+                    actions= [
+                        "logs:CreateLogGroup",
+                        "logs:CreateLogStream",
+                        "logs:PutLogEvents"
+                    ],
+                    resources= [
+                        '*'
+                    ]
+            )]
+        )
+
+# =================== DISPATCH BATCH LAMBDA FUNCTION =====================
+
+        # Le os eventos "Object Created" acumulados na fila e inicia uma execucao
+        # da step function por lote, com a lista de objetos na entrada
+        self.dispatch_batch_lambda = _lambda.Function(
+            self, 'dispatch-batch',
+            function_name=f'{self.stack_name}-dispatch-batch',
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            memory_size=256,
+            timeout=Duration.minutes(1),
+            code=_lambda.Code.from_asset('src/lambda/dispatch_batch/'),
+            handler='dispatch_batch.handler',
+            role=dispatch_batch_lambda_role,
+            layers = [shared_lambda_layer],
+            environment={
+                "STATE_MACHINE_ARN": f'arn:aws:states:{scope.region}:{scope.account}:stateMachine:{self.stack_name}-state-machine',
+                "MAX_EXECUTION_OBJECTS": "200"
+            }
+        )
+
+# ========================================================================
+# ============== PARTITION LOCKS SERVERLESS LAMBDAS ======================
+# ========================================================================
+
+# ==================== PARTITION LOCKS LAMBDA ROLE =======================
+        partition_locks_lambda_role = _iam.Role(
+            self, 'partition-locks-lambda-role',
+            assumed_by= _iam.ServicePrincipal("lambda.amazonaws.com")
+        )
+
+        partition_locks_lambda_policy = _iam.Policy(
+            self, 'partition-locks-lambda-role-policy',
+            roles=[partition_locks_lambda_role],
+            statements=[_iam.PolicyStatement(
+                    effect= _iam.Effect.ALLOW,
+                    actions= [
+                        "dynamodb:GetItem",
+                        "dynamodb:PutItem"
+                    ],
+                    resources= [
+                        lock_table_arn
+                    ]
+            ),
+            _iam.PolicyStatement(
+                    effect= _iam.Effect.ALLOW,
+                    actions= [
+                        "logs:CreateLogGroup",
+                        "logs:CreateLogStream",
+                        "logs:PutLogEvents"
+                    ],
+                    resources= [
+                        '*'
+                    ]
+            )]
+        )
+
+# ================== PARTITION LOCKS LAMBDA FUNCTIONS ====================
+
+        partition_locks_environment = {
+            "LOCK_TABLE_NAME": lock_table_name,
+            "ROLLUPS": "true"
+        }
+
+        # Reserva e libera as particoes do curated em volta do process
+        self.claim_partitions_lambda = _lambda.Function(
+            self, 'claim-partitions',
+            function_name=f'{self.stack_name}-claim-partitions',
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            memory_size=256,
+            timeout=Duration.minutes(1),
+            code=_lambda.Code.from_asset('src/lambda/partition_locks/'),
+            handler='partition_locks.claim_handler',
+            role=partition_locks_lambda_role,
+            layers = [shared_lambda_layer],
+            environment=partition_locks_environment
+        )
+
+        self.release_partitions_lambda = _lambda.Function(
+            self, 'release-partitions',
+            function_name=f'{self.stack_name}-release-partitions',
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            memory_size=256,
+            timeout=Duration.minutes(1),
+            code=_lambda.Code.from_asset('src/lambda/partition_locks/'),
+            handler='partition_locks.release_handler',
+            role=partition_locks_lambda_role,
+            layers = [shared_lambda_layer],
+            environment=partition_locks_environment
+        )
+
+# ========================================================================
+# ===================== COMPACTOR LAMBDA FUNCTION ========================
+# ========================================================================
+
+# ======================= COMPACTOR LAMBDA ROLE ==========================
+        compactor_lambda_role = _iam.Role(
+            self, 'compactor-lambda-role',
+            assumed_by= _iam.ServicePrincipal("lambda.amazonaws.com")
+        )
+
+        compactor_lambda_policy = _iam.Policy(
+            self, 'compactor-lambda-role-policy',
+            roles=[compactor_lambda_role],
+            statements=[_iam.PolicyStatement(
+                    effect= _iam.Effect.ALLOW,
+                    actions= [
+                        "s3:GetBucketLocation",
+                        "s3:GetObject",
+                        "s3:ListBucket",
+                        "s3:PutObject",
+                        "s3:DeleteObject"
+                    ],
+                    resources= [
+                        cleaned_bucket.bucket_arn,
+                        f'{cleaned_bucket.bucket_arn}/*',
+                        curated_bucket.bucket_arn,
+                        f'{curated_bucket.bucket_arn}/*'
+                    ]
+            ),
+            _iam.PolicyStatement(
+                    effect= _iam.Effect.ALLOW,
+                    actions= [
+                        "dynamodb:GetItem",
+                        "dynamodb:PutItem"
+                    ],
+                    resources= [
+                        lock_table_arn
+                    ]
+            ),
+            _iam.PolicyStatement(
+                    effect= _iam.Effect.ALLOW,
+                    actions= [
+                        "logs:CreateLogGroup",
+                        "logs:CreateLogStream",
+                        "logs:PutLogEvents"
+                    ],
+                    resources= [
+                        '*'
+                    ]
+            )]
+        )
+
+# ===================== COMPACTOR LAMBDA FUNCTION ========================
+
+        self.compactor_lambda = _lambda.Function(
+            self, 'compactor',
+            function_name=f'{self.stack_name}-compactor',
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            memory_size=1024,
+            timeout=Duration.minutes(15),
+            code=_lambda.Code.from_asset('src/lambda/compactor/'),
+            handler='compactor.handler',
+            role=compactor_lambda_role,
+            layers = [wrangler_lambda_layer, shared_lambda_layer],
             environment={
-                "CRAWLER_NAME": crawler_name
+                "COMPACTION_TARGETS": ",".join([
+                    f"{cleaned_bucket.bucket_name}:HealthAutoExport/",
+                    f"{cleaned_bucket.bucket_name}:Workouts/",
+                    f"{curated_bucket.bucket_name}:HealthData/",
+                    f"{curated_bucket.bucket_name}:Workouts/"
+                ]),
+                "COMPACTION_TARGET_FILE_BYTES": str(128 * 1024 * 1024),
+                "COMPACTION_MIN_FILES": "2",
+                "COMPACTION_ROW_GROUP_ROWS": "50000",
+                # Mesmas reservas do cleaner e do process; particao ocupada fica para a proxima execucao
+                "LOCK_TABLE_NAME": lock_table_name,
+                "LOCK_WAIT_SECONDS": "60",
+                "LOCK_TTL_SECONDS": "900",
+                "CURATED_BUCKET_NAME": curated_bucket.bucket_name,
+                "ROLLUPS": "true"
             }
         )
 
+# ========================================================================
+# ================== PROCESS LIGHT LAMBDA FUNCTIONS ======================
+# ========================================================================
+
+# ===================== PROCESS LIGHT LAMBDA ROLE ========================
+        process_light_lambda_role = _iam.Role(
+            self, 'process-light-lambda-role',
+            assumed_by= _iam.ServicePrincipal("lambda.amazonaws.com")
+        )
 
-# ========================================================================
\ No newline at end of file
+        process_light_lambda_policy = _iam.Policy(
+            self, 'process-light-lambda-role-policy',
+            roles=[process_light_lambda_role],
+            statements=[_iam.PolicyStatement(
+                    effect= _iam.Effect.ALLOW,
+                    actions= [
+                        "s3:GetBucketLocation",
+                        "s3:GetObject",
+                        "s3:ListBucket"
+                    ],
+                    resources= [
+                        cleaned_bucket.bucket_arn,
+                        f'{cleaned_bucket.bucket_arn}/*'
+                    ]
+            ),
+            _iam.PolicyStatement(
+                    effect= _iam.Effect.ALLOW,
+                    actions= [
+                        "s3:GetBucketLocation",
+                        "s3:GetObject",
+                        "s3:ListBucket",
+                        "s3:PutObject",
+                        "s3:DeleteObject"
+                    ],
+                    resources= [
+                        curated_bucket.bucket_arn,
+                        f'{curated_bucket.bucket_arn}/*'
+                    ]
+            ),
+            _iam.PolicyStatement(
+                    effect= _iam.Effect.ALLOW,
+                    actions= [
+                        "glue:GetTable",
+                        "glue:BatchCreatePartition"
+                    ],
+                    resources= [
+                        f'arn:aws:glue:{scope.region}:{scope.account}:catalog',
+                        f'arn:aws:glue:{scope.region}:{scope.account}:database/{catalog_database}',
+                        f'arn:aws:glue:{scope.region}:{scope.account}:table/{catalog_database}/*'
+                    ]
+            ),
+            _iam.PolicyStatement(
+                    effect= _iam.Effect.ALLOW,
+                    actions= [
+                        "logs:CreateLogGroup",
+                        "logs:CreateLogStream",
+                        "logs:PutLogEvents"
+                    ],
+                    resources= [
+                        '*'
+                    ]
+            )]
+        )
+
+        process_light_environment = {
+            "SOURCE_BUCKET_NAME": cleaned_bucket.bucket_name,
+            "DESTINATION_BUCKET_NAME": curated_bucket.bucket_name,
+            "ROLLUPS": "true",
+            "CATALOG_DATABASE": catalog_database,
+            "PARTITION_INDEX": "true",
+            # Acima deste volume de entrada o process roda no glue job (Spark)
+            "LIGHT_ENGINE_MAX_BYTES": str(256 * 1024 * 1024),
+            # Workers do glue job por execucao, pelo volume de entrada
+            "GLUE_MIN_WORKERS": str(glue_min_workers),
+            "GLUE_MAX_WORKERS": str(glue_max_workers),
+            "GLUE_BYTES_PER_WORKER": str(512 * 1024 * 1024)
+        }
+
+# ================= PLAN AND PROCESS LIGHT LAMBDA FUNCTIONS ==============
+
+        # Mede o volume de entrada e escolhe o engine do process
+        self.plan_process_lambda = _lambda.Function(
+            self, 'plan-process',
+            function_name=f'{self.stack_name}-plan-process',
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            memory_size=256,
+            timeout=Duration.minutes(1),
+            code=_lambda.Code.from_asset('src/lambda/process_light/'),
+            handler='process_light.plan_handler',
+            role=process_light_lambda_role,
+            layers = [wrangler_lambda_layer, shared_lambda_layer],
+            environment=process_light_environment
+        )
+
+        # Mesmas transformacoes do glue job em pandas/pyarrow, sem o startup do Spark
+        self.process_light_lambda = _lambda.Function(
+            self, 'process-light',
+            function_name=f'{self.stack_name}-process-light',
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            memory_size=2048,
+            timeout=Duration.minutes(15),
+            code=_lambda.Code.from_asset('src/lambda/process_light/'),
+            handler='process_light.handler',
+            role=process_light_lambda_role,
+            layers = [wrangler_lambda_layer, shared_lambda_layer],
+            environment=process_light_environment
+        )
+
+# ========================================================================
+# ================ FIREHOSE TRANSFORM LAMBDA FUNCTION ====================
+# ========================================================================
+
+# ==================== FIREHOSE TRANSFORM LAMBDA ROLE ====================
+        firehose_transform_lambda_role = _iam.Role(
+            self, 'firehose-transform-lambda-role',
+            assumed_by= _iam.ServicePrincipal("lambda.amazonaws.com")
+        )
+
+        firehose_transform_lambda_policy = _iam.Policy(
+            self, 'firehose-transform-lambda-role-policy',
+            roles=[firehose_transform_lambda_role],
+            statements=[_iam.PolicyStatement(
+                    effect= _iam.Effect.ALLOW,
+                    actions= [
+                        "logs:CreateLogGroup",
+                        "logs:CreateLogStream",
+                        "logs:PutLogEvents"
+                    ],
+                    resources= [
+                        '*'
+                    ]
+            )]
+        )
+
+# ================== FIREHOSE TRANSFORM LAMBDA FUNCTION ==================
+
+        # Valida e normaliza os lotes do delivery stream antes do bucket raw.
+        # RECORD_FORMAT e DYNAMIC_PARTITIONING sao definidos pelo delivery stream
+        self.firehose_transform_lambda = _lambda.Function(
+            self, 'firehose-transform',
+            function_name=f'{self.stack_name}-firehose-transform',
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            memory_size=512,
+            timeout=Duration.minutes(1),
+            code=_lambda.Code.from_asset('src/lambda/firehose_transform/'),
+            handler='firehose_transform.handler',
+            role=firehose_transform_lambda_role,
+            layers = [wrangler_lambda_layer, shared_lambda_layer],
+            environment={
+                "MAX_RECORD_BYTES": str(64 * 1024),
+                "AGGREGATE_MAX_BYTES": str(512 * 1024)
+            }
+        )
+
+
+# ========================================================================
@@ -8,12 +8,13 @@ from aws_cdk import (
 from .datalake.data.buckets import DatalakeBuckets
 from .datalake.data.glue_crawlers import DataCatalogs
 from .datalake.data.kinesis_firehose import DatalakeDeliveryStream
+from .datalake.data.lock_table import PartitionLockTable
 
 from .datalake.process_pipeline.lambdas import DatalakeLambdas
 from .datalake.process_pipeline.glue_job import DatalakeGlueJobs
 
 from .datalake.orchestration.stepfunctions import DatalakeProcessSTF
-from .datalake.orchestration.event_bridge import StfEventBridgeS3
+from .datalake.orchestration.event_bridge import StfBatchedEventBridgeS3, CompactionSchedule, CrawlerCompletionRule
 
 class HealthDataLakeStack(Stack):
 
@@ -32,45 +33,68 @@ class HealthDataLakeStack(Stack):
         # ========================== DATA CATALOG ================================
         # ========================================================================
 
-        data_stream = DatalakeDeliveryStream(
-            self, 'DatalakeDeliveryStream',
-            raw_bucket=raw_bucket
-        )
-
-        data_stream = data_stream.get_delivery_stream
-
-        # ========================================================================
-        # ========================= DATA STREAMING ===============================
-        # ========================================================================
-
+        # Projecao de particoes: o athena consulta um dia novo assim que o process grava
         data_catalogs = DataCatalogs(
             self, 'DataCatalogs',
-            curated_bucket=curated_bucket
+            curated_bucket=curated_bucket,
+            partition_projection=True
         )
 
         crawler_name = data_catalogs.get_crawler_name
+        catalog_database = data_catalogs.get_database_name
+
+        # Reservas de particoes entre execucoes concorrentes (cleaner e process)
+        lock_table = PartitionLockTable(
+            self, 'PartitionLockTable'
+        )
 
         # ========================================================================
         # ======================== PROCESS PIPELINE ==============================
         # ========================================================================
 
+        # Limites de workers do glue job; cada execucao usa o numero calculado
+        # pelo volume de entrada dentro deles
+        glue_min_workers, glue_max_workers = 2, 10
+
         lambda_functions = DatalakeLambdas(
             self, 'DatalakeLambdas',
             raw_bucket=raw_bucket,
             cleaned_bucket=cleaned_bucket,
             curated_bucket=curated_bucket,
             support_bucket=support_bucket,
-            crawler_name=crawler_name
+            crawler_name=crawler_name,
+            catalog_database=catalog_database,
+            lock_table_name=lock_table.get_table_name,
+            glue_min_workers=glue_min_workers,
+            glue_max_workers=glue_max_workers
         )
 
-        cleaner_lambda, invoke_crawler_lambda, check_crawler_lambda = lambda_functions.functions_list
+        cleaner_lambda, invoke_crawler_lambda, crawler_callback_lambda, compactor_lambda, \
+            plan_process_lambda, process_light_lambda, firehose_transform_lambda, \
+            dispatch_batch_lambda, claim_partitions_lambda, release_partitions_lambda = lambda_functions.functions_list
+
+        # ========================================================================
+        # ========================= DATA STREAMING ===============================
+        # ========================================================================
+
+        data_stream = DatalakeDeliveryStream(
+            self, 'DatalakeDeliveryStream',
+            raw_bucket=raw_bucket,
+            transform_lambda=firehose_transform_lambda
+        )
+
+        data_stream = data_stream.get_delivery_stream
 
 
         glue_jobs = DatalakeGlueJobs(
             self, 'DatalakeGlueJobs',
             cleaned_bucket=cleaned_bucket,
             curated_bucket=curated_bucket,
-            support_bucket=support_bucket
+            support_bucket=support_bucket,
+            catalog_database=catalog_database,
+            worker_type='G.1X',
+            number_of_workers=glue_max_workers,
+            auto_scaling=True
         )
 
         process_glue_job = glue_jobs.job_list
@@ -85,14 +109,32 @@ class HealthDataLakeStack(Stack):
             cleaner_lambda=cleaner_lambda,
             process_glue_job=process_glue_job,
             invoke_crawler_lambda=invoke_crawler_lambda,
-            check_crawler_lambda=check_crawler_lambda
+            compactor_lambda=compactor_lambda,
+            plan_process_lambda=plan_process_lambda,
+            process_light_lambda=process_light_lambda,
+            claim_partitions_lambda=claim_partitions_lambda,
+            release_partitions_lambda=release_partitions_lambda
         )
 
         state_machine = step_functions.get_stepfunctions
 
-        # Event Bridge definition
-        stf_event_from_s3 = StfEventBridgeS3(
-            self, 'StfEventBridgeS3',
+        # Event Bridge definition: eventos do raw acumulados em uma fila, uma
+        # execucao da step function por lote de arquivos
+        stf_event_from_s3 = StfBatchedEventBridgeS3(
+            self, 'StfBatchedEventBridgeS3',
             raw_bucket=raw_bucket,
-            state_machine=state_machine
-        )
\ No newline at end of file
+            dispatch_batch_lambda=dispatch_batch_lambda
+        )
+
+        # Compactacao diaria dos arquivos pequenos do cleaned e do curated
+        compaction_schedule = CompactionSchedule(
+            self, 'CompactionSchedule',
+            compactor_lambda=compactor_lambda
+        )
+
+        # Fim do crawler (quando a step function roda o crawler) retoma a execucao
+        crawler_completion_rule = CrawlerCompletionRule(
+            self, 'CrawlerCompletionRule',
+            crawler_name=crawler_name,
+            crawler_callback_lambda=crawler_callback_lambda
+        )
@@ -1,130 +1,397 @@
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, sum as sum_, mean, count, to_timestamp, round, year, month, dayofmonth, lit
-from pyspark.sql.types import NumericType
-
-spark = SparkSession.builder.appName("AppleHealth").getOrCreate()
-
-# today = datetime.today()
-# year = today.year
-# month = today.month
-# day = today.day
-
-today_year = '2025'
-today_month = '01'
-today_day = '30'
-
-source_bucket = 's3://health-datalake-dev-cleaned-ACCOUNT_ID'
-destination_bucket = 's3://health-datalake-dev-curated-ACCOUNT_ID'
-
-source_path = f"{source_bucket}/HealthAutoExport/year={int(today_year)}/month={int(today_month)}/day={int(today_day)}/"
-
-df_health = spark.read.option("header", "true").parquet(source_path)
-
-# Calculando kj para kcal com multiplicacao de 0.239
-df_health = df_health.withColumn(
-    "calorias_consumidas", col("dietary_energy_kJ") * 0.239
-).withColumn(
-    "calorias_gastas", (col("resting_energy_kj") + col("active_energy_kj")) * 0.239
-).withColumn(
-    "calorias_repouso_kcal", col("resting_energy_kj") * 0.239
-).withColumn(
-    "calorias_ativas_kcal", col("active_energy_kj") * 0.239
-).withColumn(
-    "batimentos_media_bpm", (col("heart_rate_max_bpm") + col("heart_rate_min_bpm")) / 2
+import argparse
+import math
+import sys
+from datetime import datetime
+
+from pyspark.sql import SparkSession, Window
+from pyspark.sql.functions import (
+    col, sum as sum_, mean, count, max as max_, min as min_, to_timestamp, to_date, round, year, month,
+    dayofmonth, date_trunc, trunc, datediff, format_string, lit, countDistinct, collect_set
 )
+from pyspark.sql.types import IntegerType, NumericType, StructField, StructType
+from pyspark.sql.utils import AnalysisException
 
-# Renomeando colunas para portugues e dimensoes corretas
-df_health = df_health.select(
-    col("date").alias("data"),
-    col("calorias_consumidas"),
-    col("calorias_gastas"),
-    col("calorias_repouso_kcal"),
-    col("calorias_ativas_kcal"),
-    col("walking__running_distance_km").alias("distancia_km"),
-    col("walking_speed_kmhr").alias("velocidade_caminhada_km_hr"),
-    col("heart_rate_max_bpm").alias("batimentos_max_bpm"),
-    col("heart_rate_min_bpm").alias("batimentos_min_bpm"),
-    col("batimentos_media_bpm"),
-    col("apple_stand_hour_hours").alias("tempo_em_pe_horas")
+from datalake_common.catalog import register_curated_partitions
+from datalake_common.partition_index import INDEXED_TABLES, index_aggregates, partition_stats, update_index
+from datalake_common.schemas import HEALTH_AUTO_EXPORT, WORKOUTS
+from datalake_common.transforms import (
+    PARTITION_COLS, DECIMALS, ROLLING_WINDOWS, HEALTH_COLUMNS, WORKOUT_DAY_AGGREGATES, HEALTH_DAY_AGGREGATES,
+    HEALTH_PERIOD_AGGREGATES, WORKOUT_PERIOD_AGGREGATES, HEALTH_ROLLING_METRICS, WORKOUT_ROLLING_METRICS,
+    CURATED_TABLES, date_range, partition_keys, rollup_days, table_partitions
 )
 
-# Forcando todas as colunas numericas a ficarem com 2 casas decimais
-numeric_cols = [field.name for field in df_health.schema.fields if isinstance(field.dataType, NumericType)]
+AGGREGATE_FUNCTIONS = {
+    'sum': sum_,
+    'mean': mean,
+    'max': max_,
+    'min': min_,
+    'count_distinct': countDistinct,
+    'values': collect_set
+}
 
-df_health = df_health.select(
-    *[round(col(c), 2).alias(c) if c in numeric_cols else col(c) for c in df_health.columns]
-)
+# Modos de execucao:
+#   range: processa as particoes entre --START_DATE e --END_DATE (padrao: hoje)
+#   all_new: processa as particoes do cleaned que ainda nao existem no curated
+MODES = ['range', 'all_new']
 
-df_health = df_health.withColumn('year', year(df_health['data'])) \
-        .withColumn('month', month(df_health['data'])) \
-        .withColumn('day', dayofmonth(df_health['data']))
+# Tamanho dos arquivos do curated: cada dia e gravado por uma unica task, com
+# no maximo TARGET_FILE_BYTES / (ROW_BYTES_PER_COLUMN * colunas) linhas por arquivo
+TARGET_FILE_BYTES = 128 * 1024 * 1024
+ROW_BYTES_PER_COLUMN = 8
 
-df_health.write \
-    .mode("append") \
-    .partitionBy("year", "month", "day") \
-    .parquet(f"{destination_bucket}/HealthData/")
+# Particoes do shuffle pelo tamanho dos parquet lidos do cleaned, o AQE ainda
+# junta as particoes pequenas depois de cada shuffle
+SHUFFLE_BYTES_PER_PARTITION = 32 * 1024 * 1024
+MAX_SHUFFLE_PARTITIONS = 200
 
 
-source_path = f"{source_bucket}/Workouts/year={int(today_year)}/month={int(today_month)}/day={int(today_day)}/"
+def resolve_args(argv):
+    # Mesmo formato do getResolvedOptions do glue (--CHAVE valor), ignorando
+    # os argumentos que o proprio glue adiciona (--JOB_ID, --TempDir...)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--SOURCE_BUCKET', default='s3://health-datalake-dev-cleaned-ACCOUNT_ID')
+    parser.add_argument('--DESTINATION_BUCKET', default='s3://health-datalake-dev-curated-ACCOUNT_ID')
+    parser.add_argument('--MODE', choices=MODES, default='range')
+    parser.add_argument('--START_DATE')
+    parser.add_argument('--END_DATE')
+    parser.add_argument('--ROLLUPS', choices=['true', 'false'], default='true')
+    # Database do catalogo onde as particoes gravadas sao registradas (vazio: nao registra)
+    parser.add_argument('--CATALOG_DATABASE', default='')
+    # Atualiza o indice de estatisticas por particao (_index/ no curated)
+    parser.add_argument('--PARTITION_INDEX', choices=['true', 'false'], default='true')
+    parser.add_argument('--TARGET_FILE_BYTES', type=int, default=TARGET_FILE_BYTES)
+    parser.add_argument('--SHUFFLE_BYTES_PER_PARTITION', type=int, default=SHUFFLE_BYTES_PER_PARTITION)
+    parser.add_argument('--MAX_SHUFFLE_PARTITIONS', type=int, default=MAX_SHUFFLE_PARTITIONS)
+    args, _ = parser.parse_known_args(argv)
 
-df_workout = spark.read.option("header", "true").parquet(source_path)
+    today = datetime.utcnow().date().isoformat()
+    args.START_DATE = args.START_DATE or args.END_DATE or today
+    args.END_DATE = args.END_DATE or args.START_DATE
+    if args.START_DATE > args.END_DATE:
+        raise ValueError(f'START_DATE {args.START_DATE} maior que END_DATE {args.END_DATE}')
+    return args
 
-df_workout = df_workout.select(
-    'workout_type',
-    'start',
-    'duration',
-    'active_energy_kcal',
-    'intensity_kcalhrkg',
-    'max_heart_rate_bpm',
-    'avg_heart_rate_bpm',
-    'step_count',
-    'distance_km'
-)
 
-# Renomeando colunas para portugues e dimensoes corretas
-df_workout = df_workout.withColumnRenamed('workout_type', 'tipo_de_exercicio') \
-    .withColumnRenamed('start', 'data') \
-    .withColumnRenamed('duration', 'duracao') \
-    .withColumnRenamed('active_energy_kcal', 'energia_ativa_kcal') \
-    .withColumnRenamed('intensity_kcalhrkg', 'intensidade_kcal_hr_kg') \
-    .withColumnRenamed('max_heart_rate_bpm', 'batimento_maximo_bpm') \
-    .withColumnRenamed('avg_heart_rate_bpm', 'batimento_medio_bpm') \
-    .withColumnRenamed('step_count', 'quantidade_de_passos') \
-    .withColumnRenamed('distance_km', 'distancia_km')
-
-df_workout = df_workout.withColumn("duracao", to_timestamp(col("duracao"), "HH:mm:ss"))
-
-df_agrupado = df_workout.groupBy("tipo_de_exercicio").agg(
-    sum_("duracao").alias("duracao_min"),
-    sum_("energia_ativa_kcal").alias("energia_ativa_kcal"),
-    mean("intensidade_kcal_hr_kg").alias("intensidade_kcal_hr_kg"),
-    mean("batimento_maximo_bpm").alias("batimento_maximo_bpm"),
-    mean("batimento_medio_bpm").alias("batimento_medio_bpm"),
-    sum_("quantidade_de_passos").alias("quantidade_de_passos"),
-    sum_("distancia_km").alias("distancia_km")
-)
+def partition_key():
+    # Chave yyyymmdd so com colunas de particao, o spark usa no partition pruning
+    return col('year') * 10000 + col('month') * 100 + col('day')
 
-df_agrupado = df_agrupado.withColumn("duracao_min", round(col("duracao_min") / 60, 2))
 
-# Calculando a quantidade de exercícios de cada tipo feito no dia
-quantidade_exercicio = df_workout.groupBy("tipo_de_exercicio").agg(
-    count("*").alias("quantidade_no_dia")
-)
+def partitioned_schema(spark_schema):
+    return StructType(spark_schema.fields + [StructField(column, IntegerType()) for column in PARTITION_COLS])
 
-df_agrupado = df_agrupado.join(quantidade_exercicio, on="tipo_de_exercicio", how="inner")
 
-# Forcando todas as colunas numericas a ficarem com 2 casas decimais
-numeric_cols = [field.name for field in df_agrupado.schema.fields if isinstance(field.dataType, NumericType)]
+def read_partitions(spark, base_path, spark_schema, partitions):
+    # Um unico scan do dataset com filtro nas colunas de particao, o spark so
+    # lista e le os diretorios year=/month=/day= que passam no filtro
+    reader = spark.read
+    if spark_schema is not None:
+        reader = reader.schema(partitioned_schema(spark_schema))
+    return reader.parquet(base_path).where(partition_key().isin(partition_keys(partitions)))
 
-df_agrupado = df_agrupado.select(
-    *[round(col(c), 2).alias(c) if c in numeric_cols else col(c) for c in df_agrupado.columns]
-)
 
-df_agrupado = df_agrupado.withColumn('year', lit(int(today_year))) \
-        .withColumn('month', lit(int(today_month))) \
-        .withColumn('day', lit(int(today_day)))
+def list_partitions(spark, base_path):
+    # Particoes existentes, lidas so das colunas de particao (sem abrir os dados)
+    try:
+        rows = spark.read.parquet(base_path).select(*PARTITION_COLS).distinct().collect()
+    except AnalysisException:
+        return set()
+    return {(row['year'], row['month'], row['day']) for row in rows}
+
+
+def new_partitions(spark, source_bucket, destination_bucket):
+    # Diferenca por dataset: dia so com dados de saude (ou so de treinos) nunca
+    # aparece nas duas tabelas do curated e seria reprocessado em toda execucao
+    health = list_partitions(spark, f"{source_bucket}/{HEALTH_AUTO_EXPORT.name}/") - \
+        list_partitions(spark, f"{destination_bucket}/HealthData/")
+    workouts = list_partitions(spark, f"{source_bucket}/{WORKOUTS.name}/") - \
+        list_partitions(spark, f"{destination_bucket}/Workouts/")
+    return sorted(health | workouts)
+
+
+def input_bytes(spark, base_path, partitions):
+    # Soma o tamanho dos arquivos nas particoes, pelo FileSystem do hadoop
+    # (s3 no glue, disco local nos testes)
+    jvm = spark.sparkContext._jvm
+    conf = spark.sparkContext._jsc.hadoopConfiguration()
+
+    total = 0
+    for year, month, day in partitions:
+        path = jvm.org.apache.hadoop.fs.Path(f"{base_path}year={year}/month={month}/day={day}")
+        fs = path.getFileSystem(conf)
+        if fs.exists(path):
+            total += fs.getContentSummary(path).getLength()
+    return total
+
+
+def written_partitions(spark, base_path, partitions):
+    # Particoes que tem diretorio apos a escrita. O overwrite dinamico so cria
+    # os dias presentes no df, dias sem dados nao vao para o catalogo
+    jvm = spark.sparkContext._jvm
+    conf = spark.sparkContext._jsc.hadoopConfiguration()
+
+    written = []
+    for year, month, day in partitions:
+        path = jvm.org.apache.hadoop.fs.Path(f"{base_path}year={year}/month={month}/day={day}")
+        if path.getFileSystem(conf).exists(path):
+            written.append((year, month, day))
+    return written
+
+
+def shuffle_partitions(size, bytes_per_partition=SHUFFLE_BYTES_PER_PARTITION, maximum=MAX_SHUFFLE_PARTITIONS):
+    return min(maximum, max(1, math.ceil(size / bytes_per_partition)))
+
+
+def configure_shuffle(spark, size, args):
+    # AQE (desligado por padrao no Spark 3.1 do glue 3.0) junta as particoes
+    # pequenas do shuffle; sem parallelismFirst o Spark 3.2+ usa o tamanho
+    # alvo em vez do paralelismo do cluster
+    partitions = shuffle_partitions(size, args.SHUFFLE_BYTES_PER_PARTITION, args.MAX_SHUFFLE_PARTITIONS)
+    spark.conf.set("spark.sql.adaptive.enabled", "true")
+    spark.conf.set("spark.sql.adaptive.coalescePartitions.enabled", "true")
+    spark.conf.set("spark.sql.adaptive.coalescePartitions.parallelismFirst", "false")
+    spark.conf.set("spark.sql.adaptive.advisoryPartitionSizeInBytes", str(args.SHUFFLE_BYTES_PER_PARTITION))
+    spark.conf.set("spark.sql.shuffle.partitions", str(partitions))
+    return partitions
+
+
+def max_records_per_file(df, target_file_bytes=TARGET_FILE_BYTES):
+    columns = len(df.columns) - len(PARTITION_COLS)
+    return max(1, target_file_bytes // (ROW_BYTES_PER_COLUMN * columns))
+
+
+def write_partitions(df, path, target_file_bytes=TARGET_FILE_BYTES):
+    # Overwrite dinamico: so as particoes presentes no df sao substituidas,
+    # reprocessar um periodo nao duplica linhas nem apaga os outros dias.
+    # O repartition pelas colunas de particao manda cada dia para uma unica
+    # task (um arquivo por dia em vez de um por particao do shuffle), dividido
+    # so quando passa do maxRecordsPerFile
+    df.repartition(*PARTITION_COLS).write \
+        .mode("overwrite") \
+        .option("partitionOverwriteMode", "dynamic") \
+        .option("maxRecordsPerFile", max_records_per_file(df, target_file_bytes)) \
+        .partitionBy(*PARTITION_COLS) \
+        .parquet(path)
+
+
+def partition_date():
+    return to_date(format_string('%04d-%02d-%02d', col('year'), col('month'), col('day')))
+
+
+def with_partition_columns(df, date_column):
+    return df.withColumn('year', year(col(date_column))) \
+        .withColumn('month', month(col(date_column))) \
+        .withColumn('day', dayofmonth(col(date_column)))
+
+
+def round_numeric_columns(df):
+    # Forcando todas as colunas numericas a ficarem com 2 casas decimais
+    numeric_cols = [field.name for field in df.schema.fields if isinstance(field.dataType, NumericType)]
+
+    return df.select(
+        *[round(col(c), DECIMALS).alias(c) if c in numeric_cols else col(c) for c in df.columns]
+    )
+
+
+def aggregations(aggregates):
+    return [
+        (count("*") if function == 'count' else AGGREGATE_FUNCTIONS[function](source)).alias(output)
+        for output, function, source in aggregates
+    ]
+
+
+def select_table(df, table, *extra_columns):
+    # Colunas na ordem da definicao da tabela no datalake_common.transforms
+    return df.select(*[column for column, _ in CURATED_TABLES[table]], *extra_columns)
+
+
+def transform_health(df_health):
+    # Renomeando colunas para portugues e convertendo unidades (kJ para kcal com o fator do schema)
+    df_health = df_health.select(*[
+        (col(column.normalized) * column.factor if column.factor else col(column.normalized)).alias(column.curated)
+        for column in HEALTH_AUTO_EXPORT.columns
+    ])
+
+    df_health = df_health.withColumn(
+        "calorias_gastas", col("calorias_repouso_kcal") + col("calorias_ativas_kcal")
+    ).withColumn(
+        "batimentos_media_bpm", (col("batimentos_max_bpm") + col("batimentos_min_bpm")) / 2
+    )
+
+    df_health = df_health.select(*HEALTH_COLUMNS)
+
+    df_health = round_numeric_columns(df_health)
+
+    return with_partition_columns(df_health, 'data')
+
+
+def transform_workouts(df_workout):
+    # Renomeando colunas para portugues e dimensoes corretas
+    df_workout = df_workout.select(*[
+        col(column.normalized).alias(column.curated) for column in WORKOUTS.columns
+    ])
+
+    df_workout = with_partition_columns(
+        df_workout.withColumn("duracao", to_timestamp(col("duracao"), "HH:mm:ss")), 'data')
+
+    # Agregados por dia e tipo de exercicio em um unico groupBy, incluindo a
+    # quantidade de exercicios de cada tipo feito no dia
+    df_agrupado = df_workout.groupBy("tipo_de_exercicio", *PARTITION_COLS).agg(*aggregations(WORKOUT_DAY_AGGREGATES))
+
+    df_agrupado = df_agrupado.withColumn("duracao_min", round(col("duracao_min") / 60, DECIMALS))
+
+    df_agrupado = round_numeric_columns(df_agrupado)
+
+    return select_table(df_agrupado, 'Workouts', *PARTITION_COLS)
+
+
+def daily_health(df_health):
+    return df_health.groupBy(*PARTITION_COLS).agg(*aggregations(HEALTH_DAY_AGGREGATES)) \
+        .withColumn("dia", partition_date())
+
+
+def period_start(period):
+    # period: week (semana comecando na segunda) ou month
+    if period == 'week':
+        return to_date(date_trunc('week', col('dia')))
+    return trunc(col('dia'), 'month')
+
+
+def health_period_rollup(df_daily, period):
+    df_rollup = df_daily.withColumn("inicio", period_start(period)) \
+        .groupBy("inicio").agg(*aggregations(HEALTH_PERIOD_AGGREGATES))
+
+    return with_partition_columns(round_numeric_columns(df_rollup), "inicio")
+
+
+def workouts_period_rollup(df_workout, period):
+    df_rollup = df_workout.withColumn("dia", partition_date()) \
+        .withColumn("inicio", period_start(period)) \
+        .groupBy("tipo_de_exercicio", "inicio").agg(*aggregations(WORKOUT_PERIOD_AGGREGATES))
+
+    return with_partition_columns(round_numeric_columns(df_rollup), "inicio")
+
+
+def rolling_window(days, partition_by=()):
+    # Janela em dias de calendario (rangeBetween), dias sem dados nao contam como linhas
+    return Window.partitionBy(*partition_by) \
+        .orderBy(datediff(col('dia'), lit('1970-01-01'))) \
+        .rangeBetween(1 - days, 0)
+
+
+def health_rolling(df_daily, output_partitions):
+    # Medias moveis dos totais diarios
+    df_rolling = df_daily.select("dia", *PARTITION_COLS, *HEALTH_ROLLING_METRICS)
+    for days in ROLLING_WINDOWS:
+        window = rolling_window(days)
+        for metric in HEALTH_ROLLING_METRICS:
+            df_rolling = df_rolling.withColumn(f"{metric}_media_{days}d", mean(metric).over(window))
+
+    df_rolling = df_rolling.where(partition_key().isin(partition_keys(output_partitions)))
+    return select_table(round_numeric_columns(df_rolling), 'HealthRolling', *PARTITION_COLS)
+
+
+def workouts_rolling(df_workout, output_partitions):
+    # Media diaria por tipo de exercicio na janela: soma da janela / dias da janela
+    df_rolling = df_workout.withColumn("dia", partition_date()) \
+        .select("tipo_de_exercicio", "dia", *PARTITION_COLS, *WORKOUT_ROLLING_METRICS)
+    for days in ROLLING_WINDOWS:
+        window = rolling_window(days, ["tipo_de_exercicio"])
+        for metric in WORKOUT_ROLLING_METRICS:
+            df_rolling = df_rolling.withColumn(f"{metric}_media_{days}d", sum_(metric).over(window) / days)
+
+    df_rolling = df_rolling.where(partition_key().isin(partition_keys(output_partitions)))
+    return select_table(round_numeric_columns(df_rolling), 'WorkoutsRolling', *PARTITION_COLS)
+
+
+def run_rollups(spark, destination_bucket, partitions, target_file_bytes=TARGET_FILE_BYTES):
+    # Incremental: cada execucao recalcula so os buckets (semanas, meses e dias da
+    # janela movel) que contem os dias processados, lendo do curated diario apenas
+    # os dias desses buckets. Recalcular em vez de somar o dia novo ao total
+    # mantem o resultado correto quando um dia e reprocessado
+    days = rollup_days(partitions)
+    health_path = f"{destination_bucket}/HealthData/"
+    workouts_path = f"{destination_bucket}/Workouts/"
+
+    df_health = daily_health(read_partitions(spark, health_path, None, days['weekly']))
+    write_partitions(health_period_rollup(df_health, 'week'), f"{destination_bucket}/HealthWeekly/", target_file_bytes)
+    df_health = daily_health(read_partitions(spark, health_path, None, days['monthly']))
+    write_partitions(health_period_rollup(df_health, 'month'), f"{destination_bucket}/HealthMonthly/",
+                     target_file_bytes)
+    df_health = daily_health(read_partitions(spark, health_path, None, days['rolling']))
+    write_partitions(health_rolling(df_health, days['rolling_output']), f"{destination_bucket}/HealthRolling/",
+                     target_file_bytes)
+
+    df_workout = read_partitions(spark, workouts_path, None, days['weekly'])
+    write_partitions(workouts_period_rollup(df_workout, 'week'), f"{destination_bucket}/WorkoutsWeekly/",
+                     target_file_bytes)
+    df_workout = read_partitions(spark, workouts_path, None, days['monthly'])
+    write_partitions(workouts_period_rollup(df_workout, 'month'), f"{destination_bucket}/WorkoutsMonthly/",
+                     target_file_bytes)
+    df_workout = read_partitions(spark, workouts_path, None, days['rolling'])
+    write_partitions(workouts_rolling(df_workout, days['rolling_output']), f"{destination_bucket}/WorkoutsRolling/",
+                     target_file_bytes)
+
+
+def update_partition_index(spark, destination_bucket, partitions):
+    # Estatisticas lidas das particoes gravadas nesta execucao, o indice guarda
+    # exatamente o que esta no curated
+    months = {}
+    for table in INDEXED_TABLES:
+        df = read_partitions(spark, f"{destination_bucket}/{table}/", None, partitions)
+        rows = df.groupBy(*PARTITION_COLS).agg(*aggregations(index_aggregates(table))).collect()
+        months[table] = update_index(destination_bucket, table, partition_stats([row.asDict() for row in rows], table))
+    return months
+
+
+def run(spark, args):
+    if args.MODE == 'all_new':
+        partitions = new_partitions(spark, args.SOURCE_BUCKET, args.DESTINATION_BUCKET)
+    else:
+        partitions = date_range(args.START_DATE, args.END_DATE)
+
+    print(f"Processando {len(partitions)} particoes ({args.MODE}): {partitions[:1]} ate {partitions[-1:]}")
+    if not partitions:
+        return partitions
+
+    size = sum(input_bytes(spark, f"{args.SOURCE_BUCKET}/{dataset.name}/", partitions)
+               for dataset in (HEALTH_AUTO_EXPORT, WORKOUTS))
+    shuffle = configure_shuffle(spark, size, args)
+    print(f"Entrada: {size} bytes, {shuffle} particoes de shuffle")
+
+    df_health = read_partitions(spark, f"{args.SOURCE_BUCKET}/{HEALTH_AUTO_EXPORT.name}/",
+                                HEALTH_AUTO_EXPORT.spark_read_schema(), partitions)
+    write_partitions(transform_health(df_health), f"{args.DESTINATION_BUCKET}/HealthData/", args.TARGET_FILE_BYTES)
+
+    df_workout = read_partitions(spark, f"{args.SOURCE_BUCKET}/{WORKOUTS.name}/",
+                                 WORKOUTS.spark_read_schema(), partitions)
+    write_partitions(transform_workouts(df_workout), f"{args.DESTINATION_BUCKET}/Workouts/", args.TARGET_FILE_BYTES)
+
+    if args.PARTITION_INDEX == 'true':
+        months = update_partition_index(spark, args.DESTINATION_BUCKET, partitions)
+        print(f"Indice de particoes atualizado: {months}")
+
+    if args.ROLLUPS == 'true':
+        run_rollups(spark, args.DESTINATION_BUCKET, partitions, args.TARGET_FILE_BYTES)
+
+    if args.CATALOG_DATABASE:
+        written = {
+            table: written_partitions(spark, f"{args.DESTINATION_BUCKET}/{table}/", candidates)
+            for table, candidates in table_partitions(partitions, args.ROLLUPS == 'true').items()
+        }
+        created = register_curated_partitions(args.CATALOG_DATABASE, written)
+        print(f"Particoes registradas no catalogo: {created}")
+
+    return partitions
+
+
+def main():
+    args = resolve_args(sys.argv[1:])
+
+    spark = SparkSession.builder.appName("AppleHealth").getOrCreate()
+
+    run(spark, args)
+
 
-df_agrupado.write \
-    .mode("append") \
-    .partitionBy("year", "month", "day") \
-    .parquet(f"{destination_bucket}/Workouts/")
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import io
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+# Leitura e escrita no s3 so com pyarrow e boto3, sem awswrangler. Usado pelo
+# pacote otimizado do cleaner (CLEANER_IO=arrow): camada menor e import mais
+# rapido no cold start. Mesmo layout do awswrangler (dataset particionado,
+# colunas de particao so no caminho)
+
+
+def split_path(path):
+    bucket, _, key = path[len('s3://'):].partition('/')
+    return bucket, key
+
+
+def read_object(client, path):
+    bucket, key = split_path(path)
+    return pa.BufferReader(client.get_object(Bucket=bucket, Key=key)['Body'].read())
+
+
+def list_keys(client, path):
+    bucket, prefix = split_path(path)
+    paginator = client.get_paginator('list_objects_v2')
+    return [
+        item['Key'] for page in paginator.paginate(Bucket=bucket, Prefix=prefix)
+        for item in page.get('Contents', [])
+    ]
+
+
+def read_csv(client, path, schema):
+    table = pa_csv.read_csv(
+        read_object(client, path),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=schema.source_columns,
+            column_types=schema.arrow_read_types()
+        )
+    )
+    return table.to_pandas()
+
+
+def iter_parquet(client, path, columns, batch_rows):
+    parquet_file = pq.ParquetFile(read_object(client, path))
+    for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=columns):
+        yield batch.to_pandas()
+
+
+def read_dataset(client, path):
+    # Todos os parquet abaixo do prefixo (uma particao), None quando nao ha arquivos
+    bucket, _ = split_path(path)
+    keys = [key for key in list_keys(client, path) if key.endswith('.parquet')]
+    if not keys:
+        return None
+
+    frames = [pq.read_table(read_object(client, f's3://{bucket}/{key}')).to_pandas() for key in keys]
+    return pd.concat(frames, ignore_index=True)
+
+
+def write_partitions(client, df, path, partition_cols, overwrite, write_kwargs):
+    # Um arquivo por particao. No overwrite os arquivos antigos so sao removidos
+    # depois do novo gravado, a particao nunca fica vazia
+    bucket, prefix = split_path(path)
+    compression = write_kwargs.get('compression', 'snappy')
+
+    for values, rows in df.groupby(partition_cols):
+        partition_prefix = prefix + ''.join(f'{column}={value}/' for column, value in zip(partition_cols, values))
+        old_keys = list_keys(client, f's3://{bucket}/{partition_prefix}') if overwrite else []
+
+        buffer = io.BytesIO()
+        table = pa.Table.from_pandas(rows.drop(columns=partition_cols), preserve_index=False)
+        pq.write_table(table, buffer, **write_kwargs)
+        client.put_object(Bucket=bucket, Key=f'{partition_prefix}{uuid.uuid4().hex}.{compression}.parquet',
+                          Body=buffer.getvalue())
+
+        for start in range(0, len(old_keys), 1000):
+            client.delete_objects(Bucket=bucket, Delete={
+                'Objects': [{'Key': key} for key in old_keys[start:start + 1000]]
+            })
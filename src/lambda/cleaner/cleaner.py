@@ -1,110 +1,555 @@
-import awswrangler as wr
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import boto3
 import pandas as pd
-from datetime import datetime
-
-# today = datetime.today()
-# year = today.year
-# month = today.month
-# day = today.day
-
-YEAR = '2025'
-MONTH = '01'
-DAY = '30'
-
-SOURCE_BUCKET = 's3://health-datalake-dev-raw-ACCOUNT_ID'
-DESTINATION_BUCKET = 's3://health-datalake-dev-cleaned-ACCOUNT_ID'
-
-def process_health_data(source_bucket, destination_bucket, year, month, day):
-    source_data_path = f'HealthAutoExport-{year}-{month}-{day}-{year}-{month}-{day}.csv'
-    source_path = f'{source_bucket}/{source_data_path}'
-
-    destination_data_path = 'HealthAutoExport/'
-    destination_path = f'{destination_bucket}/{destination_data_path}'
-
-    df = wr.s3.read_csv(source_path, index_col=False)
-
-    df = df[[
-        "Date",
-        "Dietary Energy (kJ)",
-        "Resting Energy (kJ)",
-        "Active Energy (kJ)",
-        "Heart Rate [Max] (bpm)",
-        "Heart Rate [Min] (bpm)",
-        "Walking + Running Distance (km)",
-        "Walking Speed (km/hr)",
-        "Apple Stand Hour (hours)"
-    ]]
-
-    # Remover caracteres especiais
-    df.columns = df.columns.str.replace(r'[^a-zA-Z0-9\s]', '', regex=True)
-
-    # Trocar espaços por _ 
-    df.columns = df.columns.str.replace(' ', '_')
-
-    # Colocar tudo em minúsculas
-    df.columns = df.columns.str.lower()
-
-    df['date'] = pd.to_datetime(df['date'])
-    df['year'] = df['date'].dt.year
-    df['month'] = df['date'].dt.month
-    df['day'] = df['date'].dt.day
-
-    df.head()
-
-    wr.s3.to_parquet(df=df, 
-        path=destination_path, 
-        dataset=True, 
-        mode='append',
-        partition_cols=['year', 'month', 'day']
-    )
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+import arrow_io
+from datalake_common.locks import PartitionBusy, PartitionLocks, DynamoDBLockStore, partition_lock_keys
+from datalake_common.quality import split_quality
+from datalake_common.schemas import HEALTH_AUTO_EXPORT, WORKOUTS, SCHEMAS, dataset_for_key
+from ledger import ProcessedLedger
+
+DESTINATION_BUCKET = f"s3://{os.environ.get('DESTINATION_BUCKET_NAME', 'health-datalake-dev-cleaned-ACCOUNT_ID')}"
+LEDGER_BUCKET = os.environ.get('LEDGER_BUCKET_NAME')
+LEDGER_PREFIX = os.environ.get('LEDGER_PREFIX', 'ledger/cleaner/')
+
+# whole: le o csv inteiro / stream: le em blocos / auto: decide pelo tamanho do objeto
+READ_MODE = os.environ.get('CLEANER_READ_MODE', 'auto')
+STREAMING_THRESHOLD_BYTES = int(os.environ.get('STREAMING_THRESHOLD_BYTES', 64 * 1024 * 1024))
+STREAMING_CHUNK_ROWS = int(os.environ.get('STREAMING_CHUNK_ROWS', 250000))
+# O leitor do pyarrow faz leitura antecipada de varios blocos, entao o bloco
+# precisa ser pequeno para a memoria nao crescer junto com o arquivo
+STREAMING_BLOCK_BYTES = int(os.environ.get('STREAMING_BLOCK_BYTES', 1024 * 1024))
+
+# upsert: regrava so as particoes afetadas sem duplicatas / append: so acrescenta
+WRITE_MODE = os.environ.get('CLEANER_WRITE_MODE', 'upsert')
+PARTITION_COLS = ['year', 'month', 'day']
+# Timestamps em ms, o Spark do glue nao le parquet com timestamps em nanossegundos.
+# O awswrangler altera o dict recebido, por isso cada escrita passa uma copia
+PARQUET_WRITE_KWARGS = {'coerce_timestamps': 'ms', 'allow_truncated_timestamps': True}
+# Layout dos arquivos de dados. tuned: zstd, linhas em ordem de data e row groups
+# de tamanho fixo (o min/max de cada row group deixa o Spark pular os blocos fora
+# do filtro), dicionario nas colunas do schema / legacy: snappy e padroes do pyarrow.
+# As metricas continuam float64: o Spark nao le float32 com o DoubleType do process
+PARQUET_LAYOUT = os.environ.get('CLEANER_PARQUET_LAYOUT', 'tuned')
+PARQUET_COMPRESSION = os.environ.get('CLEANER_PARQUET_COMPRESSION', 'zstd')
+PARQUET_ROW_GROUP_ROWS = int(os.environ.get('CLEANER_PARQUET_ROW_GROUP_ROWS', 50000))
+
+# Regras de qualidade do schema: linhas que falham vao para o prefixo de
+# quarentena do cleaned com os motivos, em vez de chegar no process
+QUALITY_CHECKS = os.environ.get('CLEANER_QUALITY_CHECKS', 'true') == 'true'
+QUARANTINE_PREFIX = os.environ.get('QUARANTINE_PREFIX', 'quarantine/')
+
+# Arquivos processados em paralelo, o tempo fica perto do arquivo mais lento
+MAX_WORKERS = int(os.environ.get('CLEANER_MAX_WORKERS', 4))
+
+# Leitura e escrita no s3. wrangler: awswrangler (pacote legado) / arrow: so
+# pyarrow e boto3 (pacote otimizado, sem awswrangler na camada)
+IO_BACKEND = os.environ.get('CLEANER_IO', 'wrangler')
+
+# Reserva das particoes entre execucoes concorrentes (tabela do DynamoDB). Sem a
+# tabela so os arquivos da mesma invocacao sao serializados (lock de thread)
+LOCK_TABLE = os.environ.get('LOCK_TABLE_NAME')
+LOCK_WAIT_SECONDS = int(os.environ.get('LOCK_WAIT_SECONDS', 120))
+LOCK_TTL_SECONDS = int(os.environ.get('LOCK_TTL_SECONDS', 300))
+
+# Clientes e threads reaproveitados entre invocacoes da mesma instancia da lambda
+_thread_local = threading.local()
+_executor = None
+
+def wrangler():
+    # Importado so no primeiro uso, o import do awswrangler pesa no cold start
+    import awswrangler
+    return awswrangler
 
-def process_workout_data(source_bucket, destination_bucket, year, month, day):
-    source_data_path = f'Workouts-{year}{month}{day}_000000-{year}{month}{day}_235959.csv'
-    source_path = f'{source_bucket}/{source_data_path}'
-
-    destination_data_path = 'Workouts/'
-    destination_path = f'{destination_bucket}/{destination_data_path}'
-
-    df = wr.s3.read_csv(source_path, index_col=False)
-
-    df = df[[
-        'Workout Type',
-        'Start',
-        'Duration',
-        'Active Energy (kcal)',
-        'Intensity (kcal/hr·kg)',
-        'Max. Heart Rate (bpm)',
-        'Avg. Heart Rate (bpm)',
-        'Step Count',
-        'Distance (km)'
-    ]]
-
-    # Remover caracteres especiais
-    df.columns = df.columns.str.replace(r'[^a-zA-Z0-9\s]', '', regex=True)
-
-    # Trocar espaços por _ 
-    df.columns = df.columns.str.replace(' ', '_')
-
-    # Colocar tudo em minúsculas
-    df.columns = df.columns.str.lower()
-
-    df['start'] = pd.to_datetime(df['start'])
-    df['year'] = df['start'].dt.year
-    df['month'] = df['start'].dt.month
-    df['day'] = df['start'].dt.day
-
-    wr.s3.to_parquet(df=df, 
-        path=destination_path, 
-        dataset=True, 
-        mode='append',
-        partition_cols=['year', 'month', 'day']
+def s3_client():
+    # Um cliente por thread porque o boto3.client() da sessao padrao nao e thread safe
+    client = getattr(_thread_local, 's3_client', None)
+    if client is None:
+        client = _thread_local.s3_client = boto3.session.Session().client('s3')
+    return client
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max(1, MAX_WORKERS))
+    return _executor
+
+def open_source(source_path):
+    if source_path.startswith('s3://'):
+        bucket, key = source_path[len('s3://'):].split('/', 1)
+        return s3_client().get_object(Bucket=bucket, Key=key)['Body']
+    return open(source_path, 'rb')
+
+def read_csv_whole(source_path, schema):
+    if source_path.startswith('s3://') and IO_BACKEND == 'arrow':
+        df = arrow_io.read_csv(s3_client(), source_path, schema)
+    elif source_path.startswith('s3://'):
+        df = wrangler().s3.read_csv(source_path, index_col=False)
+    else:
+        df = pd.read_csv(source_path, index_col=False)
+
+    df = df[schema.source_columns]
+
+    # Mesmos tipos numericos do caminho em blocos para manter o schema do parquet
+    for column in schema.columns:
+        if column.dtype == 'double':
+            df[column.source] = df[column.source].astype('float64')
+
+    yield df
+
+def read_csv_stream(source_path, schema, chunk_rows=None, block_bytes=None):
+    # Le somente as colunas necessarias, com tipos fixos para todos os blocos
+    # terem o mesmo schema, e entrega um DataFrame a cada chunk_rows linhas
+    chunk_rows = chunk_rows or STREAMING_CHUNK_ROWS
+    block_bytes = block_bytes or STREAMING_BLOCK_BYTES
+
+    reader = pa_csv.open_csv(
+        open_source(source_path),
+        read_options=pa_csv.ReadOptions(block_size=block_bytes),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=schema.source_columns,
+            column_types=schema.arrow_read_types()
+        )
     )
 
+    batches = []
+    buffered_rows = 0
+    for batch in reader:
+        batches.append(batch)
+        buffered_rows += batch.num_rows
+        if buffered_rows >= chunk_rows:
+            yield pa.Table.from_batches(batches).to_pandas()
+            batches = []
+            buffered_rows = 0
+
+    if buffered_rows:
+        yield pa.Table.from_batches(batches).to_pandas()
+
+def read_parquet_chunks(source_path, schema):
+    # Parquet convertido pelo firehose, ja com os nomes normalizados do schema
+    columns = schema.normalized_columns
+    if source_path.startswith('s3://') and IO_BACKEND == 'arrow':
+        yield from arrow_io.iter_parquet(s3_client(), source_path, columns, STREAMING_CHUNK_ROWS)
+    elif source_path.startswith('s3://'):
+        yield from wrangler().s3.read_parquet(source_path, columns=columns, chunked=STREAMING_CHUNK_ROWS)
+    else:
+        for batch in pq.ParquetFile(source_path).iter_batches(batch_size=STREAMING_CHUNK_ROWS, columns=columns):
+            yield batch.to_pandas()
+
+def json_columns(df, schema):
+    # Colunas do schema com o nome normalizado (lambda de transformacao) ou o
+    # cabecalho do export (registros sem transformacao), ausentes como nulo
+    columns = {}
+    for column in schema.columns:
+        values = pd.Series(None, index=df.index, dtype=object)
+        for name in (column.normalized, column.source):
+            if name in df.columns:
+                values = values.combine_first(df[name])
+        columns[column.normalized] = values.astype('float64') if column.dtype == 'double' else values
+    return pd.DataFrame(columns, index=df.index)
+
+def read_json_lines(source_path):
+    source = open_source(source_path)
+    if source_path.endswith('.gz'):
+        source = gzip.GzipFile(fileobj=source)
+    try:
+        # iter_lines do corpo do s3 (a iteracao padrao do IOBase le byte a byte)
+        for line in source.iter_lines() if hasattr(source, 'iter_lines') else source:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        source.close()
+
+def read_json_lines_chunks(source_path, schema):
+    # Firehose sem conversao para parquet: um documento json por linha, sem
+    # extensao no nome (.gz com a compressao GZIP do delivery stream)
+    documents = []
+    for document in read_json_lines(source_path):
+        documents.append(document)
+        if len(documents) >= STREAMING_CHUNK_ROWS:
+            yield json_columns(pd.DataFrame(documents), schema)
+            documents = []
+    if documents:
+        yield json_columns(pd.DataFrame(documents), schema)
+
+def read_source_chunks(source_path, schema, streaming):
+    if source_path.endswith('.parquet'):
+        return read_parquet_chunks(source_path, schema)
+    if not source_path.endswith('.csv'):
+        # So objetos roteados pelo prefixo do dataset chegam aqui sem .csv
+        return read_json_lines_chunks(source_path, schema)
+    if streaming:
+        return read_csv_stream(source_path, schema)
+    return read_csv_whole(source_path, schema)
+
+def use_streaming(size):
+    if READ_MODE == 'auto':
+        return size is not None and size > STREAMING_THRESHOLD_BYTES
+    return READ_MODE == 'stream'
+
+def clean_column_names(df, schema):
+    # Nomes normalizados vem do schema, sem regex por arquivo
+    return df.rename(columns=schema.rename_map)
+
+def add_partition_columns(df, date_column):
+    df[date_column] = pd.to_datetime(df[date_column])
+    df['year'] = df[date_column].dt.year
+    df['month'] = df[date_column].dt.month
+    df['day'] = df[date_column].dt.day
+
+    return df
+
+def parquet_options(schema):
+    # Argumentos do pq.write_table para os arquivos de dados do cleaned
+    if PARQUET_LAYOUT == 'legacy':
+        return {**PARQUET_WRITE_KWARGS, 'compression': 'snappy'}
+
+    # Sem timestamps INT96 (padrao do awswrangler), que nao tem estatisticas de min/max
+    options = {
+        **PARQUET_WRITE_KWARGS,
+        'compression': PARQUET_COMPRESSION,
+        'row_group_size': PARQUET_ROW_GROUP_ROWS,
+        'use_deprecated_int96_timestamps': False
+    }
+    if schema.dictionary_columns is not None:
+        options['use_dictionary'] = list(schema.dictionary_columns)
+    return options
+
+def wrangler_options(options):
+    # O awswrangler recebe a compressao a parte e o tamanho do row group em write_table_args
+    options = dict(options)
+    compression = options.pop('compression')
+    if 'row_group_size' in options:
+        options['write_table_args'] = {'row_group_size': options.pop('row_group_size')}
+    return compression, options
+
+def append_partitions(df, destination_path, schema):
+    options = parquet_options(schema)
+    if destination_path.startswith('s3://') and IO_BACKEND == 'arrow':
+        arrow_io.write_partitions(s3_client(), df, destination_path, PARTITION_COLS, False, options)
+    elif destination_path.startswith('s3://'):
+        compression, options = wrangler_options(options)
+        wrangler().s3.to_parquet(df=df,
+            path=destination_path,
+            dataset=True,
+            mode='append',
+            partition_cols=PARTITION_COLS,
+            compression=compression,
+            pyarrow_additional_kwargs=options
+        )
+    else:
+        df.to_parquet(destination_path, partition_cols=PARTITION_COLS, index=False, **options)
+
+def overwrite_partitions(df, destination_path, schema):
+    options = parquet_options(schema)
+    if destination_path.startswith('s3://') and IO_BACKEND == 'arrow':
+        arrow_io.write_partitions(s3_client(), df, destination_path, PARTITION_COLS, True, options)
+    elif destination_path.startswith('s3://'):
+        compression, options = wrangler_options(options)
+        wrangler().s3.to_parquet(df=df,
+            path=destination_path,
+            dataset=True,
+            mode='overwrite_partitions',
+            partition_cols=PARTITION_COLS,
+            compression=compression,
+            pyarrow_additional_kwargs=options
+        )
+    else:
+        for year, month, day in df[PARTITION_COLS].drop_duplicates().itertuples(index=False):
+            shutil.rmtree(f'{destination_path}year={year}/month={month}/day={day}', ignore_errors=True)
+        df.to_parquet(destination_path, partition_cols=PARTITION_COLS, index=False, **options)
+
+def read_partition(partition_path, schema):
+    if partition_path.startswith('s3://') and IO_BACKEND == 'arrow':
+        df = arrow_io.read_dataset(s3_client(), partition_path)
+        if df is None:
+            return None
+    elif partition_path.startswith('s3://'):
+        wr = wrangler()
+        try:
+            df = wr.s3.read_parquet(partition_path)
+        except wr.exceptions.NoFilesFound:
+            return None
+    elif os.path.isdir(partition_path):
+        df = pd.read_parquet(partition_path)
+    else:
+        return None
+
+    return df[schema.normalized_columns]
+
+def normalize_frame(df, schema):
+    # Mesmos tipos e ordem para o parquet existente e o novo gerarem o mesmo hash
+    df = df[schema.normalized_columns].copy()
+    for column in schema.columns:
+        if column.dtype == 'timestamp':
+            df[column.normalized] = pd.to_datetime(df[column.normalized]).astype('datetime64[ns]')
+        elif column.dtype == 'double':
+            df[column.normalized] = df[column.normalized].astype('float64')
+        else:
+            df[column.normalized] = df[column.normalized].astype(object)
+
+    return df.sort_values(schema.natural_keys, kind='stable').reset_index(drop=True)
+
+def content_hash(df):
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha256(hashes.tobytes()).hexdigest()
+
+_partition_locks = {}
+_partition_locks_guard = threading.Lock()
+
+def partition_lock(partition_path):
+    # Dois arquivos do mesmo dia no mesmo evento nao regravam a particao juntos
+    with _partition_locks_guard:
+        return _partition_locks.setdefault(partition_path, threading.Lock())
+
+_partition_store = None
+
+@contextmanager
+def partition_claim(dataset, partition):
+    # Outra execucao gravando o mesmo dia: espera na fila da particao ate
+    # LOCK_WAIT_SECONDS, depois o arquivo fica BUSY e fora do ledger e a
+    # invocacao falha com PartitionBusy para o retry processar de novo
+    global _partition_store
+    if not LOCK_TABLE:
+        yield
+        return
+    with _partition_locks_guard:
+        if _partition_store is None:
+            _partition_store = DynamoDBLockStore(LOCK_TABLE, client=boto3.session.Session().client('dynamodb'))
+    locks = PartitionLocks(_partition_store, ttl_seconds=LOCK_TTL_SECONDS)
+    with locks.hold(partition_lock_keys(dataset, [partition]), f'cleaner-{uuid.uuid4().hex}', LOCK_WAIT_SECONDS):
+        yield
+
+def upsert_partitions(df, destination_path, schema):
+    written, unchanged = [], []
+    changed_frames = []
+
+    for (year, month, day), new_rows in df.groupby(PARTITION_COLS):
+        partition_path = f'{destination_path}year={year}/month={month}/day={day}/'
+
+        with partition_lock(partition_path), partition_claim(schema.name, (year, month, day)):
+            existing = read_partition(partition_path, schema)
+
+            new_rows = normalize_frame(new_rows, schema)
+            if existing is not None:
+                existing = normalize_frame(existing, schema)
+                merged = pd.concat([existing, new_rows], ignore_index=True)
+            else:
+                merged = new_rows
+
+            # A linha mais nova vence quando a chave natural se repete
+            merged = merged.drop_duplicates(subset=schema.natural_keys, keep='last')
+            merged = normalize_frame(merged, schema)
+
+            if existing is not None and content_hash(existing) == content_hash(merged):
+                unchanged.append((year, month, day))
+                continue
+
+            merged['year'], merged['month'], merged['day'] = year, month, day
+            overwrite_partitions(merged, destination_path, schema)
+            written.append((year, month, day))
+
+    return written, unchanged
+
+def write_partitions(df, destination_path, schema):
+    if WRITE_MODE == 'append':
+        # No upsert a ordem vem do normalize_frame (a data e a primeira chave natural)
+        if PARQUET_LAYOUT != 'legacy':
+            df = df.sort_values(schema.date_column, kind='stable')
+        append_partitions(df, destination_path, schema)
+        partitions = [tuple(partition) for partition in df[PARTITION_COLS].drop_duplicates().itertuples(index=False)]
+        return partitions, []
+
+    return upsert_partitions(df, destination_path, schema)
+
+def format_partitions(partitions):
+    return sorted({f'{year:04d}-{month:02d}-{day:02d}' for year, month, day in partitions})
+
+def check_quality(df, schema):
+    if not QUALITY_CHECKS:
+        return df, df.iloc[0:0], {}
+
+    df, rejected, counts = split_quality(df, schema.rules)
+    if not rejected.empty:
+        # Sem as datas nulas as colunas de particao voltam a ser inteiras
+        df = df.astype({column: 'int32' for column in PARTITION_COLS})
+    return df, rejected, counts
+
+def quarantine_path(source_path, destination_bucket, schema):
+    # Um arquivo por objeto de origem: reprocessar o objeto substitui a quarentena dele
+    file_name = source_path.rstrip('/').split('/')[-1]
+    return f'{destination_bucket}/{QUARANTINE_PREFIX}{schema.name}/{file_name}.parquet'
+
+def write_quarantine(frames, path, source_path):
+    if path.startswith('s3://'):
+        bucket, key = arrow_io.split_path(path)
+        if not frames:
+            s3_client().delete_object(Bucket=bucket, Key=key)
+            return
+    elif not frames:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+
+    df = pd.concat(frames, ignore_index=True).assign(source=source_path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if path.startswith('s3://'):
+        buffer = pa.BufferOutputStream()
+        pq.write_table(table, buffer, **PARQUET_WRITE_KWARGS)
+        s3_client().put_object(Bucket=bucket, Key=key, Body=buffer.getvalue().to_pybytes())
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pq.write_table(table, path, **PARQUET_WRITE_KWARGS)
+
+def process_dataset(source_path, destination_bucket, schema, streaming=False):
+    destination_path = f'{destination_bucket}/{schema.name}/'
+
+    rows = 0
+    written, unchanged = [], []
+    quarantined, rule_failures = [], {}
+    for df in read_source_chunks(source_path, schema, streaming):
+        df = clean_column_names(df, schema)
+        df = add_partition_columns(df, schema.date_column)
+
+        df, rejected, counts = check_quality(df, schema)
+        if not rejected.empty:
+            quarantined.append(rejected)
+        for rule, count in counts.items():
+            rule_failures[rule] = rule_failures.get(rule, 0) + count
+
+        if df.empty:
+            continue
+
+        # Cada bloco grava as suas particoes, a memoria fica limitada ao bloco
+        chunk_written, chunk_unchanged = write_partitions(df, destination_path, schema)
+        written += chunk_written
+        unchanged += chunk_unchanged
+        rows += len(df)
+
+    if QUALITY_CHECKS and schema.rules:
+        write_quarantine(quarantined, quarantine_path(source_path, destination_bucket, schema), source_path)
+
+    return {
+        "rows": rows,
+        "partitions": format_partitions(written),
+        "unchanged_partitions": format_partitions(set(unchanged) - set(written)),
+        "quarantined_rows": sum(len(frame) for frame in quarantined),
+        # So as regras com falha, o resumo vai no payload da step function
+        "quality": {rule: count for rule, count in rule_failures.items() if count}
+    }
+
+def process_health_data(source_path, destination_bucket, streaming=False):
+    return process_dataset(source_path, destination_bucket, HEALTH_AUTO_EXPORT, streaming)
+
+def process_workout_data(source_path, destination_bucket, streaming=False):
+    return process_dataset(source_path, destination_bucket, WORKOUTS, streaming)
+
+DATASET_PROCESSORS = {
+    HEALTH_AUTO_EXPORT.name: process_health_data,
+    WORKOUTS.name: process_workout_data
+}
+
+def get_dataset(key):
+    return dataset_for_key(key)
+
+def get_source_objects(event):
+    # Evento "Object Created" do EventBridge, lista de objetos ou um objeto direto
+    if 'detail' in event:
+        detail = event['detail']
+        return [{
+            'bucket': detail['bucket']['name'],
+            'key': detail['object']['key'],
+            'etag': detail['object'].get('etag'),
+            'size': detail['object'].get('size')
+        }]
+    if 'objects' in event:
+        return event['objects']
+    return [event]
+
+def get_ledger():
+    if not LEDGER_BUCKET:
+        return None
+    return ProcessedLedger(LEDGER_BUCKET, LEDGER_PREFIX, client=s3_client())
+
+def process_object(source_object):
+    bucket, key = source_object['bucket'], source_object['key']
+    etag, size = source_object.get('etag'), source_object.get('size')
+    result = {"bucket": bucket, "key": key}
+
+    dataset = get_dataset(key)
+    if dataset is None:
+        print(f'Objeto ignorado, dataset desconhecido: s3://{bucket}/{key}')
+        return {**result, "result": "IGNORED"}
+
+    result["dataset"] = dataset
+
+    # Erro em um arquivo nao interrompe os outros, vai para o resumo
+    try:
+        if etag is None or size is None:
+            head = s3_client().head_object(Bucket=bucket, Key=key)
+            etag, size = head['ETag'], head['ContentLength']
+
+        ledger = get_ledger()
+        if ledger is not None and ledger.is_processed(bucket, key, etag):
+            print(f'Objeto ja processado: s3://{bucket}/{key} ({etag})')
+            return {**result, "result": "SKIPPED"}
+
+        streaming = use_streaming(size)
+        stats = DATASET_PROCESSORS[dataset](f's3://{bucket}/{key}', DESTINATION_BUCKET, streaming)
+
+        if ledger is not None:
+            ledger.mark_processed(bucket, key, etag, dataset)
+    except PartitionBusy as error:
+        print(f'Particao ocupada, s3://{bucket}/{key} fica para o retry: {error}')
+        return {**result, "result": "BUSY", "error": repr(error)}
+    except Exception as error:
+        print(f'ERRO ao processar s3://{bucket}/{key}: {error!r}')
+        return {**result, "result": "ERROR", "error": repr(error)}
+
+    return {**result, "result": "PROCESSED", "streaming": streaming, **stats}
+
 def handler(event, context):
     print(event)
 
-    process_health_data(SOURCE_BUCKET, DESTINATION_BUCKET, YEAR, MONTH, DAY)
+    # Resultados de varios lotes (Map da step function) so sao resumidos
+    if 'results' in event:
+        results = event['results']
+    else:
+        results = list(get_executor().map(process_object, get_source_objects(event)))
+
+    # Particao ocupada alem da espera: falha depois que os outros arquivos
+    # terminaram (e estao no ledger), o retry so reprocessa os pendentes
+    busy = [result['key'] for result in results if result['result'] == 'BUSY']
+    if busy:
+        raise PartitionBusy(f'particoes ocupadas, arquivos para o retry: {busy}')
+
+    # Lote do Map (batch): os erros voltam nos resultados e o passo de resumo
+    # decide a falha sobre todos os lotes, um lote so com arquivos ruins nao
+    # derruba o Map e os outros lotes
+    errors = [result for result in results if result['result'] == 'ERROR']
+    if errors and len(errors) == len(results) and not event.get('batch'):
+        raise Exception(f'ERRO: nenhum arquivo processado {errors}')
+
+    response = {"Status": "PARTIAL" if errors else "OK", "results": results}
+
+    for result in results:
+        if result.get('quarantined_rows'):
+            print(f"{result['quarantined_rows']} linhas em quarentena de {result['key']}: {result['quality']}")
+
+    # Intervalo de datas alterado, usado pelo glue job para processar tudo em uma execucao
+    dates = sorted({partition for result in results for partition in result.get('partitions', [])})
+    if dates:
+        response.update(start_date=dates[0], end_date=dates[-1])
 
-    process_workout_data(SOURCE_BUCKET, DESTINATION_BUCKET, YEAR, MONTH, DAY)
-    
-    return {"Status": "OK"}
+    return response
@@ -0,0 +1,46 @@
+import boto3
+from botocore.exceptions import ClientError
+
+
+class ProcessedLedger:
+
+    # Registro dos objetos ja processados pelo cleaner. Cada objeto do raw
+    # vira uma chave em s3://<ledger_bucket>/<prefix><bucket>/<key> com o ETag
+    # processado guardado nos metadados, entao a consulta e um unico HEAD.
+
+    def __init__(self, bucket, prefix='ledger/cleaner/', client=None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = client or boto3.client('s3')
+
+    def _ledger_key(self, source_bucket, source_key):
+        return f'{self.prefix}{source_bucket}/{source_key}'
+
+    def is_processed(self, source_bucket, source_key, etag):
+        try:
+            response = self.client.head_object(
+                Bucket=self.bucket,
+                Key=self._ledger_key(source_bucket, source_key)
+            )
+        except ClientError as error:
+            if error.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+        return response['Metadata'].get('etag') == normalize_etag(etag)
+
+    def mark_processed(self, source_bucket, source_key, etag, dataset):
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self._ledger_key(source_bucket, source_key),
+            Body=b'',
+            Metadata={
+                'etag': normalize_etag(etag),
+                'dataset': dataset
+            }
+        )
+
+
+def normalize_etag(etag):
+    # O evento do EventBridge manda o ETag sem aspas e o HeadObject com aspas
+    return (etag or '').strip('"')
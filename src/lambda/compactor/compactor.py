@@ -0,0 +1,324 @@
+import io
+import json
+import math
+import os
+import uuid
+from contextlib import nullcontext
+
+import boto3
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from datalake_common.locks import PartitionBusy, PartitionLocks, curated_lock_keys, lock_store, partition_lock_keys
+from datalake_common.schemas import SCHEMAS
+
+# Prefixos compactados: "bucket:prefixo" separados por virgula
+TARGETS = os.environ.get('COMPACTION_TARGETS', '')
+TARGET_FILE_BYTES = int(os.environ.get('COMPACTION_TARGET_FILE_BYTES', 128 * 1024 * 1024))
+# Particoes com no maximo este numero de arquivos ja sao consideradas compactadas
+MIN_FILES = int(os.environ.get('COMPACTION_MIN_FILES', 2))
+# Linhas por row group dos arquivos compactados (mesmo valor do cleaner)
+ROW_GROUP_ROWS = int(os.environ.get('COMPACTION_ROW_GROUP_ROWS', 50000))
+# Registro das trocas em andamento (arquivos antigos e novos de cada particao),
+# fora das pastas das tabelas
+JOURNAL_PREFIX = '_compaction'
+
+# Reservas das particoes (datalake_common.locks), as mesmas chaves dos escritores:
+# cleaner (dataset e dia) no cleaned, process (curated por mes com os agregados) no curated
+LOCK_TABLE = os.environ.get('LOCK_TABLE_NAME')
+LOCK_WAIT_SECONDS = int(os.environ.get('LOCK_WAIT_SECONDS', 60))
+LOCK_TTL_SECONDS = int(os.environ.get('LOCK_TTL_SECONDS', 900))
+CURATED_BUCKET = os.environ.get('CURATED_BUCKET_NAME')
+ROLLUPS = os.environ.get('ROLLUPS', 'true') == 'true'
+
+
+def get_targets(event):
+    if 'targets' in event:
+        return event['targets']
+
+    targets = []
+    for target in TARGETS.split(','):
+        if target:
+            bucket, prefix = target.split(':', 1)
+            targets.append({"bucket": bucket, "prefix": prefix})
+    return targets
+
+
+def get_dates(event):
+    # Datas informadas direto ou vindas do resumo do cleaner na step function
+    dates = set(event.get('partitions', []))
+    for result in event.get('results', []):
+        dates.update(result.get('partitions', []))
+    return sorted(dates)
+
+
+def partition_prefix(prefix, date):
+    year, month, day = date.split('-')
+    return f'{prefix}year={int(year)}/month={int(month)}/day={int(day)}/'
+
+
+def list_parquet_files(client, bucket, prefix):
+    files = []
+    paginator = client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for item in page.get('Contents', []):
+            if item['Key'].endswith('.parquet'):
+                files.append({"key": item['Key'], "size": item['Size']})
+    return files
+
+
+def group_by_partition(files):
+    partitions = {}
+    for file in files:
+        partitions.setdefault(file['key'].rsplit('/', 1)[0] + '/', []).append(file)
+    return partitions
+
+
+def needs_compaction(files):
+    small_files = [file for file in files if file['size'] < TARGET_FILE_BYTES]
+    return len(files) >= MIN_FILES and len(small_files) >= MIN_FILES
+
+
+def partition_of(partition_prefix):
+    # '.../year=2025/month=1/day=30/' -> (2025, 1, 30)
+    values = dict(part.split('=', 1) for part in partition_prefix.split('/') if '=' in part)
+    return int(values['year']), int(values['month']), int(values['day'])
+
+
+def lock_keys(bucket, prefix, partition_prefix):
+    partition = partition_of(partition_prefix)
+    if bucket == CURATED_BUCKET:
+        return curated_lock_keys([partition], ROLLUPS)
+    return partition_lock_keys(prefix.strip('/').rsplit('/', 1)[-1], [partition])
+
+
+def partition_claim(locks, bucket, prefix, partition_prefix, owner):
+    # Na step function a execucao ja tem as reservas do curated (owner no evento)
+    if locks is None or (owner and bucket == CURATED_BUCKET):
+        return nullcontext()
+    return locks.hold(lock_keys(bucket, prefix, partition_prefix), f'compactor-{uuid.uuid4().hex}', LOCK_WAIT_SECONDS)
+
+
+def journal_key(partition_prefix):
+    return f'{JOURNAL_PREFIX}/{partition_prefix.rstrip("/")}.json'
+
+
+def pending_partitions(client, bucket, prefix):
+    # Particoes com uma troca interrompida
+    paginator = client.get_paginator('list_objects_v2')
+    return {
+        item['Key'][len(JOURNAL_PREFIX) + 1:-len('.json')] + '/'
+        for page in paginator.paginate(Bucket=bucket, Prefix=f'{JOURNAL_PREFIX}/{prefix}')
+        for item in page.get('Contents', []) if item['Key'].endswith('.json')
+    }
+
+
+def delete_keys(client, bucket, keys):
+    for offset in range(0, len(keys), 1000):
+        client.delete_objects(
+            Bucket=bucket,
+            Delete={"Objects": [{"Key": key} for key in keys[offset:offset + 1000]], "Quiet": True}
+        )
+
+
+def recover_partition(client, bucket, partition_prefix):
+    # Troca interrompida: com todos os arquivos novos gravados termina apagando os
+    # antigos, senao apaga os novos parciais e a particao volta ao estado anterior
+    key = journal_key(partition_prefix)
+    journal = json.loads(client.get_object(Bucket=bucket, Key=key)['Body'].read())
+    existing = {file['key'] for file in list_parquet_files(client, bucket, partition_prefix)}
+
+    if all(new_key in existing for new_key in journal['new']):
+        delete_keys(client, bucket, [old_key for old_key in journal['old'] if old_key in existing])
+        action = 'completed'
+    else:
+        delete_keys(client, bucket, [new_key for new_key in journal['new'] if new_key in existing])
+        action = 'rolled_back'
+    client.delete_object(Bucket=bucket, Key=key)
+    print(f'Compactacao interrompida em s3://{bucket}/{partition_prefix}: {action}')
+    return action
+
+
+def read_file(client, bucket, key):
+    body = client.get_object(Bucket=bucket, Key=key)['Body'].read()
+    return pq.ParquetFile(pa.BufferReader(body))
+
+
+def write_options(files):
+    # Mantem o layout de quem gravou a particao, lido do arquivo com mais linhas: codec e
+    # colunas com dicionario. Timestamps em INT64 (ms) como no cleaned, que tem
+    # estatisticas e juntam arquivos INT96 antigos com os novos
+    metadata = max(files, key=lambda file: file.metadata.num_rows).metadata
+    options = {
+        'row_group_size': ROW_GROUP_ROWS,
+        'coerce_timestamps': 'ms',
+        'allow_truncated_timestamps': True,
+        'use_deprecated_int96_timestamps': False
+    }
+    if metadata.num_row_groups:
+        row_group = metadata.row_group(0)
+        columns = [row_group.column(index) for index in range(row_group.num_columns)]
+        # O pq.write_table chama de 'none' o que o metadata chama de UNCOMPRESSED
+        compression = columns[0].compression.lower()
+        options['compression'] = 'none' if compression == 'uncompressed' else compression
+        options['use_dictionary'] = [
+            column.path_in_schema for column in columns
+            if any(encoding.endswith('DICTIONARY') for encoding in column.encodings)
+        ]
+    return options
+
+
+def common_type(current, other):
+    if pa.types.is_null(current):
+        return other
+    if pa.types.is_null(other) or current == other:
+        return current
+    if pa.types.is_integer(current) and pa.types.is_integer(other):
+        return current if current.bit_width >= other.bit_width else other
+    if (pa.types.is_integer(current) or pa.types.is_floating(current)) and \
+            (pa.types.is_integer(other) or pa.types.is_floating(other)):
+        return pa.float64()
+    return current
+
+
+def target_schema(tables):
+    # Schema comum dos arquivos da particao, com timestamps em ms. Feito a mao
+    # porque o pyarrow da camada do awswrangler 2.17 (< 10.1) nao tem o
+    # promote_options do concat_tables
+    types = {}
+    for table in tables:
+        for field in table.schema:
+            types[field.name] = common_type(types.get(field.name, pa.null()), field.type)
+    fields = [
+        pa.field(name, pa.timestamp('ms', tz=type_.tz) if pa.types.is_timestamp(type_) else type_)
+        for name, type_ in types.items()
+    ]
+    return pa.schema(fields, metadata=tables[0].schema.metadata)
+
+
+def conform(table, schema):
+    # Colunas na ordem do schema comum; coluna que falta no arquivo vem nula
+    columns = []
+    for field in schema:
+        if field.name not in table.column_names:
+            columns.append(pa.nulls(table.num_rows, field.type))
+        elif pa.types.is_timestamp(field.type):
+            # INT96 le em ns, os valores gravados sao em ms
+            columns.append(table.column(field.name).cast(field.type, safe=False))
+        else:
+            columns.append(table.column(field.name).cast(field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def write_table(client, bucket, key, table, options):
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, **options)
+    client.put_object(Bucket=bucket, Key=key, Body=buffer.getvalue())
+    return buffer.tell()
+
+
+def compact_partition(client, bucket, prefix, files):
+    sources = [read_file(client, bucket, file['key']) for file in files]
+    # Arquivos INT96 (awswrangler, Spark) e INT64 na mesma particao: tudo no mesmo schema
+    tables = [source.read() for source in sources]
+    arrow_schema = target_schema(tables)
+    table = pa.concat_tables([conform(source, arrow_schema) for source in tables])
+
+    # Cleaned em ordem de data, como o layout do cleaner
+    schema = SCHEMAS.get(prefix.split('/year=')[0].rsplit('/', 1)[-1])
+    if schema is not None and schema.date_column in table.column_names:
+        table = table.sort_by(schema.date_column)
+
+    bytes_before = sum(file['size'] for file in files)
+
+    # Linhas por arquivo estimadas pelo tamanho medio da linha no parquet atual
+    rows_per_file = max(1, int(table.num_rows * TARGET_FILE_BYTES / max(bytes_before, 1)))
+    run_id = uuid.uuid4().hex
+    new_keys = [
+        f'{prefix}compacted-{run_id}-{index:05d}.parquet'
+        for index in range(max(1, math.ceil(table.num_rows / rows_per_file)))
+    ]
+
+    # S3 nao troca arquivos de forma atomica: entre a gravacao dos novos e o
+    # DeleteObjects dos antigos uma leitura da particao ve as linhas duas vezes.
+    # O registro com as duas listas, gravado antes, deixa a troca segura contra
+    # falhas: a proxima execucao termina ou desfaz (recover_partition)
+    client.put_object(Bucket=bucket, Key=journal_key(prefix), Body=json.dumps({
+        "old": [file['key'] for file in files], "new": new_keys
+    }).encode('utf-8'))
+
+    options = write_options(sources)
+    new_files = []
+    for index, key in enumerate(new_keys):
+        size = write_table(client, bucket, key, table.slice(index * rows_per_file, rows_per_file), options)
+        new_files.append({"key": key, "size": size})
+
+    delete_keys(client, bucket, [file['key'] for file in files])
+    client.delete_object(Bucket=bucket, Key=journal_key(prefix))
+
+    return {
+        "bucket": bucket,
+        "partition": prefix,
+        "rows": table.num_rows,
+        "files_before": len(files),
+        "files_after": len(new_files),
+        "bytes_before": bytes_before,
+        "bytes_after": sum(file['size'] for file in new_files)
+    }
+
+
+def compact_target(client, bucket, prefix, dates, locks=None, owner=None):
+    if dates:
+        partitions = {}
+        for date in dates:
+            partitions.update(group_by_partition(list_parquet_files(client, bucket, partition_prefix(prefix, date))))
+    else:
+        partitions = group_by_partition(list_parquet_files(client, bucket, prefix))
+
+    pending = pending_partitions(client, bucket, prefix)
+    candidates = {partition for partition, files in partitions.items() if needs_compaction(files)} | pending
+
+    report, skipped = [], []
+    for partition in sorted(candidates):
+        try:
+            with partition_claim(locks, bucket, prefix, partition, owner):
+                if partition in pending:
+                    recover_partition(client, bucket, partition)
+                # Lista de novo com a particao reservada, um escritor pode ter
+                # regravado a particao depois da primeira listagem
+                files = list_parquet_files(client, bucket, partition)
+                if needs_compaction(files):
+                    report.append(compact_partition(client, bucket, partition, files))
+        except PartitionBusy:
+            # Particao em uso por um escritor, fica para a proxima execucao
+            skipped.append(partition)
+    return report, skipped
+
+
+def handler(event, context):
+    print(event)
+
+    client = boto3.client('s3')
+    dates = get_dates(event)
+    locks = PartitionLocks(lock_store(LOCK_TABLE), ttl_seconds=LOCK_TTL_SECONDS) if LOCK_TABLE else None
+
+    report, skipped = [], []
+    for target in get_targets(event):
+        compacted, busy = compact_target(client, target['bucket'], target['prefix'], dates, locks, event.get('owner'))
+        report += compacted
+        skipped += busy
+
+    summary = {
+        "Status": "OK",
+        "partitions_compacted": len(report),
+        "files_before": sum(item['files_before'] for item in report),
+        "files_after": sum(item['files_after'] for item in report),
+        "bytes_before": sum(item['bytes_before'] for item in report),
+        "bytes_after": sum(item['bytes_after'] for item in report),
+        "skipped_partitions": skipped,
+        "partitions": report
+    }
+
+    print(json.dumps({key: value for key, value in summary.items() if key != 'partitions'}))
+
+    return summary
@@ -0,0 +1,71 @@
+import json
+import os
+import time
+import boto3
+
+from datalake_common.callbacks import TaskTokenStore, queued_name
+
+CALLBACK_BUCKET = os.environ.get('CALLBACK_BUCKET_NAME')
+CALLBACK_PREFIX = os.environ.get('CALLBACK_PREFIX', 'callbacks/crawler/')
+# Logo depois do evento de fim o crawler ainda pode estar em STOPPING
+START_ATTEMPTS = int(os.environ.get('CRAWLER_START_ATTEMPTS', 6))
+START_RETRY_SECONDS = int(os.environ.get('CRAWLER_START_RETRY_SECONDS', 5))
+
+
+def start_next_crawl(store, crawler_name):
+    # Execucoes que chegaram com o crawler rodando esperam um crawl novo, que
+    # comeca depois das particoes delas
+    executions = store.move_all(queued_name(crawler_name), crawler_name)
+    if not executions:
+        return 0
+
+    client = boto3.client('glue')
+    for attempt in range(START_ATTEMPTS):
+        try:
+            client.start_crawler(Name=crawler_name)
+            return len(executions)
+        except client.exceptions.CrawlerRunningException:
+            # Crawl iniciado depois deste evento tambem cobre a fila
+            if client.get_crawler(Name=crawler_name)['Crawler']['State'] == 'RUNNING':
+                return len(executions)
+            time.sleep(START_RETRY_SECONDS)
+
+    # Devolve os tokens para a fila, o retry do evento tenta de novo
+    for execution in executions:
+        store.move(crawler_name, queued_name(crawler_name), execution)
+    raise Exception(f'ERRO ao iniciar o crawler {crawler_name} para {len(executions)} execucoes na fila')
+
+
+def handler(event, context):
+    # Evento "Glue Crawler State Change" do EventBridge: retoma as execucoes
+    # da step function que esperam por este crawler
+    print(event)
+
+    detail = event['detail']
+    crawler_name = detail['crawlerName']
+    state = detail['state']
+
+    store = TaskTokenStore(CALLBACK_BUCKET, CALLBACK_PREFIX)
+    tokens = store.pop_all(crawler_name)
+    client = boto3.client('stepfunctions')
+
+    resumed = 0
+    for token in tokens:
+        try:
+            if state == 'Succeeded':
+                client.send_task_success(taskToken=token, output=json.dumps({"Status": "SUCCEEDED"}))
+            else:
+                client.send_task_failure(
+                    taskToken=token,
+                    error='CrawlerFailed',
+                    cause=detail.get('errorMessage', f'Crawler status {state}')[:32768]
+                )
+            resumed += 1
+        except (client.exceptions.TaskTimedOut, client.exceptions.TaskDoesNotExist, client.exceptions.InvalidToken):
+            # Execucao que ja terminou (timeout ou cancelada)
+            print(f'Token expirado para o crawler {crawler_name}')
+
+    queued = start_next_crawl(store, crawler_name)
+
+    print(f'Crawler {crawler_name} {state}: {resumed} execucoes retomadas, {queued} no proximo crawl')
+    return {"Status": state, "resumed": resumed, "queued": queued}
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import boto3
+from botocore.exceptions import ClientError
+
+from datalake_common.schemas import dataset_for_key
+
+STATE_MACHINE_ARN = os.environ.get('STATE_MACHINE_ARN')
+# Mesmo limite do max_objects da step function (timeout da execucao)
+MAX_EXECUTION_OBJECTS = int(os.environ.get('MAX_EXECUTION_OBJECTS', 200))
+
+
+def parse_record(record):
+    # Corpo da mensagem: evento "Object Created" do EventBridge
+    detail = json.loads(record['body'])['detail']
+    return {
+        'bucket': detail['bucket']['name'],
+        'key': detail['object']['key'],
+        'etag': detail['object'].get('etag'),
+        'size': detail['object'].get('size'),
+        'sequencer': detail['object'].get('sequencer', '')
+    }
+
+
+def sequencer_order(source_object):
+    # Sequencer do s3 e hexadecimal de tamanho variavel
+    return source_object['sequencer'].rjust(32, '0')
+
+
+def collect_objects(records):
+    # Um objeto por chave (a ultima versao pelo sequencer), sem os objetos
+    # que o cleaner ignoraria (erros do firehose, arquivos desconhecidos).
+    # Cada objeto guarda as mensagens da chave para o retorno de falhas por
+    # mensagem; mensagens que nao sao eventos validos voltam separadas
+    objects = {}
+    invalid = []
+    for record in records:
+        try:
+            source_object = parse_record(record)
+        except (KeyError, TypeError, ValueError):
+            invalid.append(record['messageId'])
+            continue
+        if dataset_for_key(source_object['key']) is None:
+            continue
+        name = (source_object['bucket'], source_object['key'])
+        message_ids = objects[name]['message_ids'] if name in objects else []
+        if name not in objects or sequencer_order(source_object) >= sequencer_order(objects[name]):
+            objects[name] = dict(source_object, message_ids=message_ids)
+        message_ids.append(record['messageId'])
+
+    return [source_object for _, source_object in sorted(objects.items())], invalid
+
+
+def execution_input(objects):
+    return {"objects": [
+        {field: value for field, value in source_object.items() if field not in ('sequencer', 'message_ids')}
+        for source_object in objects
+    ]}
+
+
+def execution_name(objects):
+    # Nome deterministico pelas versoes dos objetos (o sequencer muda a cada
+    # upload): a mesma mensagem reentregue pelo sqs nao inicia uma segunda
+    # execucao, um novo upload da mesma chave inicia
+    versions = [
+        [source_object[field] for field in ('bucket', 'key', 'etag', 'sequencer')] for source_object in objects
+    ]
+    digest = hashlib.sha256(json.dumps(versions).encode('utf-8')).hexdigest()
+    return f'batch-{digest[:40]}'
+
+
+def batches(objects):
+    for start in range(0, len(objects), MAX_EXECUTION_OBJECTS):
+        yield objects[start:start + MAX_EXECUTION_OBJECTS]
+
+
+def handler(event, context):
+    records = event['Records']
+    objects, failures = collect_objects(records)
+
+    client = boto3.client('stepfunctions')
+    executions = []
+    dispatched = 0
+    for batch in batches(objects):
+        name = execution_name(batch)
+        try:
+            response = client.start_execution(
+                stateMachineArn=STATE_MACHINE_ARN,
+                name=name,
+                input=json.dumps(execution_input(batch))
+            )
+            executions.append(response['executionArn'])
+        except client.exceptions.ExecutionAlreadyExists:
+            # Lote reentregue depois que a execucao com o mesmo nome terminou
+            dispatched += 1
+        except ClientError as error:
+            # So as mensagens deste lote voltam para a fila (e depois para a dlq)
+            print(f'Falha ao iniciar a execucao {name}: {error}')
+            failures.extend(message_id for source_object in batch for message_id in source_object['message_ids'])
+
+    print(f'{len(records)} eventos, {len(objects)} objetos: {len(executions)} execucoes iniciadas, '
+          f'{dispatched} ja despachadas, {len(failures)} mensagens com falha')
+    # Resposta do ReportBatchItemFailures do event source do sqs
+    return {
+        "objects": len(objects),
+        "executions": executions,
+        "batchItemFailures": [{"itemIdentifier": message_id} for message_id in failures]
+    }
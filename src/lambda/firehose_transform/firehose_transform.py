@@ -0,0 +1,161 @@
+import base64
+import json
+import os
+from collections import Counter
+
+import pandas as pd
+
+from datalake_common.schemas import HEALTH_AUTO_EXPORT
+
+# O delivery stream so recebe registros do Health Auto Export
+SCHEMA = HEALTH_AUTO_EXPORT
+
+# json: um documento por linha / parquet: o firehose converte cada registro
+RECORD_FORMAT = os.environ.get('RECORD_FORMAT', 'json')
+DYNAMIC_PARTITIONING = os.environ.get('DYNAMIC_PARTITIONING', 'false') == 'true'
+
+# Registros maiores que isso vao para o prefixo de erros do firehose
+MAX_RECORD_BYTES = int(os.environ.get('MAX_RECORD_BYTES', 64 * 1024))
+# Registros validos do mesmo dia sao juntados em um registro de ate este tamanho.
+# So no formato json, a conversao para parquet espera um documento por registro
+AGGREGATE_MAX_BYTES = int(os.environ.get('AGGREGATE_MAX_BYTES', 512 * 1024))
+
+# Formato de data esperado pela tabela de ingestao e pela query de particao
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def decode_records(records):
+    # Documento json de cada registro e o motivo da falha (None quando ok)
+    documents, errors = [], []
+    for record in records:
+        try:
+            payload = base64.b64decode(record['data'])
+            if len(payload) > MAX_RECORD_BYTES:
+                raise ValueError(f'registro com {len(payload)} bytes')
+            document = json.loads(payload)
+            if not isinstance(document, dict):
+                raise ValueError('registro nao e um objeto json')
+        except ValueError as error:
+            documents.append({})
+            errors.append(f'registro invalido: {error}')
+            continue
+
+        documents.append(document)
+        errors.append(None)
+
+    return documents, errors
+
+
+def column_values(df, column):
+    # Aceita o cabecalho original do export ou o nome normalizado
+    values = pd.Series(None, index=df.index, dtype=object)
+    for name in (column.normalized, column.source):
+        if name in df.columns:
+            values = values.combine_first(df[name])
+    return values
+
+
+def normalize(documents):
+    # Valida e converte todos os registros do lote de uma vez, coluna a coluna
+    df = pd.DataFrame(documents, index=range(len(documents)))
+
+    normalized = pd.DataFrame(index=df.index)
+    errors = pd.Series(None, index=df.index, dtype=object)
+
+    for column in SCHEMA.columns:
+        raw = column_values(df, column)
+        present = raw.notna()
+
+        if column.dtype == 'timestamp':
+            # Sem o fuso horario do export (yyyy-MM-dd HH:mm:ss -0300), como no cleaner
+            text = raw.astype(str).str.replace('T', ' ', n=1).str.slice(0, 19)
+            values = pd.to_datetime(text.where(present), format=DATE_FORMAT, errors='coerce')
+        elif column.dtype == 'double':
+            values = pd.to_numeric(raw, errors='coerce').astype('float64')
+        else:
+            values = raw.where(~present, raw.astype(str))
+
+        invalid = present & values.isna()
+        if column.normalized == SCHEMA.date_column:
+            invalid |= ~present
+        errors = errors.mask(invalid & errors.isna(), f'{column.normalized} invalido')
+
+        normalized[column.normalized] = values
+
+    dates = normalized[SCHEMA.date_column]
+    partitions = pd.DataFrame({'year': dates.dt.year, 'month': dates.dt.month, 'day': dates.dt.day})
+    normalized[SCHEMA.date_column] = dates.dt.strftime(DATE_FORMAT)
+
+    return normalized, partitions, errors
+
+
+def serialize(df):
+    # Uma linha json por registro, nulos como null
+    if df.empty:
+        return []
+    return df.to_json(orient='records', lines=True, double_precision=15).rstrip('\n').split('\n')
+
+
+def aggregate(lines, partitions):
+    # Junta as linhas do mesmo dia, na ordem de chegada, em blocos de ate
+    # AGGREGATE_MAX_BYTES. Retorna a posicao do registro que leva cada bloco
+    chunks = {}
+    open_chunk = {}
+    keys = partitions.loc[lines.index].itertuples(index=False, name=None)
+    for position, line, key in zip(lines.index, lines, keys):
+        size = len(line) + 1
+        head = open_chunk.get(key)
+        if head is None or chunks[head]['size'] + size > AGGREGATE_MAX_BYTES:
+            head = position
+            open_chunk[key] = head
+            chunks[head] = {'lines': [], 'size': 0}
+        chunks[head]['lines'].append(line)
+        chunks[head]['size'] += size
+    return {head: chunk['lines'] for head, chunk in chunks.items()}
+
+
+def transform(records):
+    documents, decode_errors = decode_records(records)
+    normalized, partitions, errors = normalize(documents)
+    errors = pd.Series(decode_errors, index=errors.index, dtype=object).combine_first(errors)
+
+    valid = errors.isna()
+    lines = pd.Series(serialize(normalized[valid]), index=normalized.index[valid], dtype=object)
+
+    if RECORD_FORMAT == 'json' and AGGREGATE_MAX_BYTES > 0:
+        outputs = aggregate(lines, partitions)
+    else:
+        outputs = {position: [line] for position, line in lines.items()}
+
+    # Chaves year/month/day de cada registro valido para o particionamento dinamico
+    partition_keys = partitions.loc[lines.index].astype('int64').astype(str).to_dict('index')
+
+    results = []
+    for position, record in enumerate(records):
+        result = {'recordId': record['recordId']}
+        if position in outputs:
+            data = ''.join(f'{line}\n' for line in outputs[position]).encode('utf-8')
+            result.update(result='Ok', data=base64.b64encode(data).decode('utf-8'))
+            if DYNAMIC_PARTITIONING:
+                result['metadata'] = {'partitionKeys': partition_keys[position]}
+        elif valid[position]:
+            # Linha enviada junto com o bloco de outro registro
+            result.update(result='Dropped', data=record['data'])
+        else:
+            result.update(result='ProcessingFailed', data=record['data'])
+        results.append(result)
+
+    return results, errors
+
+
+def handler(event, context):
+    records = event['records']
+    results, errors = transform(records)
+
+    summary = Counter(result['result'] for result in results)
+    print(f"{len(records)} registros: {summary['Ok']} ok, {summary['Dropped']} agregados, "
+          f"{summary['ProcessingFailed']} com falha")
+    for error, count in errors.dropna().value_counts().items():
+        print(f'ERRO {count} registros: {error}')
+
+    return {'records': results}
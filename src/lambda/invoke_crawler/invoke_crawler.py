@@ -1,25 +1,40 @@
 import os
 import boto3
 
+from datalake_common.callbacks import TaskTokenStore, queued_name
+
 def handler(event, context):
 
     crawler_name = os.environ['CRAWLER_NAME']
 
     print(crawler_name)
 
+    # O token e gravado antes de iniciar o crawler, o evento de fim nao chega antes dele.
+    # Fica na fila do proximo crawl ate esta execucao iniciar um: um crawl ja
+    # rodando pode ter comecado antes das particoes desta execucao serem gravadas
+    store = TaskTokenStore(os.environ['CALLBACK_BUCKET_NAME'], os.environ.get('CALLBACK_PREFIX', 'callbacks/crawler/'))
+    store.put(queued_name(crawler_name), event['execution'], event['task_token'])
+
     client = boto3.client('glue')
 
     response = client.get_crawler(
         Name=crawler_name
     )
 
-    status = response['Crawler']['LastCrawl']['Status']
+    status = response['Crawler'].get('LastCrawl', {}).get('Status')
 
+    # Com o crawler ja rodando a execucao espera o crawl seguinte, iniciado pelo
+    # crawler_callback no fim do atual
     if(response['Crawler']['State'] == 'READY'):
-        client.start_crawler(
-            Name=crawler_name
-        )
+        store.move(queued_name(crawler_name), crawler_name, event['execution'])
+        try:
+            client.start_crawler(
+                Name=crawler_name
+            )
+        except client.exceptions.CrawlerRunningException:
+            store.move(crawler_name, queued_name(crawler_name), event['execution'])
+            print('Crawler iniciado por outra execucao, aguardando o proximo crawl')
     else:
-        print(f'Crawler still {status}')
+        print(f'Crawler still {response["Crawler"]["State"]}, aguardando o proximo crawl')
 
     return {"Status": status}
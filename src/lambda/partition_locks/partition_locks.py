@@ -0,0 +1,36 @@
+import os
+
+from datalake_common.locks import PartitionLocks, curated_lock_keys, lock_store
+from datalake_common.transforms import date_range
+
+LOCK_TABLE = os.environ.get('LOCK_TABLE_NAME')
+ROLLUPS = os.environ.get('ROLLUPS', 'true') == 'true'
+
+
+def lock_keys(event):
+    return curated_lock_keys(date_range(event['start_date'], event['end_date']), ROLLUPS)
+
+
+def claim_handler(event, context):
+    # Reserva as particoes do curated que o process vai regravar. Com chaves
+    # ocupadas a step function espera e chama de novo com o mesmo dono (a execucao)
+    print(event)
+
+    # ttl_seconds: prazo da reserva (timeout da execucao) / waiter_ttl_seconds:
+    # prazo da posicao na fila, algumas esperas do loop da step function
+    locks = PartitionLocks(lock_store(LOCK_TABLE), ttl_seconds=int(event['ttl_seconds']),
+                           waiter_ttl_seconds=int(event.get('waiter_ttl_seconds', 60)))
+    result = locks.claim(lock_keys(event), event['owner'])
+
+    print(f"{event['owner']}: {len(result['claimed'])} reservadas, {len(result['waiting'])} em espera")
+    return result
+
+
+def release_handler(event, context):
+    # Chamada no fim do process, com sucesso ou falha
+    print(event)
+
+    locks = PartitionLocks(lock_store(LOCK_TABLE))
+    released = locks.release(lock_keys(event), event['owner'])
+
+    return {"released": released}
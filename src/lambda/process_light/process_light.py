@@ -0,0 +1,206 @@
+import math
+import os
+import shutil
+
+import awswrangler as wr
+import boto3
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from datalake_common import pandas_engine as engine
+from datalake_common.catalog import register_curated_partitions
+from datalake_common.partition_index import frame_stats, update_index
+from datalake_common.schemas import HEALTH_AUTO_EXPORT, WORKOUTS
+from datalake_common.transforms import CURATED_TABLES, PARTITION_COLS, date_range, partition_keys, rollup_days
+
+SOURCE_BUCKET = f"s3://{os.environ.get('SOURCE_BUCKET_NAME')}"
+DESTINATION_BUCKET = f"s3://{os.environ.get('DESTINATION_BUCKET_NAME')}"
+ROLLUPS = os.environ.get('ROLLUPS', 'true') == 'true'
+# Database do catalogo onde as particoes gravadas sao registradas (vazio: nao registra)
+CATALOG_DATABASE = os.environ.get('CATALOG_DATABASE', '')
+# Atualiza o indice de estatisticas por particao (_index/ no curated)
+PARTITION_INDEX = os.environ.get('PARTITION_INDEX', 'true') == 'true'
+
+# Acima deste volume de entrada a step function usa o glue job (Spark)
+LIGHT_ENGINE_MAX_BYTES = int(os.environ.get('LIGHT_ENGINE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Workers do glue job em cada execucao: um por GLUE_BYTES_PER_WORKER de entrada,
+# entre os limites configurados (minimo do glue para G.1X e 2)
+GLUE_MIN_WORKERS = int(os.environ.get('GLUE_MIN_WORKERS', 2))
+GLUE_MAX_WORKERS = int(os.environ.get('GLUE_MAX_WORKERS', 10))
+GLUE_BYTES_PER_WORKER = int(os.environ.get('GLUE_BYTES_PER_WORKER', 512 * 1024 * 1024))
+
+# Timestamps em INT96, o mesmo formato que o Spark grava no curated
+PARQUET_WRITE_KWARGS = {'use_deprecated_int96_timestamps': True, 'coerce_timestamps': None}
+
+
+def partition_path(base_path, partition):
+    year, month, day = partition
+    return f'{base_path}year={year}/month={month}/day={day}/'
+
+
+def read_partitions(base_path, partitions):
+    keys = set(partition_keys(partitions))
+
+    if base_path.startswith('s3://'):
+        try:
+            df = wr.s3.read_parquet(
+                path=base_path,
+                dataset=True,
+                partition_filter=lambda partition: int(partition['year']) * 10000 + int(partition['month']) * 100 + int(partition['day']) in keys
+            )
+        except wr.exceptions.NoFilesFound:
+            return pd.DataFrame()
+    else:
+        frames = []
+        for partition in partitions:
+            path = partition_path(base_path, partition)
+            if os.path.isdir(path):
+                frames.append(pd.read_parquet(path).assign(**dict(zip(PARTITION_COLS, partition))))
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+
+    return df.astype({column: 'int32' for column in PARTITION_COLS})
+
+
+def write_partitions(df, base_path, table):
+    # Substitui so as particoes presentes no df, como o overwrite dinamico do Spark.
+    # Devolve as particoes gravadas, sao as que vao para o catalogo
+    if df.empty:
+        return []
+
+    written = sorted(tuple(int(value) for value in partition)
+                     for partition in df[PARTITION_COLS].drop_duplicates().itertuples(index=False))
+
+    if base_path.startswith('s3://'):
+        wr.s3.to_parquet(
+            df=df,
+            path=base_path,
+            dataset=True,
+            mode='overwrite_partitions',
+            partition_cols=PARTITION_COLS,
+            dtype=dict(CURATED_TABLES[table]),
+            pyarrow_additional_kwargs=dict(PARQUET_WRITE_KWARGS)
+        )
+        return written
+
+    schema = engine.arrow_schema(table)
+    for partition in written:
+        shutil.rmtree(partition_path(base_path, partition), ignore_errors=True)
+
+    arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+    arrow_table = arrow_table.select(schema.names + PARTITION_COLS).cast(
+        pa.schema(list(schema) + [pa.field(column, pa.int32()) for column in PARTITION_COLS]))
+    pq.write_to_dataset(arrow_table, base_path, partition_cols=PARTITION_COLS, **PARQUET_WRITE_KWARGS)
+    return written
+
+
+def run_rollups(destination_bucket, partitions):
+    # Recalcula so os buckets afetados pelos dias processados, como no process.py
+    days = rollup_days(partitions)
+    health_path = f"{destination_bucket}/HealthData/"
+    workouts_path = f"{destination_bucket}/Workouts/"
+
+    written = {}
+    for period, read_days in (('week', days['weekly']), ('month', days['monthly'])):
+        table = engine.period_table(period)
+        df_health = read_partitions(health_path, read_days)
+        if not df_health.empty:
+            written[f'Health{table}'] = write_partitions(
+                engine.health_period_rollup(engine.daily_health(df_health), period),
+                f"{destination_bucket}/Health{table}/", f'Health{table}')
+        df_workout = read_partitions(workouts_path, read_days)
+        if not df_workout.empty:
+            written[f'Workouts{table}'] = write_partitions(
+                engine.workouts_period_rollup(df_workout, period),
+                f"{destination_bucket}/Workouts{table}/", f'Workouts{table}')
+
+    df_health = read_partitions(health_path, days['rolling'])
+    if not df_health.empty:
+        written['HealthRolling'] = write_partitions(
+            engine.health_rolling(engine.daily_health(df_health), days['rolling_output']),
+            f"{destination_bucket}/HealthRolling/", 'HealthRolling')
+    df_workout = read_partitions(workouts_path, days['rolling'])
+    if not df_workout.empty:
+        written['WorkoutsRolling'] = write_partitions(
+            engine.workouts_rolling(df_workout, days['rolling_output']),
+            f"{destination_bucket}/WorkoutsRolling/", 'WorkoutsRolling')
+
+    return written
+
+
+def write_daily_table(df, destination_bucket, table, partition_index):
+    written = write_partitions(df, f"{destination_bucket}/{table}/", table)
+    if partition_index:
+        # O df e exatamente o que foi gravado, as estatisticas saem dele
+        update_index(destination_bucket, table, frame_stats(df, table))
+    return written
+
+
+def run(source_bucket, destination_bucket, start_date, end_date, rollups=True, catalog_database='',
+        partition_index=True):
+    partitions = date_range(start_date, end_date)
+    print(f"Processando {len(partitions)} particoes (light): {start_date} ate {end_date}")
+
+    rows, written = 0, {}
+    df_health = read_partitions(f"{source_bucket}/{HEALTH_AUTO_EXPORT.name}/", partitions)
+    if not df_health.empty:
+        rows += len(df_health)
+        written['HealthData'] = write_daily_table(engine.transform_health(df_health), destination_bucket,
+                                                  'HealthData', partition_index)
+
+    df_workout = read_partitions(f"{source_bucket}/{WORKOUTS.name}/", partitions)
+    if not df_workout.empty:
+        rows += len(df_workout)
+        written['Workouts'] = write_daily_table(engine.transform_workouts(df_workout), destination_bucket,
+                                                'Workouts', partition_index)
+
+    if rollups:
+        written.update(run_rollups(destination_bucket, partitions))
+
+    if catalog_database:
+        created = register_curated_partitions(catalog_database, written)
+        print(f"Particoes registradas no catalogo: {created}")
+
+    return {"engine": "light", "partitions": len(partitions), "rows": rows}
+
+
+def input_bytes(bucket, partitions, client=None):
+    # Soma o tamanho dos arquivos do cleaned nas particoes do intervalo
+    client = client or boto3.client('s3')
+    paginator = client.get_paginator('list_objects_v2')
+
+    total = 0
+    for dataset in (HEALTH_AUTO_EXPORT.name, WORKOUTS.name):
+        for partition in partitions:
+            for page in paginator.paginate(Bucket=bucket, Prefix=partition_path(f'{dataset}/', partition)):
+                total += sum(item['Size'] for item in page.get('Contents', []))
+    return total
+
+
+def glue_workers(size):
+    return min(GLUE_MAX_WORKERS, max(GLUE_MIN_WORKERS, math.ceil(size / GLUE_BYTES_PER_WORKER)))
+
+
+def plan_handler(event, context):
+    # Escolhe o engine do process pelo volume de entrada
+    print(event)
+
+    partitions = date_range(event['start_date'], event['end_date'])
+    size = input_bytes(SOURCE_BUCKET[len('s3://'):], partitions)
+
+    return {
+        "engine": "light" if size <= LIGHT_ENGINE_MAX_BYTES else "spark",
+        "input_bytes": size,
+        "partitions": len(partitions),
+        "workers": glue_workers(size)
+    }
+
+
+def handler(event, context):
+    print(event)
+
+    return run(SOURCE_BUCKET, DESTINATION_BUCKET, event['start_date'], event['end_date'], ROLLUPS, CATALOG_DATABASE,
+               PARTITION_INDEX)
@@ -0,0 +1,56 @@
+import boto3
+
+
+def queued_name(name):
+    # Tokens que esperam o proximo crawl, fora do prefixo do crawl atual
+    return f'{name}.queued'
+
+
+class TaskTokenStore:
+
+    # Task tokens da step function esperando um evento externo (fim do crawler).
+    # Cada execucao grava o token em s3://<bucket>/<prefix><nome>/<execucao>,
+    # quem recebe o evento le e remove todos os tokens do nome
+
+    def __init__(self, bucket, prefix='callbacks/', client=None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = client or boto3.client('s3')
+
+    def _key(self, name, execution):
+        return f'{self.prefix}{name}/{execution}'
+
+    def put(self, name, execution, token):
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self._key(name, execution),
+            Body=token.encode('utf-8')
+        )
+
+    def _items(self, name):
+        # (execucao, token) de cada token gravado no nome
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f'{self.prefix}{name}/'):
+            for item in page.get('Contents', []):
+                body = self.client.get_object(Bucket=self.bucket, Key=item['Key'])['Body'].read()
+                yield item['Key'].rsplit('/', 1)[-1], body.decode('utf-8')
+
+    def pop_all(self, name):
+        tokens = []
+        for execution, token in list(self._items(name)):
+            tokens.append(token)
+            self.client.delete_object(Bucket=self.bucket, Key=self._key(name, execution))
+        return tokens
+
+    def move(self, name, target, execution):
+        body = self.client.get_object(Bucket=self.bucket, Key=self._key(name, execution))['Body'].read()
+        self.put(target, execution, body.decode('utf-8'))
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name, execution))
+
+    def move_all(self, name, target):
+        executions = []
+        for execution, token in list(self._items(name)):
+            self.put(target, execution, token)
+            self.client.delete_object(Bucket=self.bucket, Key=self._key(name, execution))
+            executions.append(execution)
+        return executions
@@ -0,0 +1,59 @@
+import boto3
+
+# Limite de particoes por chamada do batch_create_partition
+BATCH_SIZE = 100
+
+
+def catalog_table(table):
+    # Nome da tabela no catalogo: pasta do curated em minusculo, como o crawler criava
+    return table.lower()
+
+
+def partition_input(descriptor, partition):
+    location = descriptor['Location'].rstrip('/')
+    year, month, day = partition
+    return {
+        'Values': [str(year), str(month), str(day)],
+        'StorageDescriptor': {
+            **descriptor,
+            'Location': f'{location}/year={year}/month={month}/day={day}/'
+        }
+    }
+
+
+def register_partitions(database, table, partitions, client=None):
+    # Registra as particoes gravadas direto no catalogo, sem esperar o crawler.
+    # Particoes ja registradas sao ignoradas, reprocessar um dia nao falha
+    client = client or boto3.client('glue')
+    name = catalog_table(table)
+
+    descriptor = client.get_table(DatabaseName=database, Name=name)['Table']['StorageDescriptor']
+    descriptor = {key: descriptor[key] for key in ('Columns', 'InputFormat', 'OutputFormat', 'SerdeInfo', 'Location')
+                  if key in descriptor}
+
+    created, errors = 0, []
+    for start in range(0, len(partitions), BATCH_SIZE):
+        batch = partitions[start:start + BATCH_SIZE]
+        response = client.batch_create_partition(
+            DatabaseName=database,
+            TableName=name,
+            PartitionInputList=[partition_input(descriptor, partition) for partition in batch]
+        )
+        batch_errors = response.get('Errors', [])
+        created += len(batch) - len(batch_errors)
+        errors += [error for error in batch_errors if error['ErrorDetail']['ErrorCode'] != 'AlreadyExistsException']
+
+    if errors:
+        raise Exception(f'ERRO ao registrar particoes de {name}: {errors}')
+
+    return created
+
+
+def register_curated_partitions(database, written, client=None):
+    # written: particoes gravadas de cada tabela. Tabelas sem particao gravada
+    # ficam de fora, o catalogo nao aponta para prefixos vazios
+    client = client or boto3.client('glue')
+    return {
+        table: register_partitions(database, table, sorted(partitions), client)
+        for table, partitions in written.items() if partitions
+    }
@@ -0,0 +1,207 @@
+import os
+from collections import OrderedDict
+from datetime import date
+
+import boto3
+
+from datalake_common.partition_index import INDEXED_TABLES, list_months, load_index, partition_name
+from datalake_common.transforms import PARTITION_COLS
+
+# Consultas direto nos parquet do curated (layout year=/month=/day= do process),
+# sem o caminho do crawler e do athena. As datas viram a lista de particoes
+# lidas; filtros de intervalo e de valores tambem descartam particoes pelo
+# indice de estatisticas (datalake_common.partition_index) quando ele existe.
+# O resultado fica em cache (LRU) pela consulta e pela assinatura dos arquivos
+# das particoes lidas: regravar uma particao muda a assinatura e a consulta le
+# de novo. Funciona em um diretorio local ou no s3 (boto3, testavel com o moto).
+# pyarrow e importado no uso, como nos outros modulos do datalake_common
+
+
+def month_starts(start, end):
+    current = start.replace(day=1)
+    while current <= end:
+        yield current
+        current = current.replace(year=current.year + current.month // 12, month=current.month % 12 + 1)
+
+
+def parse_partition(path):
+    # ('.../year=2025/month=1/day=30/arquivo.parquet') -> (2025, 1, 30)
+    values = dict(part.split('=', 1) for part in path.split('/') if '=' in part)
+    return tuple(int(values[column]) for column in PARTITION_COLS)
+
+
+class CuratedQuery:
+
+    def __init__(self, base_path, cache_size=32, client=None):
+        self.base_path = base_path.rstrip('/')
+        self.cache_size = cache_size
+        self.client = client
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _s3(self):
+        if self.client is None:
+            self.client = boto3.client('s3')
+        return self.client
+
+    def _first_month(self, table):
+        # Primeiro mes com dados pelos shards do indice; sem indice nao ha limite
+        if table not in INDEXED_TABLES:
+            return None
+        months = list_months(self.base_path, table, self._s3() if self.base_path.startswith('s3://') else None)
+        return date.fromisoformat(f'{min(months)}-01') if months else None
+
+    def _month_prefixes(self, table, start, end):
+        # Um prefixo por mes do intervalo, sem datas: a tabela inteira. Sem data
+        # inicial o intervalo comeca no primeiro mes do indice; sem indice a
+        # tabela inteira e listada e partition_files filtra pelo fim
+        if start is None and end is None:
+            return [f'{table}/']
+        start = start or self._first_month(table)
+        if start is None:
+            return [f'{table}/']
+        end = end or date.today()
+        return [f'{table}/year={month.year}/month={month.month}/' for month in month_starts(start, end)]
+
+    def _list_files(self, prefix):
+        # (caminho, modificacao, tamanho) dos parquet abaixo do prefixo
+        if self.base_path.startswith('s3://'):
+            bucket, _, root = self.base_path[len('s3://'):].partition('/')
+            key_prefix = f'{root}/{prefix}' if root else prefix
+            paginator = self._s3().get_paginator('list_objects_v2')
+            return [
+                (f"s3://{bucket}/{item['Key']}", item['LastModified'].timestamp(), item['Size'])
+                for page in paginator.paginate(Bucket=bucket, Prefix=key_prefix)
+                for item in page.get('Contents', []) if item['Key'].endswith('.parquet')
+            ]
+
+        files = []
+        for directory, _, names in os.walk(os.path.join(self.base_path, prefix)):
+            for name in names:
+                if name.endswith('.parquet'):
+                    path = os.path.join(directory, name)
+                    stat = os.stat(path)
+                    files.append((path.replace(os.sep, '/'), stat.st_mtime_ns, stat.st_size))
+        return files
+
+    def partition_files(self, table, start=None, end=None):
+        # {particao: [(caminho, modificacao, tamanho)]} das particoes entre as datas
+        first = partition_name((start.year, start.month, start.day)) if start else None
+        last = partition_name((end.year, end.month, end.day)) if end else None
+
+        partitions = {}
+        for prefix in self._month_prefixes(table, start, end):
+            for file in self._list_files(prefix):
+                partition = parse_partition(file[0])
+                name = partition_name(partition)
+                if (first is None or name >= first) and (last is None or name <= last):
+                    partitions.setdefault(partition, []).append(file)
+        return partitions
+
+    def prune(self, table, partitions, ranges=None, values=None):
+        # Particoes sem entrada no indice (ainda nao indexadas) sao sempre lidas
+        if table not in INDEXED_TABLES or not (ranges or values) or not partitions:
+            return partitions
+        months = sorted({partition_name(partition)[:7] for partition in partitions})
+        index = load_index(self.base_path, table, months, self._s3() if self.base_path.startswith('s3://') else None)
+        matching = set(index.partitions(ranges=ranges, values=values))
+        return {
+            partition: files for partition, files in partitions.items()
+            if partition_name(partition) not in index.entries or partition in matching
+        }
+
+    def _read_file(self, path, columns, row_filter):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if path.startswith('s3://'):
+            bucket, _, key = path[len('s3://'):].partition('/')
+            source = pa.BufferReader(self._s3().get_object(Bucket=bucket, Key=key)['Body'].read())
+        else:
+            source = path
+        return pq.read_table(source, columns=columns, filters=row_filter)
+
+    def _read(self, table, partitions, columns, row_filter):
+        import pyarrow as pa
+
+        tables = []
+        for partition, files in sorted(partitions.items()):
+            for path, _, _ in files:
+                data = self._read_file(path, columns, row_filter)
+                for column, value in zip(PARTITION_COLS, partition):
+                    data = data.append_column(column, pa.array([value] * data.num_rows, pa.int32()))
+                tables.append(data)
+
+        if not tables:
+            return empty_table(table, columns)
+        # Arquivos do Spark (INT96) e do process_light no mesmo schema. Cast
+        # explicito em vez do promote_options, que so existe no pyarrow 14+
+        schema = empty_table(table, columns + PARTITION_COLS if columns is not None else None).schema
+        return pa.concat_tables([data.select(schema.names).cast(schema) for data in tables])
+
+    def query(self, table, start=None, end=None, columns=None, ranges=None, values=None):
+        # Linhas da tabela entre as datas (date ou 'YYYY-MM-DD', inclusivas) como
+        # pyarrow.Table (imutavel, o mesmo objeto pode sair do cache). ranges:
+        # {coluna: (minimo, maximo)} inclusivos, None deixa o lado aberto /
+        # values: {coluna: valores aceitos}
+        start = date.fromisoformat(start) if isinstance(start, str) else start
+        end = date.fromisoformat(end) if isinstance(end, str) else end
+        ranges, values = ranges or {}, values or {}
+
+        partitions = self.prune(table, self.partition_files(table, start, end), ranges, values)
+        signature = tuple(
+            (partition, tuple(sorted(files))) for partition, files in sorted(partitions.items())
+        )
+        key = (
+            table, start, end, tuple(columns) if columns else None,
+            tuple(sorted((column, tuple(bounds)) for column, bounds in ranges.items())),
+            tuple(sorted((column, tuple(sorted(accepted))) for column, accepted in values.items())),
+            signature
+        )
+
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        self.misses += 1
+        data_columns = [column for column in columns if column not in PARTITION_COLS] if columns else None
+        result = self._read(table, partitions, data_columns, row_filter(ranges, values))
+        if columns:
+            result = result.select(list(columns))
+
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result
+
+    def clear_cache(self):
+        self.cache.clear()
+
+
+def row_filter(ranges, values):
+    # Expressao do pyarrow aplicada na leitura de cada arquivo (pula row groups
+    # pelo min/max quando o arquivo tem estatisticas)
+    import pyarrow.compute as pc
+
+    expression = None
+    for column, (low, high) in sorted(ranges.items()):
+        if low is not None:
+            expression = (pc.field(column) >= low) if expression is None else expression & (pc.field(column) >= low)
+        if high is not None:
+            expression = (pc.field(column) <= high) if expression is None else expression & (pc.field(column) <= high)
+    for column, accepted in sorted(values.items()):
+        condition = pc.field(column).isin(list(accepted))
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def empty_table(table, columns=None):
+    import pyarrow as pa
+
+    from datalake_common.pandas_engine import arrow_schema
+
+    schema = pa.schema(list(arrow_schema(table)) + [pa.field(column, pa.int32()) for column in PARTITION_COLS])
+    empty = schema.empty_table()
+    return empty.select(list(columns)) if columns else empty
@@ -0,0 +1,223 @@
+import copy
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+
+import boto3
+from botocore.exceptions import ClientError
+
+from datalake_common.transforms import rollup_days, to_partitions
+
+# Reservas de particoes entre execucoes concorrentes. Cada chave (dataset e dia)
+# tem um dono com prazo de validade e uma fila de espera: uma execucao so pega a
+# chave livre quando e a primeira da fila, entao o mesmo dia e processado na
+# ordem de chegada e dias diferentes rodam em paralelo. A reserva vence sozinha
+# no prazo, uma execucao que morreu nao trava a particao. Na fila o prazo e
+# curto (algumas esperas entre tentativas): quem parou de tentar sai da frente
+# sem segurar os proximos pelo prazo inteiro da reserva
+
+
+class LockConflict(Exception):
+    # Outra escrita alterou o item entre a leitura e a escrita condicional
+    pass
+
+
+class PartitionBusy(Exception):
+    pass
+
+
+class MemoryLockStore:
+
+    # Substituto local da tabela do DynamoDB (testes e execucao local)
+
+    def __init__(self):
+        self.items = {}
+        self.guard = threading.Lock()
+
+    def get(self, key):
+        with self.guard:
+            return copy.deepcopy(self.items.get(key))
+
+    def put(self, item, expected_version):
+        with self.guard:
+            current = self.items.get(item['lock_key'])
+            if (current['version'] if current else None) != expected_version:
+                raise LockConflict(item['lock_key'])
+            self.items[item['lock_key']] = copy.deepcopy(item)
+
+
+def purge_at(item):
+    # Quando o item pode sumir pelo TTL: depois da reserva e do ultimo da fila.
+    # O expires_at sozinho fica no passado com a chave livre e ainda com fila
+    return max([item['expires_at']] + [waiter['expires_at'] for waiter in item['queue']])
+
+
+class DynamoDBLockStore:
+
+    # Um item por chave, escrita condicional pela versao lida. O TTL da tabela
+    # usa o purge_at, nao o expires_at da reserva
+
+    def __init__(self, table_name, client=None):
+        self.table_name = table_name
+        self.client = client or boto3.client('dynamodb')
+
+    def get(self, key):
+        response = self.client.get_item(TableName=self.table_name, Key={'lock_key': {'S': key}}, ConsistentRead=True)
+        if 'Item' not in response:
+            return None
+        item = response['Item']
+        return {
+            'lock_key': key,
+            'owner': item.get('owner', {}).get('S'),
+            'expires_at': int(item['expires_at']['N']),
+            'version': int(item['version']['N']),
+            'queue': [
+                {'owner': waiter['M']['owner']['S'], 'expires_at': int(waiter['M']['expires_at']['N'])}
+                for waiter in item.get('queue', {}).get('L', [])
+            ]
+        }
+
+    def put(self, item, expected_version):
+        record = {
+            'lock_key': {'S': item['lock_key']},
+            'expires_at': {'N': str(item['expires_at'])},
+            'purge_at': {'N': str(purge_at(item))},
+            'version': {'N': str(item['version'])},
+            'queue': {'L': [
+                {'M': {'owner': {'S': waiter['owner']}, 'expires_at': {'N': str(waiter['expires_at'])}}}
+                for waiter in item['queue']
+            ]}
+        }
+        if item['owner']:
+            record['owner'] = {'S': item['owner']}
+
+        if expected_version is None:
+            condition = {'ConditionExpression': 'attribute_not_exists(lock_key)'}
+        else:
+            condition = {
+                'ConditionExpression': 'version = :version',
+                'ExpressionAttributeValues': {':version': {'N': str(expected_version)}}
+            }
+        try:
+            self.client.put_item(TableName=self.table_name, Item=record, **condition)
+        except ClientError as error:
+            if error.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                raise LockConflict(item['lock_key'])
+            raise
+
+
+class PartitionLocks:
+
+    def __init__(self, store, ttl_seconds=900, waiter_ttl_seconds=60, clock=time.time):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.waiter_ttl_seconds = waiter_ttl_seconds
+        self.clock = clock
+
+    def _update(self, key, change):
+        # Le, altera e grava com a versao lida, repetindo quando outra escrita vence
+        while True:
+            item = self.store.get(key)
+            expected_version = item['version'] if item else None
+            item = item or {'lock_key': key, 'owner': None, 'expires_at': 0, 'version': 0, 'queue': []}
+
+            now = int(self.clock())
+            if item['owner'] and item['expires_at'] <= now:
+                item['owner'] = None
+            item['queue'] = [waiter for waiter in item['queue'] if waiter['expires_at'] > now]
+
+            result = change(item, now)
+            if result is None:
+                return None
+            try:
+                self.store.put({**item, 'version': item['version'] + 1}, expected_version)
+                return result
+            except LockConflict:
+                continue
+
+    def _try_claim(self, key, owner):
+        def change(item, now):
+            first_in_queue = not item['queue'] or item['queue'][0]['owner'] == owner
+            if item['owner'] in (None, owner) and first_in_queue:
+                item['owner'], item['expires_at'] = owner, now + self.ttl_seconds
+                item['queue'] = [waiter for waiter in item['queue'] if waiter['owner'] != owner]
+                return True
+            # Entra (ou renova a posicao) na fila de espera da chave, com o prazo
+            # curto: a posicao so continua enquanto o dono continua tentando
+            expires_at = now + self.waiter_ttl_seconds
+            waiters = [waiter['owner'] for waiter in item['queue']]
+            if owner in waiters:
+                item['queue'][waiters.index(owner)]['expires_at'] = expires_at
+            else:
+                item['queue'].append({'owner': owner, 'expires_at': expires_at})
+            return False
+
+        return self._update(key, change)
+
+    def claim(self, keys, owner):
+        # Reserva as chaves em ordem ate a primeira ocupada. A ordem fixa evita que
+        # duas execucoes fiquem esperando uma pela outra. Chamar de novo com o
+        # mesmo dono continua de onde parou (as chaves ja reservadas sao renovadas)
+        claimed = []
+        keys = sorted(set(keys))
+        for position, key in enumerate(keys):
+            if not self._try_claim(key, owner):
+                return {'claimed': claimed, 'waiting': keys[position:]}
+            claimed.append(key)
+        return {'claimed': claimed, 'waiting': []}
+
+    def release(self, keys, owner):
+        # Libera as chaves deste dono e tira o dono das filas de espera
+        def change(item, now):
+            waiters = [waiter for waiter in item['queue'] if waiter['owner'] != owner]
+            if item['owner'] != owner and len(waiters) == len(item['queue']):
+                return None
+            if item['owner'] == owner:
+                item['owner'], item['expires_at'] = None, now
+            item['queue'] = waiters
+            return True
+
+        return [key for key in sorted(set(keys)) if self._update(key, change)]
+
+    @contextmanager
+    def hold(self, keys, owner, wait_seconds=60, poll_seconds=1):
+        # Espera as chaves ate wait_seconds dentro da propria lambda (o cleaner),
+        # em vez do loop de espera da step function. poll_seconds deve ficar
+        # abaixo do waiter_ttl_seconds, senao a posicao na fila vence entre as tentativas
+        deadline = time.monotonic() + wait_seconds
+        while self.claim(keys, owner)['waiting']:
+            if time.monotonic() >= deadline:
+                self.release(keys, owner)
+                raise PartitionBusy(f'particoes ocupadas por outra execucao: {sorted(keys)}')
+            time.sleep(poll_seconds)
+        try:
+            yield
+        finally:
+            self.release(keys, owner)
+
+
+def partition_lock_keys(dataset, partitions):
+    # Uma chave por dataset e dia
+    return [f'{dataset}#{year:04d}-{month:02d}-{day:02d}' for year, month, day in partitions]
+
+
+def curated_lock_keys(partitions, rollups=True):
+    # O process regrava os dias processados e, com os agregados, semanas, meses e
+    # a janela das medias moveis em volta deles. A reserva e por mes do curated:
+    # execucoes em meses distantes rodam juntas, no mesmo mes ou vizinhos em fila
+    if not rollups:
+        return partition_lock_keys('curated', partitions)
+
+    days = set(partitions)
+    for read_days in rollup_days(partitions).values():
+        days.update(read_days)
+    months = to_partitions(date(year, month, 1) for year, month, _ in days)
+    return [f'curated#{year:04d}-{month:02d}' for year, month, _ in months]
+
+
+def lock_store(table_name=None):
+    # Tabela do DynamoDB quando configurada, senao reservas so em memoria
+    if table_name:
+        return DynamoDBLockStore(table_name)
+    return MemoryLockStore()
@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from datalake_common.schemas import HEALTH_AUTO_EXPORT, WORKOUTS
+from datalake_common.transforms import (
+    PARTITION_COLS, DECIMALS, ROLLING_WINDOWS, HEALTH_COLUMNS, WORKOUT_DAY_AGGREGATES, HEALTH_DAY_AGGREGATES,
+    HEALTH_PERIOD_AGGREGATES, WORKOUT_PERIOD_AGGREGATES, HEALTH_ROLLING_METRICS, WORKOUT_ROLLING_METRICS,
+    CURATED_TABLES, partition_keys
+)
+
+# Mesmas transformacoes do process.py em pandas, para volumes pequenos (Lambda
+# ou glue python shell). A saida segue CURATED_TABLES, igual a do Spark
+
+ARROW_TYPES = {
+    'string': pa.string(),
+    'double': pa.float64(),
+    'bigint': pa.int64(),
+    'date': pa.date32(),
+    'timestamp': pa.timestamp('ns')
+}
+
+
+def arrow_schema(table):
+    return pa.schema([(column, ARROW_TYPES[dtype]) for column, dtype in CURATED_TABLES[table]])
+
+
+def round_half_up(values):
+    # round do Spark arredonda .5 para longe do zero, o do numpy para o par.
+    # O round(.., 6) tira o erro de ponto flutuante antes (2.675 * 100 = 267.4999...)
+    factor = 10 ** DECIMALS
+    values = values.to_numpy(dtype='float64')
+    return np.sign(values) * np.floor(np.round(np.abs(values) * factor, 6) + 0.5) / factor
+
+
+def round_numeric_columns(df):
+    for column in df.columns:
+        if column not in PARTITION_COLS and pd.api.types.is_float_dtype(df[column]):
+            df[column] = round_half_up(df[column])
+    return df
+
+
+def sum_or_null(values):
+    # sum do Spark e nulo quando todos os valores sao nulos
+    return values.sum(min_count=1)
+
+
+def aggregate(df, keys, aggregates):
+    named = {}
+    for output, function, source in aggregates:
+        if function == 'count':
+            named[output] = (keys[0], 'size')
+        elif function == 'count_distinct':
+            named[output] = (source, 'nunique')
+        elif function == 'sum':
+            named[output] = (source, sum_or_null)
+        else:
+            named[output] = (source, function)
+
+    return df.groupby(keys, dropna=False, observed=True).agg(**named).reset_index()
+
+
+def with_partition_columns(df, date_column):
+    dates = pd.to_datetime(df[date_column])
+    return df.assign(year=dates.dt.year.astype('int32'), month=dates.dt.month.astype('int32'),
+                     day=dates.dt.day.astype('int32'))
+
+
+def partition_date(df):
+    return pd.to_datetime(pd.DataFrame({'year': df['year'], 'month': df['month'], 'day': df['day']}))
+
+
+def partition_key(df):
+    return df['year'].astype('int64') * 10000 + df['month'] * 100 + df['day']
+
+
+def select_table(df, table):
+    return df[[column for column, _ in CURATED_TABLES[table]] + PARTITION_COLS]
+
+
+def transform_health(df_health):
+    # Renomeando colunas para portugues e convertendo unidades (kJ para kcal com o fator do schema)
+    df = pd.DataFrame({
+        column.curated: df_health[column.normalized] * column.factor if column.factor else df_health[column.normalized]
+        for column in HEALTH_AUTO_EXPORT.columns
+    })
+    df['data'] = pd.to_datetime(df['data'])
+
+    df['calorias_gastas'] = df['calorias_repouso_kcal'] + df['calorias_ativas_kcal']
+    df['batimentos_media_bpm'] = (df['batimentos_max_bpm'] + df['batimentos_min_bpm']) / 2
+
+    df = round_numeric_columns(df[HEALTH_COLUMNS].copy())
+
+    return with_partition_columns(df, 'data')
+
+
+def transform_workouts(df_workout):
+    df = pd.DataFrame({column.curated: df_workout[column.normalized] for column in WORKOUTS.columns})
+
+    # Duracao HH:mm:ss em segundos, como o sum do timestamp no Spark
+    df['duracao'] = pd.to_timedelta(df['duracao'], errors='coerce').dt.total_seconds()
+    df = with_partition_columns(df, 'data')
+
+    df_agrupado = aggregate(df, ['tipo_de_exercicio', *PARTITION_COLS], WORKOUT_DAY_AGGREGATES)
+    df_agrupado['duracao_min'] = round_half_up(df_agrupado['duracao_min'] / 60)
+
+    return select_table(round_numeric_columns(df_agrupado), 'Workouts')
+
+
+def daily_health(df_health):
+    df = aggregate(df_health, PARTITION_COLS, HEALTH_DAY_AGGREGATES)
+    df['dia'] = partition_date(df)
+    return df
+
+
+def period_start(dates, period):
+    # period: week (semana comecando na segunda) ou month
+    if period == 'week':
+        return dates - pd.to_timedelta(dates.dt.weekday, unit='D')
+    return dates.dt.to_period('M').dt.start_time
+
+
+def period_table(period):
+    return 'Weekly' if period == 'week' else 'Monthly'
+
+
+def health_period_rollup(df_daily, period):
+    df = df_daily.assign(inicio=period_start(df_daily['dia'], period))
+    df = aggregate(df, ['inicio'], HEALTH_PERIOD_AGGREGATES)
+    return select_table(with_partition_columns(round_numeric_columns(df), 'inicio'), f'Health{period_table(period)}')
+
+
+def workouts_period_rollup(df_workout, period):
+    df = df_workout.assign(dia=partition_date(df_workout))
+    df['inicio'] = period_start(df['dia'], period)
+    df = aggregate(df, ['tipo_de_exercicio', 'inicio'], WORKOUT_PERIOD_AGGREGATES)
+    return select_table(with_partition_columns(round_numeric_columns(df), 'inicio'), f'Workouts{period_table(period)}')
+
+
+def health_rolling(df_daily, output_partitions):
+    # Medias moveis dos totais diarios em janelas de dias de calendario
+    df = df_daily.sort_values('dia').set_index('dia')
+    for days in ROLLING_WINDOWS:
+        rolled = df[HEALTH_ROLLING_METRICS].rolling(f'{days}D').mean()
+        for metric in HEALTH_ROLLING_METRICS:
+            df[f'{metric}_media_{days}d'] = rolled[metric].to_numpy()
+
+    df = df.reset_index()
+    df = df[partition_key(df).isin(partition_keys(output_partitions))]
+    return select_table(round_numeric_columns(df), 'HealthRolling')
+
+
+def workouts_rolling(df_workout, output_partitions):
+    # Media diaria por tipo de exercicio na janela: soma da janela / dias da janela
+    df = df_workout.assign(dia=partition_date(df_workout)) \
+        .sort_values(['tipo_de_exercicio', 'dia']).set_index('dia')
+    for days in ROLLING_WINDOWS:
+        rolled = df.groupby('tipo_de_exercicio', sort=True)[WORKOUT_ROLLING_METRICS].rolling(f'{days}D').sum()
+        for metric in WORKOUT_ROLLING_METRICS:
+            df[f'{metric}_media_{days}d'] = rolled[metric].to_numpy() / days
+
+    df = df.reset_index()
+    df = df[partition_key(df).isin(partition_keys(output_partitions))]
+    return select_table(round_numeric_columns(df), 'WorkoutsRolling')
@@ -0,0 +1,217 @@
+import json
+import os
+
+import boto3
+
+from datalake_common.transforms import CURATED_TABLES, PARTITION_COLS
+
+# Indice de estatisticas por particao das tabelas diarias do curated: linhas,
+# min/max das colunas numericas e valores distintos das colunas de categoria.
+# Responde perguntas como "dias com batimento maximo acima de X" ou "ultimo
+# exercicio do tipo Y" sem scan no Spark ou no athena, e reduz as particoes que
+# uma consulta precisa ler. Um json por tabela e mes em _index/ no bucket do
+# curated, fora das pastas das tabelas (Spark, athena e crawler nao leem). O
+# process regrava so os meses dos dias processados, que ficam reservados pelas
+# chaves curated#YYYY-MM durante a execucao (datalake_common.locks)
+INDEX_PREFIX = '_index'
+
+# Tabelas indexadas -> colunas com os valores distintos no indice
+INDEXED_TABLES = {
+    'HealthData': [],
+    'Workouts': ['tipo_de_exercicio']
+}
+
+
+def numeric_columns(table):
+    return [column for column, dtype in CURATED_TABLES[table] if dtype in ('double', 'bigint')]
+
+
+def index_aggregates(table):
+    # (coluna de saida, funcao, coluna de entrada) calculadas por particao,
+    # funcoes: count (linhas), min, max, values (valores distintos)
+    return [('rows', 'count', None)] + [
+        (f'{function}__{column}', function, column)
+        for column in numeric_columns(table) for function in ('min', 'max')
+    ] + [(f'values__{column}', 'values', column) for column in INDEXED_TABLES[table]]
+
+
+def partition_name(partition):
+    year, month, day = partition
+    return f'{int(year):04d}-{int(month):02d}-{int(day):02d}'
+
+
+def to_partition(name):
+    return tuple(int(part) for part in name.split('-'))
+
+
+def json_number(value):
+    # Tipos do numpy viram tipos do python; nulos e NaN ficam fora do indice
+    value = value.item() if hasattr(value, 'item') else value
+    if value is None or value != value:
+        return None
+    return value
+
+
+def partition_stats(rows, table):
+    # Linhas do agregado por particao (Spark ou pandas) -> {'YYYY-MM-DD': entrada}
+    stats = {}
+    for row in rows:
+        entry = {'rows': int(row['rows']), 'min': {}, 'max': {}, 'values': {}}
+        for output, function, column in index_aggregates(table)[1:]:
+            if function == 'values':
+                entry['values'][column] = sorted(str(value) for value in row[output] if value is not None)
+                continue
+            value = json_number(row[output])
+            if value is not None:
+                entry[function][column] = value
+        stats[partition_name([row[column] for column in PARTITION_COLS])] = entry
+    return stats
+
+
+def frame_stats(df, table):
+    # Estatisticas de um DataFrame do pandas com as colunas de particao
+    grouped = df.groupby(PARTITION_COLS, observed=True)
+    result = grouped.size().rename('rows').to_frame()
+    for output, function, column in index_aggregates(table)[1:]:
+        if function == 'values':
+            result[output] = grouped[column].agg(lambda values: list(values.dropna().unique()))
+        else:
+            result[output] = getattr(grouped[column], function)()
+    return partition_stats(result.reset_index().to_dict('records'), table)
+
+
+def split_path(path):
+    bucket, _, key = path[len('s3://'):].partition('/')
+    return bucket, key
+
+
+def shard_path(base_path, table, month):
+    return f"{base_path.rstrip('/')}/{INDEX_PREFIX}/{table}/{month}.json"
+
+
+def read_json(path, client=None):
+    if path.startswith('s3://'):
+        client = client or boto3.client('s3')
+        bucket, key = split_path(path)
+        try:
+            return json.loads(client.get_object(Bucket=bucket, Key=key)['Body'].read())
+        except client.exceptions.NoSuchKey:
+            return None
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def write_json(path, data, client=None):
+    body = json.dumps(data, separators=(',', ':'), sort_keys=True)
+    if path.startswith('s3://'):
+        client = client or boto3.client('s3')
+        bucket, key = split_path(path)
+        client.put_object(Bucket=bucket, Key=key, Body=body.encode('utf-8'), ContentType='application/json')
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as file:
+        file.write(body)
+
+
+def list_months(base_path, table, client=None):
+    prefix = shard_path(base_path, table, '')[:-len('.json')]
+    if prefix.startswith('s3://'):
+        client = client or boto3.client('s3')
+        bucket, key_prefix = split_path(prefix)
+        paginator = client.get_paginator('list_objects_v2')
+        names = [
+            item['Key'][len(key_prefix):] for page in paginator.paginate(Bucket=bucket, Prefix=key_prefix)
+            for item in page.get('Contents', [])
+        ]
+    elif os.path.isdir(prefix):
+        names = os.listdir(prefix)
+    else:
+        names = []
+    return sorted(name[:-len('.json')] for name in names if name.endswith('.json'))
+
+
+def update_index(base_path, table, stats, client=None):
+    # Substitui as entradas dos dias gravados (como o overwrite dinamico das
+    # particoes) e mantem os outros dias do mes. Retorna os meses regravados
+    months = {}
+    for name, entry in stats.items():
+        months.setdefault(name[:7], {})[name] = entry
+
+    for month, entries in sorted(months.items()):
+        path = shard_path(base_path, table, month)
+        shard = read_json(path, client) or {'table': table, 'month': month, 'partitions': {}}
+        shard['partitions'].update(entries)
+        write_json(path, shard, client)
+    return sorted(months)
+
+
+def load_index(base_path, table, months=None, client=None):
+    # Indice da tabela inteira ou so dos meses informados ('YYYY-MM')
+    partitions = {}
+    for month in months if months is not None else list_months(base_path, table, client):
+        shard = read_json(shard_path(base_path, table, month), client)
+        if shard:
+            partitions.update(shard['partitions'])
+    return PartitionIndex(table, partitions)
+
+
+class PartitionIndex:
+
+    def __init__(self, table, partitions):
+        self.table = table
+        self.entries = dict(sorted(partitions.items()))
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def rows(self):
+        return sum(entry['rows'] for entry in self.entries.values())
+
+    def _matches(self, entry, ranges, values):
+        for column, (low, high) in ranges.items():
+            if column not in entry['min']:
+                return False
+            if low is not None and entry['max'][column] < low:
+                return False
+            if high is not None and entry['min'][column] > high:
+                return False
+        for column, accepted in values.items():
+            if not set(entry['values'].get(column, [])) & set(accepted):
+                return False
+        return True
+
+    def partitions(self, start=None, end=None, ranges=None, values=None):
+        # Particoes que podem ter linhas no filtro (o resto e descartado sem leitura).
+        # start/end: 'YYYY-MM-DD' inclusivos / ranges: {coluna: (minimo, maximo)},
+        # None deixa o lado aberto / values: {coluna: valores aceitos}
+        ranges, values = ranges or {}, values or {}
+        return [
+            to_partition(name) for name, entry in self.entries.items()
+            if (start is None or name >= start) and (end is None or name <= end)
+            and self._matches(entry, ranges, values)
+        ]
+
+    def days_with(self, column, above=None, below=None):
+        # Dias com algum valor acima/abaixo do limite: resposta exata pelo max/min
+        return [
+            to_partition(name) for name, entry in self.entries.items()
+            if column in entry['max']
+            and (above is None or entry['max'][column] > above)
+            and (below is None or entry['min'][column] < below)
+        ]
+
+    def last_with_value(self, column, value):
+        # Ultimo dia em que a coluna teve o valor (ex.: ultimo exercicio de um tipo)
+        for name in reversed(self.entries):
+            if value in self.entries[name]['values'].get(column, []):
+                return to_partition(name)
+        return None
+
+    def column_range(self, column):
+        entries = [entry for entry in self.entries.values() if column in entry['min']]
+        if not entries:
+            return None
+        return min(entry['min'][column] for entry in entries), max(entry['max'][column] for entry in entries)
@@ -0,0 +1,101 @@
+# Regras de qualidade dos datasets, declaradas junto com o schema. Cada regra
+# devolve a mascara das linhas que falham calculada sobre a coluna inteira, sem
+# apply por linha; os motivos so sao montados para as linhas em quarentena.
+# numpy e pandas sao importados no uso, o glue job importa os schemas sem eles
+
+
+class Rule:
+
+    kind = None
+
+    def __init__(self, column, name=None):
+        self.column = column
+        self.name = name or f'{self.kind}:{column}'
+
+    def failures(self, values):
+        raise NotImplementedError
+
+
+class NotNull(Rule):
+
+    kind = 'not_null'
+
+    def failures(self, values):
+        return values.isna().to_numpy()
+
+
+class Range(Rule):
+
+    # Nulos nao sao avaliados, ficam para a regra NotNull
+    kind = 'range'
+
+    def __init__(self, column, min=None, max=None, name=None):
+        super().__init__(column, name)
+        self.min = min
+        self.max = max
+
+    def failures(self, values):
+        import numpy as np
+
+        numbers = values.to_numpy(dtype='float64', na_value=np.nan)
+        failed = np.zeros(len(numbers), dtype=bool)
+        if self.min is not None:
+            failed |= numbers < self.min
+        if self.max is not None:
+            failed |= numbers > self.max
+        return failed
+
+
+class Pattern(Rule):
+
+    # Formato de colunas texto (ex.: duracao HH:mm:ss), nulos nao sao avaliados
+    kind = 'type'
+
+    def __init__(self, column, pattern, name=None):
+        super().__init__(column, name)
+        self.pattern = pattern
+
+    def failures(self, values):
+        present = values.notna()
+        matched = values.astype('string').str.fullmatch(self.pattern).fillna(False).astype(bool)
+        return (present & ~matched).to_numpy()
+
+
+def evaluate(df, rules):
+    # Mascara das linhas validas e contagem de falhas por regra
+    import numpy as np
+
+    valid = np.ones(len(df), dtype=bool)
+    failures = {}
+    for rule in rules:
+        failed = rule.failures(df[rule.column])
+        failures[rule.name] = failed
+        valid &= ~failed
+    return valid, failures
+
+
+def failure_reasons(failures, rows):
+    # Regras que falharam em cada linha da quarentena, separadas por ';'
+    import numpy as np
+
+    reasons = [[] for _ in range(int(rows.sum()))]
+    for name, failed in failures.items():
+        for position in np.flatnonzero(failed[rows]):
+            reasons[position].append(name)
+    return [';'.join(names) for names in reasons]
+
+
+def split_quality(df, rules):
+    # (linhas validas, linhas em quarentena com a coluna dq_reasons, falhas por regra)
+    if not rules or df.empty:
+        return df, df.iloc[0:0], {}
+
+    valid, failures = evaluate(df, rules)
+    counts = {name: int(failed.sum()) for name, failed in failures.items()}
+    if valid.all():
+        return df, df.iloc[0:0], counts
+
+    rejected = ~valid
+    quarantine = df[rejected].copy()
+    quarantine['dq_reasons'] = failure_reasons(failures, rejected)
+    return df[valid], quarantine, counts
@@ -0,0 +1,22 @@
+from .health_auto_export import HEALTH_AUTO_EXPORT
+from .workouts import WORKOUTS
+
+# Prefixo do nome do arquivo exportado pelo Health Auto Export -> schema
+SCHEMAS = {
+    HEALTH_AUTO_EXPORT.name: HEALTH_AUTO_EXPORT,
+    WORKOUTS.name: WORKOUTS
+}
+
+
+def get_schema(name):
+    return SCHEMAS[name]
+
+
+def dataset_for_key(key):
+    # Arquivo exportado (HealthAutoExport-*.csv) ou prefixo do dataset gravado
+    # pelo firehose (data/HealthAutoExport/year=.../arquivo.parquet)
+    *prefixes, file_name = key.split('/')
+    for dataset in SCHEMAS:
+        if file_name.startswith(dataset) or dataset in prefixes:
+            return dataset
+    return None
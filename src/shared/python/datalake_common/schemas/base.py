@@ -0,0 +1,70 @@
+# Tipos aceitos em Column.dtype e o tipo correspondente no Spark
+SPARK_TYPES = {
+    'string': 'StringType',
+    'double': 'DoubleType',
+    'timestamp': 'TimestampType'
+}
+
+
+class Column:
+
+    # source: cabecalho no csv do Health Auto Export
+    # normalized: nome no bucket cleaned (sem caracteres especiais, minusculo)
+    # curated: nome em portugues no bucket curated
+    # dtype: tipo da coluna depois de limpa
+    # factor: fator de conversao de unidade aplicado no curated
+    def __init__(self, source, normalized, curated, dtype='double', factor=None):
+        if dtype not in SPARK_TYPES:
+            raise ValueError(f'Tipo {dtype} nao suportado para a coluna {source}')
+
+        self.source = source
+        self.normalized = normalized
+        self.curated = curated
+        self.dtype = dtype
+        self.factor = factor
+
+
+class DatasetSchema:
+
+    # natural_keys: colunas que identificam uma linha, usadas no upsert do cleaned
+    # rules: regras de qualidade (datalake_common.quality) aplicadas pelo cleaner
+    # dictionary_columns: colunas gravadas com dicionario no parquet do cleaned
+    # (None: padrao do pyarrow, dicionario em todas as colunas)
+    def __init__(self, name, date_column, columns, natural_keys, rules=None, dictionary_columns=None):
+        self.name = name
+        self.date_column = date_column
+        self.columns = columns
+        self.natural_keys = natural_keys
+        self.rules = rules or []
+        self.dictionary_columns = dictionary_columns
+
+        # Mapas pre-calculados, o cleaner e o glue job nao aplicam regex nos nomes
+        self.source_columns = [column.source for column in columns]
+        self.normalized_columns = [column.normalized for column in columns]
+        self.rename_map = {column.source: column.normalized for column in columns}
+        self.curated_rename_map = {column.normalized: column.curated for column in columns}
+        self.dtypes = {column.normalized: column.dtype for column in columns}
+
+    def column(self, normalized):
+        for column in self.columns:
+            if column.normalized == normalized:
+                return column
+        raise KeyError(normalized)
+
+    def arrow_read_types(self):
+        # Tipos do csv bruto: datas ficam como texto e sao convertidas depois
+        import pyarrow as pa
+
+        return {
+            column.source: pa.string() if column.dtype != 'double' else pa.float64()
+            for column in self.columns
+        }
+
+    def spark_read_schema(self):
+        # Schema explicito do parquet no cleaned, evita a inferencia do Spark
+        from pyspark.sql import types
+
+        return types.StructType([
+            types.StructField(column.normalized, getattr(types, SPARK_TYPES[column.dtype])(), True)
+            for column in self.columns
+        ])
@@ -0,0 +1,32 @@
+from ..quality import NotNull, Range
+from .base import Column, DatasetSchema
+
+KJ_TO_KCAL = 0.239
+
+HEALTH_AUTO_EXPORT = DatasetSchema(
+    name='HealthAutoExport',
+    date_column='date',
+    columns=[
+        Column('Date', 'date', 'data', 'timestamp'),
+        Column('Dietary Energy (kJ)', 'dietary_energy_kj', 'calorias_consumidas', factor=KJ_TO_KCAL),
+        Column('Resting Energy (kJ)', 'resting_energy_kj', 'calorias_repouso_kcal', factor=KJ_TO_KCAL),
+        Column('Active Energy (kJ)', 'active_energy_kj', 'calorias_ativas_kcal', factor=KJ_TO_KCAL),
+        Column('Heart Rate [Max] (bpm)', 'heart_rate_max_bpm', 'batimentos_max_bpm'),
+        Column('Heart Rate [Min] (bpm)', 'heart_rate_min_bpm', 'batimentos_min_bpm'),
+        Column('Walking + Running Distance (km)', 'walking__running_distance_km', 'distancia_km'),
+        Column('Walking Speed (km/hr)', 'walking_speed_kmhr', 'velocidade_caminhada_km_hr'),
+        Column('Apple Stand Hour (hours)', 'apple_stand_hour_hours', 'tempo_em_pe_horas')
+    ],
+    natural_keys=['date'],
+    rules=[
+        NotNull('date'),
+        Range('dietary_energy_kj', min=0, max=100000),
+        Range('resting_energy_kj', min=0, max=50000),
+        Range('active_energy_kj', min=0, max=50000),
+        Range('heart_rate_max_bpm', min=25, max=250),
+        Range('heart_rate_min_bpm', min=25, max=250),
+        Range('walking__running_distance_km', min=0, max=500),
+        Range('walking_speed_kmhr', min=0, max=30),
+        Range('apple_stand_hour_hours', min=0, max=24)
+    ]
+)
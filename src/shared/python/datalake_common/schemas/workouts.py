@@ -0,0 +1,32 @@
+from ..quality import NotNull, Pattern, Range
+from .base import Column, DatasetSchema
+
+WORKOUTS = DatasetSchema(
+    name='Workouts',
+    date_column='start',
+    columns=[
+        Column('Workout Type', 'workout_type', 'tipo_de_exercicio', 'string'),
+        Column('Start', 'start', 'data', 'timestamp'),
+        Column('Duration', 'duration', 'duracao', 'string'),
+        Column('Active Energy (kcal)', 'active_energy_kcal', 'energia_ativa_kcal'),
+        Column('Intensity (kcal/hr·kg)', 'intensity_kcalhrkg', 'intensidade_kcal_hr_kg'),
+        Column('Max. Heart Rate (bpm)', 'max_heart_rate_bpm', 'batimento_maximo_bpm'),
+        Column('Avg. Heart Rate (bpm)', 'avg_heart_rate_bpm', 'batimento_medio_bpm'),
+        Column('Step Count', 'step_count', 'quantidade_de_passos'),
+        Column('Distance (km)', 'distance_km', 'distancia_km')
+    ],
+    natural_keys=['start', 'workout_type'],
+    rules=[
+        NotNull('start'),
+        NotNull('workout_type'),
+        Pattern('duration', r'\d{1,3}:[0-5]\d:[0-5]\d'),
+        Range('active_energy_kcal', min=0, max=10000),
+        Range('intensity_kcalhrkg', min=0, max=50),
+        Range('max_heart_rate_bpm', min=25, max=250),
+        Range('avg_heart_rate_bpm', min=25, max=250),
+        Range('step_count', min=0),
+        Range('distance_km', min=0, max=500)
+    ],
+    # Poucos valores distintos; nas metricas o dicionario so aumenta o arquivo
+    dictionary_columns=['workout_type', 'duration']
+)
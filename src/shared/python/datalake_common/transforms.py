@@ -0,0 +1,148 @@
+from datetime import date, timedelta
+
+# Definicao das tabelas do curated independente do engine: o process.py (Spark)
+# e o process_light (pandas/pyarrow) montam as transformacoes a partir daqui,
+# entao as duas saidas tem as mesmas colunas, tipos e ordem
+
+PARTITION_COLS = ['year', 'month', 'day']
+
+# Casas decimais de todas as colunas numericas do curated
+DECIMALS = 2
+
+# Janelas (em dias) das medias moveis das tabelas *Rolling
+ROLLING_WINDOWS = [7, 30]
+
+HEALTH_COLUMNS = [
+    'data',
+    'calorias_consumidas',
+    'calorias_gastas',
+    'calorias_repouso_kcal',
+    'calorias_ativas_kcal',
+    'distancia_km',
+    'velocidade_caminhada_km_hr',
+    'batimentos_max_bpm',
+    'batimentos_min_bpm',
+    'batimentos_media_bpm',
+    'tempo_em_pe_horas'
+]
+
+# Agregacoes: (coluna de saida, funcao, coluna de entrada)
+# funcoes: sum, mean, max, min, count (linhas), count_distinct
+WORKOUT_DAY_AGGREGATES = [
+    ('duracao_min', 'sum', 'duracao'),
+    ('energia_ativa_kcal', 'sum', 'energia_ativa_kcal'),
+    ('intensidade_kcal_hr_kg', 'mean', 'intensidade_kcal_hr_kg'),
+    ('batimento_maximo_bpm', 'mean', 'batimento_maximo_bpm'),
+    ('batimento_medio_bpm', 'mean', 'batimento_medio_bpm'),
+    ('quantidade_de_passos', 'sum', 'quantidade_de_passos'),
+    ('distancia_km', 'sum', 'distancia_km'),
+    ('quantidade_no_dia', 'count', None)
+]
+
+# Totais do dia a partir do curated diario (um export pode ter varias linhas por dia)
+HEALTH_DAY_AGGREGATES = [
+    ('calorias_consumidas', 'sum', 'calorias_consumidas'),
+    ('calorias_gastas', 'sum', 'calorias_gastas'),
+    ('calorias_ativas_kcal', 'sum', 'calorias_ativas_kcal'),
+    ('distancia_km', 'sum', 'distancia_km'),
+    ('batimentos_media_bpm', 'mean', 'batimentos_media_bpm'),
+    ('batimentos_max_bpm', 'max', 'batimentos_max_bpm'),
+    ('batimentos_min_bpm', 'min', 'batimentos_min_bpm')
+]
+
+HEALTH_PERIOD_AGGREGATES = HEALTH_DAY_AGGREGATES + [
+    ('dias_com_dados', 'count_distinct', 'dia')
+]
+
+WORKOUT_PERIOD_AGGREGATES = [
+    ('duracao_min', 'sum', 'duracao_min'),
+    ('energia_ativa_kcal', 'sum', 'energia_ativa_kcal'),
+    ('batimento_medio_bpm', 'mean', 'batimento_medio_bpm'),
+    ('quantidade_de_passos', 'sum', 'quantidade_de_passos'),
+    ('distancia_km', 'sum', 'distancia_km'),
+    ('quantidade', 'sum', 'quantidade_no_dia'),
+    ('dias_com_exercicio', 'count_distinct', 'dia')
+]
+
+# Saude: media dos totais diarios na janela
+HEALTH_ROLLING_METRICS = ['calorias_consumidas', 'calorias_gastas', 'distancia_km', 'batimentos_media_bpm']
+# Exercicios: soma da janela / dias da janela, por tipo de exercicio
+WORKOUT_ROLLING_METRICS = ['energia_ativa_kcal', 'distancia_km', 'quantidade_de_passos', 'duracao_min']
+
+
+def aggregate_types(aggregates, integer_columns=()):
+    return [
+        (output, 'bigint' if function in ('count', 'count_distinct') or output in integer_columns else 'double')
+        for output, function, _ in aggregates
+    ]
+
+
+def rolling_columns(metrics):
+    return [f'{metric}_media_{days}d' for days in ROLLING_WINDOWS for metric in metrics]
+
+
+# Colunas e tipos (nomes do catalogo do glue) de cada tabela do curated, sem as
+# colunas de particao, na ordem em que ficam nos arquivos parquet
+CURATED_TABLES = {
+    'HealthData': [('data', 'timestamp')] + [(column, 'double') for column in HEALTH_COLUMNS[1:]],
+    'Workouts': [('tipo_de_exercicio', 'string')] + aggregate_types(WORKOUT_DAY_AGGREGATES),
+    'HealthWeekly': [('inicio', 'date')] + aggregate_types(HEALTH_PERIOD_AGGREGATES),
+    'HealthMonthly': [('inicio', 'date')] + aggregate_types(HEALTH_PERIOD_AGGREGATES),
+    'HealthRolling': [('dia', 'date')] + [(column, 'double') for column in rolling_columns(HEALTH_ROLLING_METRICS)],
+    'WorkoutsWeekly': [('tipo_de_exercicio', 'string'), ('inicio', 'date')] +
+        aggregate_types(WORKOUT_PERIOD_AGGREGATES, integer_columns=['quantidade']),
+    'WorkoutsMonthly': [('tipo_de_exercicio', 'string'), ('inicio', 'date')] +
+        aggregate_types(WORKOUT_PERIOD_AGGREGATES, integer_columns=['quantidade']),
+    'WorkoutsRolling': [('tipo_de_exercicio', 'string'), ('dia', 'date')] +
+        [(column, 'double') for column in rolling_columns(WORKOUT_ROLLING_METRICS)]
+}
+
+ROLLUP_TABLES = [table for table in CURATED_TABLES if table not in ('HealthData', 'Workouts')]
+
+
+def to_partitions(days):
+    return sorted({(day.year, day.month, day.day) for day in days})
+
+
+def date_range(start_date, end_date):
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    return to_partitions(start + timedelta(days=offset) for offset in range((end - start).days + 1))
+
+
+def partition_keys(partitions):
+    # Chave yyyymmdd de cada particao
+    return [y * 10000 + m * 100 + d for y, m, d in partitions]
+
+
+def rollup_days(partitions):
+    # Dias do curated diario necessarios para recalcular os buckets afetados pelos
+    # dias processados (semana e mes inteiros, janela movel antes e depois) e os
+    # dias de saida das medias moveis
+    days = [date(*partition) for partition in partitions]
+    window = max(ROLLING_WINDOWS)
+
+    weeks = {day - timedelta(days=day.weekday()) for day in days}
+    months = {day.replace(day=1) for day in days}
+    month_days = {month + timedelta(days=offset) for month in months for offset in range(31)}
+
+    return {
+        'weekly': to_partitions(week + timedelta(days=offset) for week in weeks for offset in range(7)),
+        'monthly': to_partitions(day for day in month_days if day.replace(day=1) in months),
+        'rolling': to_partitions(day + timedelta(days=offset) for day in days for offset in range(1 - window, window)),
+        'rolling_output': to_partitions(day + timedelta(days=offset) for day in days for offset in range(window))
+    }
+
+
+def table_partitions(partitions, rollups=True):
+    # Particoes de cada tabela que uma execucao sobre estes dias pode criar (so
+    # as que tinham dados sao gravadas). Nas medias moveis os outros dias da
+    # janela ja tinham dados, entao ja existiam; nos agregados a particao e o
+    # inicio da semana ou do mes
+    days = [date(*partition) for partition in partitions]
+    tables = {'HealthData': partitions, 'Workouts': partitions}
+    if rollups:
+        weeks = to_partitions(day - timedelta(days=day.weekday()) for day in days)
+        months = to_partitions(day.replace(day=1) for day in days)
+        tables.update(HealthWeekly=weeks, WorkoutsWeekly=weeks, HealthMonthly=months, WorkoutsMonthly=months,
+                      HealthRolling=partitions, WorkoutsRolling=partitions)
+    return tables
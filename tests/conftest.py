@@ -0,0 +1,16 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Os codigos das lambdas e do glue job nao sao pacotes python, entao sao
+# adicionados ao path para os testes importarem os modulos diretamente
+for source_dir in ['src/shared/python', 'src/lambda/cleaner', 'src/lambda/compactor', 'src/lambda/process_light',
+                   'src/lambda/firehose_transform', 'src/lambda/invoke_crawler', 'src/lambda/crawler_callback',
+                   'src/lambda/dispatch_batch', 'src/lambda/partition_locks',
+                   'src/glue_job', 'benchmarks']:
+    sys.path.insert(0, os.path.join(ROOT, source_dir))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
@@ -0,0 +1,92 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+from datalake_common import catalog
+from datalake_common.transforms import date_range, table_partitions
+
+DATABASE = 'heath_data'
+CURATED_BUCKET = 'health-datalake-test-curated'
+
+
+@pytest.fixture
+def glue():
+    with mock_aws():
+        client = boto3.client('glue')
+        client.create_database(DatabaseInput={'Name': DATABASE})
+        for table in ('HealthData', 'Workouts', 'HealthWeekly', 'HealthMonthly', 'HealthRolling',
+                      'WorkoutsWeekly', 'WorkoutsMonthly', 'WorkoutsRolling'):
+            client.create_table(DatabaseName=DATABASE, TableInput={
+                'Name': catalog.catalog_table(table),
+                'PartitionKeys': [{'Name': name, 'Type': 'int'} for name in ('year', 'month', 'day')],
+                'StorageDescriptor': {
+                    'Columns': [{'Name': 'data', 'Type': 'timestamp'}],
+                    'Location': f's3://{CURATED_BUCKET}/{table}/',
+                    'InputFormat': 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat',
+                    'OutputFormat': 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat',
+                    'SerdeInfo': {'SerializationLibrary': 'org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe'}
+                }
+            })
+        yield client
+
+
+def partitions(glue, table):
+    pages = glue.get_paginator('get_partitions').paginate(DatabaseName=DATABASE, TableName=table)
+    return {
+        tuple(partition['Values']): partition['StorageDescriptor']['Location']
+        for page in pages for partition in page['Partitions']
+    }
+
+
+def test_rollup_tables_register_the_period_start():
+    tables = table_partitions(date_range('2025-01-30', '2025-02-03'))
+
+    assert tables['HealthData'] == tables['HealthRolling'] == date_range('2025-01-30', '2025-02-03')
+    assert tables['HealthWeekly'] == [(2025, 1, 27), (2025, 2, 3)]
+    assert tables['WorkoutsMonthly'] == [(2025, 1, 1), (2025, 2, 1)]
+    assert set(table_partitions(date_range('2025-01-30', '2025-02-03'), rollups=False)) == {'HealthData', 'Workouts'}
+
+
+def test_partitions_are_registered_once_with_their_location(glue):
+    days = date_range('2025-01-01', '2025-01-03')
+
+    assert catalog.register_partitions(DATABASE, 'HealthData', days, glue) == 3
+    # Reprocessar os mesmos dias nao falha nem duplica
+    assert catalog.register_partitions(DATABASE, 'HealthData', days, glue) == 0
+
+    registered = partitions(glue, 'healthdata')
+    assert registered == {
+        ('2025', '1', day): f's3://{CURATED_BUCKET}/HealthData/year=2025/month=1/day={day}/' for day in ('1', '2', '3')
+    }
+
+
+def test_large_ranges_are_registered_in_batches(glue):
+    days = date_range('2025-01-01', '2025-12-31')
+
+    assert catalog.register_partitions(DATABASE, 'Workouts', days, glue) == 365
+    assert len(partitions(glue, 'workouts')) == 365
+
+
+def test_curated_partitions_cover_every_table(glue):
+    written = table_partitions(date_range('2025-01-06', '2025-01-08'))
+    created = catalog.register_curated_partitions(DATABASE, written, client=glue)
+
+    assert created == {
+        'HealthData': 3, 'Workouts': 3, 'HealthWeekly': 1, 'WorkoutsWeekly': 1,
+        'HealthMonthly': 1, 'WorkoutsMonthly': 1, 'HealthRolling': 3, 'WorkoutsRolling': 3
+    }
+    assert set(partitions(glue, 'healthweekly')) == {('2025', '1', '6')}
+
+
+def test_only_written_partitions_are_registered(glue):
+    created = catalog.register_curated_partitions(
+        DATABASE, {'HealthData': [(2025, 1, 8), (2025, 1, 6)], 'Workouts': []}, client=glue)
+
+    assert created == {'HealthData': 2}
+    assert set(partitions(glue, 'healthdata')) == {('2025', '1', '6'), ('2025', '1', '8')}
+    assert partitions(glue, 'workouts') == {}
+
+
+def test_missing_table_fails(glue):
+    with pytest.raises(glue.exceptions.EntityNotFoundException):
+        catalog.register_partitions(DATABASE, 'Unknown', date_range('2025-01-01', '2025-01-01'), glue)
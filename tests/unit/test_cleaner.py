@@ -0,0 +1,424 @@
+import awswrangler as wr
+import boto3
+import pytest
+from moto import mock_aws
+
+import cleaner
+
+RAW_BUCKET = 'health-datalake-test-raw'
+CLEANED_BUCKET = 'health-datalake-test-cleaned'
+SUPPORT_BUCKET = 'health-datalake-test-support'
+
+HEALTH_CSV = (
+    'Date,Dietary Energy (kJ),Resting Energy (kJ),Active Energy (kJ),'
+    'Heart Rate [Max] (bpm),Heart Rate [Min] (bpm),Walking + Running Distance (km),'
+    'Walking Speed (km/hr),Apple Stand Hour (hours),Step Count (count)\n'
+    '2025-01-30 00:00:00,8000.5,7000.1,1500.2,150,55,6.2,4.8,12,8000\n'
+)
+
+WORKOUT_CSV = (
+    'Workout Type,Start,End,Duration,Active Energy (kcal),Intensity (kcal/hr·kg),'
+    'Max. Heart Rate (bpm),Avg. Heart Rate (bpm),Step Count,Distance (km)\n'
+    'Running,2025-01-30 07:00:00,2025-01-30 07:30:00,00:30:00,300.5,9.1,170,150,4500,5.1\n'
+)
+
+
+def object_created_event(key, etag):
+    return {
+        'detail-type': 'Object Created',
+        'source': 'aws.s3',
+        'detail': {
+            'bucket': {'name': RAW_BUCKET},
+            'object': {'key': key, 'etag': etag}
+        }
+    }
+
+
+# Os testes no s3 rodam com o awswrangler (pacote legado) e so com pyarrow (pacote otimizado)
+@pytest.fixture(params=['wrangler', 'arrow'])
+def s3(request, monkeypatch):
+    monkeypatch.setattr(cleaner, 'IO_BACKEND', request.param)
+    with mock_aws():
+        client = boto3.client('s3')
+        for bucket in (RAW_BUCKET, CLEANED_BUCKET, SUPPORT_BUCKET):
+            client.create_bucket(Bucket=bucket)
+
+        monkeypatch.setattr(cleaner, 'DESTINATION_BUCKET', f's3://{CLEANED_BUCKET}')
+        monkeypatch.setattr(cleaner, 'LEDGER_BUCKET', SUPPORT_BUCKET)
+        yield client
+
+
+def put_raw(s3, key, body):
+    return s3.put_object(Bucket=RAW_BUCKET, Key=key, Body=body.encode('utf-8'))['ETag']
+
+
+def cleaned_keys(s3, prefix):
+    response = s3.list_objects_v2(Bucket=CLEANED_BUCKET, Prefix=prefix)
+    return [item['Key'] for item in response.get('Contents', [])]
+
+
+def test_get_dataset_routes_by_file_name():
+    assert cleaner.get_dataset('HealthAutoExport-2025-01-30-2025-01-30.csv') == 'HealthAutoExport'
+    assert cleaner.get_dataset('data/Workouts-20250130_000000-20250130_235959.csv') == 'Workouts'
+    assert cleaner.get_dataset('errors/processing-failed/file') is None
+
+
+def test_handler_processes_only_the_event_object(s3):
+    etag = put_raw(s3, 'Workouts-20250130_000000-20250130_235959.csv', WORKOUT_CSV)
+    put_raw(s3, 'HealthAutoExport-2025-01-30-2025-01-30.csv', HEALTH_CSV)
+
+    result = cleaner.handler(object_created_event('Workouts-20250130_000000-20250130_235959.csv', etag), None)['results'][0]
+
+    assert result['result'] == 'PROCESSED'
+    assert result['dataset'] == 'Workouts'
+    assert result['rows'] == 1
+    assert cleaned_keys(s3, 'Workouts/year=2025/month=1/day=30/')
+    assert cleaned_keys(s3, 'HealthAutoExport/') == []
+
+
+def test_handler_skips_objects_already_in_ledger(s3):
+    key = 'HealthAutoExport-2025-01-30-2025-01-30.csv'
+    etag = put_raw(s3, key, HEALTH_CSV)
+
+    first = cleaner.handler(object_created_event(key, etag.strip('"')), None)['results'][0]
+    second = cleaner.handler(object_created_event(key, etag.strip('"')), None)['results'][0]
+
+    assert first['result'] == 'PROCESSED'
+    assert second['result'] == 'SKIPPED'
+    assert 'start_date' not in cleaner.handler(object_created_event(key, etag.strip('"')), None)
+    assert len(cleaned_keys(s3, 'HealthAutoExport/')) == 1
+
+
+def test_handler_reprocesses_object_with_new_etag(s3):
+    key = 'HealthAutoExport-2025-01-30-2025-01-30.csv'
+    first_etag = put_raw(s3, key, HEALTH_CSV)
+    cleaner.handler(object_created_event(key, first_etag), None)
+
+    second_etag = put_raw(s3, key, HEALTH_CSV.replace('8000.5', '8100.5'))
+    result = cleaner.handler(object_created_event(key, second_etag), None)['results'][0]
+
+    assert result['result'] == 'PROCESSED'
+
+
+def test_handler_ignores_unknown_objects(s3):
+    result = cleaner.handler(object_created_event('errors/some-failure', 'abc'), None)['results'][0]
+
+    assert result['result'] == 'IGNORED'
+
+
+def test_streaming_reads_in_chunks_with_the_whole_file_result(s3, monkeypatch):
+    rows = ''.join(
+        f'2025-01-{day:02d} 00:00:00,8000.5,7000.1,1500.2,150,55,6.2,4.8,12,8000\n' for day in range(1, 29)
+    )
+    put_raw(s3, 'HealthAutoExport-2025-01-01-2025-01-28.csv', HEALTH_CSV.splitlines(True)[0] + rows)
+    source_path = f's3://{RAW_BUCKET}/HealthAutoExport-2025-01-01-2025-01-28.csv'
+
+    chunks = list(cleaner.read_csv_stream(source_path, cleaner.HEALTH_AUTO_EXPORT, chunk_rows=10, block_bytes=256))
+    whole = next(cleaner.read_csv_whole(source_path, cleaner.HEALTH_AUTO_EXPORT))
+
+    assert len(chunks) > 1
+    assert list(chunks[0].columns) == cleaner.HEALTH_AUTO_EXPORT.source_columns
+    assert sum(len(chunk) for chunk in chunks) == len(whole) == 28
+
+    monkeypatch.setattr(cleaner, 'STREAMING_CHUNK_ROWS', 10)
+    monkeypatch.setattr(cleaner, 'STREAMING_BLOCK_BYTES', 256)
+    assert cleaner.process_health_data(source_path, f's3://{CLEANED_BUCKET}', streaming=True)['rows'] == 28
+    assert len(cleaned_keys(s3, 'HealthAutoExport/year=2025/month=1/')) > 1
+
+
+def test_use_streaming_in_auto_mode_depends_on_object_size(monkeypatch):
+    monkeypatch.setattr(cleaner, 'READ_MODE', 'auto')
+    monkeypatch.setattr(cleaner, 'STREAMING_THRESHOLD_BYTES', 1024)
+
+    assert cleaner.use_streaming(4096)
+    assert not cleaner.use_streaming(512)
+
+
+def test_handler_processes_many_objects_with_per_file_isolation(s3):
+    put_raw(s3, 'HealthAutoExport-2025-01-30-2025-01-30.csv', HEALTH_CSV)
+    put_raw(s3, 'Workouts-20250130_000000-20250130_235959.csv', WORKOUT_CSV)
+    put_raw(s3, 'Workouts-broken.csv', 'Workout Type,Start\nRunning,2025-01-30\n')
+
+    response = cleaner.handler({'objects': [
+        {'bucket': RAW_BUCKET, 'key': 'HealthAutoExport-2025-01-30-2025-01-30.csv'},
+        {'bucket': RAW_BUCKET, 'key': 'Workouts-20250130_000000-20250130_235959.csv'},
+        {'bucket': RAW_BUCKET, 'key': 'Workouts-broken.csv'},
+        {'bucket': RAW_BUCKET, 'key': 'data/unknown.json'}
+    ]}, None)
+
+    results = {result['key']: result['result'] for result in response['results']}
+
+    assert response['Status'] == 'PARTIAL'
+    assert (response['start_date'], response['end_date']) == ('2025-01-30', '2025-01-30')
+    assert results == {
+        'HealthAutoExport-2025-01-30-2025-01-30.csv': 'PROCESSED',
+        'Workouts-20250130_000000-20250130_235959.csv': 'PROCESSED',
+        'Workouts-broken.csv': 'ERROR',
+        'data/unknown.json': 'IGNORED'
+    }
+
+
+def test_handler_fails_when_every_object_fails(s3):
+    with pytest.raises(Exception):
+        cleaner.handler({'objects': [{'bucket': RAW_BUCKET, 'key': 'Workouts-missing.csv'}]}, None)
+
+
+def test_map_batch_with_only_failures_returns_results_for_the_summary(s3):
+    # Um lote do Map so com arquivos ruins nao falha o Map inteiro
+    batch = cleaner.handler({'objects': [{'bucket': RAW_BUCKET, 'key': 'Workouts-missing.csv'}], 'batch': True}, None)
+
+    assert batch['Status'] == 'PARTIAL'
+    assert [result['result'] for result in batch['results']] == ['ERROR']
+
+    # O resumo decide: com outro lote processado a execucao segue
+    processed = {'key': 'HealthAutoExport-a.csv', 'result': 'PROCESSED', 'partitions': ['2025-01-30']}
+    assert cleaner.handler({'results': batch['results'] + [processed]}, None)['start_date'] == '2025-01-30'
+    with pytest.raises(Exception):
+        cleaner.handler({'results': batch['results']}, None)
+
+
+def test_handler_summarizes_results_of_map_batches():
+    # Saida combinada dos lotes do Map: so o resumo, nenhum arquivo e lido
+    response = cleaner.handler({'results': [
+        {'key': 'HealthAutoExport-a.csv', 'result': 'PROCESSED', 'partitions': ['2025-01-30', '2025-01-31']},
+        {'key': 'Workouts-a.csv', 'result': 'SKIPPED'},
+        {'key': 'Workouts-b.csv', 'result': 'PROCESSED', 'partitions': ['2025-01-28']},
+        {'key': 'Workouts-c.csv', 'result': 'ERROR', 'error': 'boom'}
+    ]}, None)
+
+    assert response['Status'] == 'PARTIAL'
+    assert (response['start_date'], response['end_date']) == ('2025-01-28', '2025-01-31')
+    assert len(response['results']) == 4
+
+
+def test_upsert_replaces_partition_without_duplicates(s3):
+    second_workout = 'Cycling,2025-01-30 18:00:00,2025-01-30 19:00:00,01:00:00,500.0,7.0,160,130,0,20.0\n'
+    put_raw(s3, 'Workouts-a.csv', WORKOUT_CSV)
+    put_raw(s3, 'Workouts-b.csv', WORKOUT_CSV + second_workout)
+
+    first = cleaner.process_workout_data(f's3://{RAW_BUCKET}/Workouts-a.csv', f's3://{CLEANED_BUCKET}')
+    second = cleaner.process_workout_data(f's3://{RAW_BUCKET}/Workouts-b.csv', f's3://{CLEANED_BUCKET}')
+
+    df = wr.s3.read_parquet(f's3://{CLEANED_BUCKET}/Workouts/', dataset=True)
+
+    assert first['partitions'] == second['partitions'] == ['2025-01-30']
+    assert sorted(df['workout_type']) == ['Cycling', 'Running']
+    assert len(cleaned_keys(s3, 'Workouts/year=2025/month=1/day=30/')) == 1
+
+
+def test_upsert_skips_write_when_content_is_unchanged(s3):
+    put_raw(s3, 'HealthAutoExport-a.csv', HEALTH_CSV)
+    put_raw(s3, 'HealthAutoExport-b.csv', HEALTH_CSV)
+
+    cleaner.process_health_data(f's3://{RAW_BUCKET}/HealthAutoExport-a.csv', f's3://{CLEANED_BUCKET}')
+    written_key = cleaned_keys(s3, 'HealthAutoExport/')
+    stats = cleaner.process_health_data(f's3://{RAW_BUCKET}/HealthAutoExport-b.csv', f's3://{CLEANED_BUCKET}')
+
+    assert stats['partitions'] == []
+    assert stats['unchanged_partitions'] == ['2025-01-30']
+    assert cleaned_keys(s3, 'HealthAutoExport/') == written_key
+
+
+def test_firehose_parquet_objects_are_routed_by_prefix(s3):
+    import io
+
+    import pandas as pd
+
+    key = 'data/HealthAutoExport/year=2025/month=1/day=30/ingestion-data-stream-1-2025-01-30-00-00-00-abc.parquet'
+    records = pd.DataFrame({
+        'date': pd.to_datetime(['2025-01-30 08:00:00', '2025-01-30 09:00:00']),
+        **{column: [1.0, 2.0] for column in cleaner.HEALTH_AUTO_EXPORT.normalized_columns[1:]},
+        'heart_rate_max_bpm': [150.0, 160.0],
+        'heart_rate_min_bpm': [55.0, 60.0]
+    })
+    body = io.BytesIO()
+    records.to_parquet(body, index=False)
+    s3.put_object(Bucket=RAW_BUCKET, Key=key, Body=body.getvalue())
+
+    assert cleaner.get_dataset(key) == 'HealthAutoExport'
+
+    result = cleaner.handler({'bucket': RAW_BUCKET, 'key': key}, None)['results'][0]
+
+    assert result['result'] == 'PROCESSED'
+    assert result['rows'] == 2
+    assert result['partitions'] == ['2025-01-30']
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+def test_firehose_json_lines_objects_are_routed_by_prefix(s3, compression):
+    import gzip
+    import json
+
+    # Sem conversao para parquet: json por linha, sem extensao (.gz com GZIP).
+    # Linhas normalizadas pela lambda de transformacao e linhas com o cabecalho do export
+    schema = cleaner.HEALTH_AUTO_EXPORT
+    transformed = {column: 1.0 for column in schema.normalized_columns[1:]}
+    raw = {column: 2.0 for column in schema.source_columns[1:]}
+    lines = [
+        json.dumps({**transformed, 'heart_rate_max_bpm': 150, 'heart_rate_min_bpm': 55, 'date': '2025-01-30 08:00:00'}),
+        json.dumps({**raw, 'Heart Rate [Max] (bpm)': 160, 'Heart Rate [Min] (bpm)': 60, 'Date': '2025-01-31 09:00:00'}),
+        json.dumps({'date': '2025-01-31 10:00:00', 'apple_stand_hour_hours': 10})
+    ]
+    body = ''.join(f'{line}\n' for line in lines).encode('utf-8')
+    key = 'data/HealthAutoExport/year=2025/month=1/day=30/ingestion-data-stream-1-2025-01-30-00-00-00-abc'
+    if compression:
+        key, body = f'{key}.gz', gzip.compress(body)
+    s3.put_object(Bucket=RAW_BUCKET, Key=key, Body=body)
+
+    result = cleaner.handler({'bucket': RAW_BUCKET, 'key': key}, None)['results'][0]
+
+    assert result['result'] == 'PROCESSED'
+    assert result['rows'] == 3
+    assert result['partitions'] == ['2025-01-30', '2025-01-31']
+
+    df = wr.s3.read_parquet(f's3://{CLEANED_BUCKET}/HealthAutoExport/year=2025/month=1/day=31/')
+    assert sorted(df['apple_stand_hour_hours'].tolist()) == [2.0, 10.0]
+    assert df['heart_rate_max_bpm'].max() == 160.0 and df['heart_rate_max_bpm'].isna().sum() == 1
+
+
+def test_import_defers_awswrangler_until_first_use():
+    import os
+    import subprocess
+    import sys
+
+    code = 'import sys, cleaner; print("awswrangler" in sys.modules)'
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path), CLEANER_IO='arrow')
+    output = subprocess.run([sys.executable, '-c', code], env=env, check=True, capture_output=True, text=True)
+
+    assert output.stdout.strip() == 'False'
+
+
+@pytest.fixture
+def lock_table(s3, monkeypatch):
+    from datalake_common.locks import DynamoDBLockStore, PartitionLocks
+
+    table_name = 'health-datalake-test-partition-locks'
+    client = boto3.client('dynamodb')
+    client.create_table(
+        TableName=table_name,
+        KeySchema=[{'AttributeName': 'lock_key', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'lock_key', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    monkeypatch.setattr(cleaner, 'LOCK_TABLE', table_name)
+    monkeypatch.setattr(cleaner, 'LOCK_WAIT_SECONDS', 0)
+    monkeypatch.setattr(cleaner, '_partition_store', None)
+    return PartitionLocks(DynamoDBLockStore(table_name, client=client))
+
+
+def test_upsert_claims_and_releases_the_partition(s3, lock_table):
+    put_raw(s3, 'Workouts-a.csv', WORKOUT_CSV)
+
+    result = cleaner.handler({'bucket': RAW_BUCKET, 'key': 'Workouts-a.csv'}, None)['results'][0]
+
+    assert result['partitions'] == ['2025-01-30']
+    # Reserva liberada depois da escrita
+    assert lock_table.claim(['Workouts#2025-01-30'], 'other')['waiting'] == []
+
+
+def test_partition_busy_beyond_the_wait_fails_the_invocation_for_retry(s3, lock_table):
+    from datalake_common.locks import PartitionBusy
+
+    put_raw(s3, 'Workouts-a.csv', WORKOUT_CSV)
+    put_raw(s3, 'HealthAutoExport-a.csv', HEALTH_CSV)
+    lock_table.claim(['Workouts#2025-01-30'], 'other-execution')
+    event = {'objects': [
+        {'bucket': RAW_BUCKET, 'key': 'Workouts-a.csv'}, {'bucket': RAW_BUCKET, 'key': 'HealthAutoExport-a.csv'}
+    ]}
+
+    # Nao vira um PARTIAL com o arquivo perdido: a invocacao falha para o retry
+    with pytest.raises(PartitionBusy, match='Workouts-a.csv'):
+        cleaner.handler(event, None)
+
+    assert cleaned_keys(s3, 'Workouts/') == []
+
+    # No retry o arquivo que ja foi gravado (e esta no ledger) e pulado
+    lock_table.release(['Workouts#2025-01-30'], 'other-execution')
+    results = {result['key']: result['result'] for result in cleaner.handler(event, None)['results']}
+    assert results == {'Workouts-a.csv': 'PROCESSED', 'HealthAutoExport-a.csv': 'SKIPPED'}
+
+
+def test_rows_failing_quality_rules_go_to_quarantine(s3):
+    put_raw(s3, 'Workouts-a.csv', WORKOUT_CSV +
+            'Cycling,2025-01-30 18:00:00,2025-01-30 19:00:00,1 hora,500.0,7.0,160,130,0,20.0\n'
+            'Walking,2025-01-31 08:00:00,2025-01-31 09:00:00,01:00:00,-50.0,7.0,400,130,0,3.0\n')
+
+    result = cleaner.handler({'bucket': RAW_BUCKET, 'key': 'Workouts-a.csv'}, None)['results'][0]
+
+    assert result['rows'] == 1
+    assert result['partitions'] == ['2025-01-30']
+    assert result['quarantined_rows'] == 2
+    assert result['quality'] == {
+        'type:duration': 1, 'range:active_energy_kcal': 1, 'range:max_heart_rate_bpm': 1
+    }
+
+    quarantine = wr.s3.read_parquet(f's3://{CLEANED_BUCKET}/quarantine/Workouts/Workouts-a.csv.parquet')
+    reasons = dict(zip(quarantine['workout_type'], quarantine['dq_reasons']))
+    assert reasons == {
+        'Cycling': 'type:duration',
+        'Walking': 'range:active_energy_kcal;range:max_heart_rate_bpm'
+    }
+    assert set(quarantine['source']) == {f's3://{RAW_BUCKET}/Workouts-a.csv'}
+
+    # O dia com todas as linhas na quarentena nao e gravado no cleaned
+    df = wr.s3.read_parquet(f's3://{CLEANED_BUCKET}/Workouts/', dataset=True)
+    assert list(df['workout_type']) == ['Running']
+    assert len(cleaned_keys(s3, 'Workouts/year=2025/month=1/day=30/')) == 1
+
+
+def read_cleaned_file(s3, prefix):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    [key] = cleaned_keys(s3, prefix)
+    body = s3.get_object(Bucket=CLEANED_BUCKET, Key=key)['Body'].read()
+    return pq.ParquetFile(pa.BufferReader(body))
+
+
+@pytest.mark.parametrize('write_mode', ['upsert', 'append'])
+def test_tuned_layout_writes_sorted_zstd_row_groups(s3, monkeypatch, write_mode):
+    monkeypatch.setattr(cleaner, 'WRITE_MODE', write_mode)
+    monkeypatch.setattr(cleaner, 'PARQUET_ROW_GROUP_ROWS', 2)
+    rows = [
+        'Yoga,2025-01-30 20:00:00,2025-01-30 20:30:00,00:30:00,90.0,3.0,110,90,50,0.0\n',
+        'Walking,2025-01-30 12:00:00,2025-01-30 13:00:00,01:00:00,250.0,4.0,120,100,6000,5.0\n',
+        'Cycling,2025-01-30 18:00:00,2025-01-30 19:00:00,01:00:00,500.0,7.0,160,130,0,20.0\n',
+        'Swimming,2025-01-30 06:00:00,2025-01-30 06:45:00,00:45:00,400.0,8.0,150,120,0,1.5\n'
+    ]
+    put_raw(s3, 'Workouts-a.csv', WORKOUT_CSV + ''.join(rows))
+
+    cleaner.process_workout_data(f's3://{RAW_BUCKET}/Workouts-a.csv', f's3://{CLEANED_BUCKET}')
+
+    parquet_file = read_cleaned_file(s3, 'Workouts/year=2025/month=1/day=30/')
+    metadata = parquet_file.metadata
+    start = parquet_file.schema_arrow.get_field_index('start')
+    workout_type = parquet_file.schema_arrow.get_field_index('workout_type')
+    step_count = parquet_file.schema_arrow.get_field_index('step_count')
+
+    # Linhas em ordem de inicio, cada row group com um intervalo proprio de datas
+    assert metadata.num_row_groups == 3
+    ranges = [
+        (metadata.row_group(index).column(start).statistics.min, metadata.row_group(index).column(start).statistics.max)
+        for index in range(metadata.num_row_groups)
+    ]
+    assert all(previous[1] < current[0] for previous, current in zip(ranges, ranges[1:]))
+    assert parquet_file.read().column('start').to_pylist() == sorted(parquet_file.read().column('start').to_pylist())
+
+    # PLAIN_DICTIONARY no formato 1.0 do awswrangler, RLE_DICTIONARY no 2.x
+    def dictionary_encoded(column):
+        return any(encoding.endswith('_DICTIONARY') for encoding in metadata.row_group(0).column(column).encodings)
+
+    assert metadata.row_group(0).column(start).compression == 'ZSTD'
+    assert dictionary_encoded(workout_type)
+    assert not dictionary_encoded(step_count)
+
+
+def test_legacy_layout_keeps_snappy_files(s3, monkeypatch):
+    monkeypatch.setattr(cleaner, 'PARQUET_LAYOUT', 'legacy')
+    put_raw(s3, 'HealthAutoExport-a.csv', HEALTH_CSV)
+
+    cleaner.process_health_data(f's3://{RAW_BUCKET}/HealthAutoExport-a.csv', f's3://{CLEANED_BUCKET}')
+
+    metadata = read_cleaned_file(s3, 'HealthAutoExport/year=2025/month=1/day=30/').metadata
+    assert metadata.num_row_groups == 1
+    assert metadata.row_group(0).column(0).compression == 'SNAPPY'
@@ -0,0 +1,234 @@
+import io
+from datetime import datetime, timedelta
+
+import boto3
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from moto import mock_aws
+
+import compactor
+
+BUCKET = 'health-datalake-test-curated'
+
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        client = boto3.client('s3')
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def put_parquet(s3, key, rows):
+    buffer = io.BytesIO()
+    pq.write_table(pa.table({'tipo_de_exercicio': ['Running'] * rows, 'distancia_km': [5.0] * rows}), buffer)
+    s3.put_object(Bucket=BUCKET, Key=key, Body=buffer.getvalue())
+
+
+def keys(s3, prefix):
+    return [item['Key'] for item in s3.list_objects_v2(Bucket=BUCKET, Prefix=prefix).get('Contents', [])]
+
+
+def test_compacts_small_files_of_the_given_partition(s3):
+    for index in range(5):
+        put_parquet(s3, f'Workouts/year=2025/month=1/day=30/part-{index}.snappy.parquet', 10)
+    put_parquet(s3, 'Workouts/year=2025/month=1/day=31/part-0.snappy.parquet', 10)
+    put_parquet(s3, 'Workouts/year=2025/month=1/day=31/part-1.snappy.parquet', 10)
+
+    summary = compactor.handler({
+        'targets': [{'bucket': BUCKET, 'prefix': 'Workouts/'}],
+        'partitions': ['2025-01-30']
+    }, None)
+
+    partition_keys = keys(s3, 'Workouts/year=2025/month=1/day=30/')
+    table = pq.read_table(pa.BufferReader(s3.get_object(Bucket=BUCKET, Key=partition_keys[0])['Body'].read()))
+
+    assert summary['partitions_compacted'] == 1
+    assert summary['files_before'] == 5
+    assert summary['files_after'] == 1
+    assert len(partition_keys) == 1
+    assert table.num_rows == 50
+    # Particao fora do filtro nao e tocada
+    assert len(keys(s3, 'Workouts/year=2025/month=1/day=31/')) == 2
+
+
+def test_scheduled_run_scans_all_partitions_and_splits_by_target_size(s3, monkeypatch):
+    for index in range(4):
+        put_parquet(s3, f'HealthData/year=2025/month=1/day=30/part-{index}.snappy.parquet', 1000)
+
+    monkeypatch.setattr(compactor, 'TARGET_FILE_BYTES', 2 * s3.head_object(
+        Bucket=BUCKET, Key='HealthData/year=2025/month=1/day=30/part-0.snappy.parquet')['ContentLength'])
+    monkeypatch.setattr(compactor, 'TARGETS', f'{BUCKET}:HealthData/')
+
+    summary = compactor.handler({}, None)
+
+    assert summary['files_before'] == 4
+    assert summary['files_after'] == 2
+    assert summary['partitions'][0]['rows'] == 4000
+
+
+def test_dates_come_from_cleaner_results():
+    event = {'results': [{'partitions': ['2025-01-30']}, {'partitions': ['2025-01-29', '2025-01-30']}, {}]}
+
+    assert compactor.get_dates(event) == ['2025-01-29', '2025-01-30']
+
+
+@pytest.fixture
+def locks(monkeypatch):
+    from datalake_common.locks import MemoryLockStore, PartitionLocks
+
+    store = MemoryLockStore()
+    monkeypatch.setattr(compactor, 'LOCK_TABLE', 'health-datalake-test-partition-locks')
+    monkeypatch.setattr(compactor, 'LOCK_WAIT_SECONDS', 0)
+    monkeypatch.setattr(compactor, 'CURATED_BUCKET', BUCKET)
+    monkeypatch.setattr(compactor, 'lock_store', lambda table_name: store)
+    return PartitionLocks(store)
+
+
+def put_cleaned_workouts(s3, key, start, rows, **options):
+    buffer = io.BytesIO()
+    pq.write_table(pa.table({
+        'workout_type': ['Running'] * rows,
+        'start': [start - timedelta(minutes=index) for index in range(rows)],
+        'distance': [5.0] * rows
+    }), buffer, **options)
+    s3.put_object(Bucket=BUCKET, Key=key, Body=buffer.getvalue())
+
+
+def read_partition(s3, prefix):
+    return pa.concat_tables([
+        pq.read_table(pa.BufferReader(s3.get_object(Bucket=BUCKET, Key=key)['Body'].read()))
+        for key in keys(s3, prefix)
+    ])
+
+
+def test_compaction_keeps_the_cleaned_layout_and_mixed_timestamp_files(s3):
+    prefix = 'Workouts/year=2025/month=1/day=30/'
+    # Arquivo antigo do awswrangler (INT96, snappy) e arquivos novos do cleaner (INT64 ms, zstd)
+    put_cleaned_workouts(s3, f'{prefix}legacy.snappy.parquet', datetime(2025, 1, 30, 12), 3,
+                         use_deprecated_int96_timestamps=True, compression='snappy')
+    for index in range(2):
+        put_cleaned_workouts(s3, f'{prefix}part-{index}.zstd.parquet', datetime(2025, 1, 30, 8 + index), 10,
+                             coerce_timestamps='ms', compression='zstd', use_dictionary=['workout_type'])
+
+    summary = compactor.handler({'targets': [{'bucket': BUCKET, 'prefix': 'Workouts/'}]}, None)
+
+    assert summary['files_after'] == 1
+    key = keys(s3, prefix)[0]
+    parquet = pq.ParquetFile(pa.BufferReader(s3.get_object(Bucket=BUCKET, Key=key)['Body'].read()))
+    columns = {column.path_in_schema: column for column in
+               (parquet.metadata.row_group(0).column(index) for index in range(3))}
+    table = parquet.read()
+
+    assert table.num_rows == 23
+    assert columns['start'].compression == 'ZSTD'
+    assert columns['start'].physical_type == 'INT64' and columns['start'].statistics.has_min_max
+    assert any(encoding.endswith('DICTIONARY') for encoding in columns['workout_type'].encodings)
+    assert not any(encoding.endswith('DICTIONARY') for encoding in columns['distance'].encodings)
+    # Linhas em ordem de data, como o cleaner grava
+    starts = table.column('start').to_pylist()
+    assert starts == sorted(starts)
+
+
+def test_files_with_different_schemas_are_compacted_without_promote_options(s3, monkeypatch):
+    # concat_tables da camada do awswrangler (pyarrow < 10.1), sem promote_options
+    concat_tables = pa.concat_tables
+    monkeypatch.setattr(pa, 'concat_tables', lambda tables: concat_tables(tables))
+
+    prefix = 'Workouts/year=2025/month=1/day=30/'
+    old = pa.table({'tipo_de_exercicio': ['Running'] * 2, 'duracao': pa.array([30, 40], pa.int32())})
+    new = pa.table({'tipo_de_exercicio': ['Cycling'], 'duracao': pa.array([50], pa.int64()),
+                    'distancia_km': [12.5]})
+    for index, table in enumerate((old, new)):
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer, compression='none')
+        s3.put_object(Bucket=BUCKET, Key=f'{prefix}part-{index}.parquet', Body=buffer.getvalue())
+
+    summary = compactor.handler({'targets': [{'bucket': BUCKET, 'prefix': 'Workouts/'}]}, None)
+
+    assert summary['files_after'] == 1
+    parquet = pq.ParquetFile(pa.BufferReader(s3.get_object(Bucket=BUCKET, Key=keys(s3, prefix)[0])['Body'].read()))
+    table = parquet.read()
+    assert parquet.metadata.row_group(0).column(0).compression == 'UNCOMPRESSED'
+    assert table.schema.field('duracao').type == pa.int64()
+    assert table.column('distancia_km').to_pylist() == [None, None, 12.5]
+
+
+def test_interrupted_swap_is_finished_by_the_next_run(s3, monkeypatch):
+    prefix = 'Workouts/year=2025/month=1/day=30/'
+    for index in range(3):
+        put_parquet(s3, f'{prefix}part-{index}.snappy.parquet', 10)
+
+    # Falha depois de gravar os arquivos novos, antes de apagar os antigos
+    delete_keys = compactor.delete_keys
+    monkeypatch.setattr(compactor, 'delete_keys', lambda *args: (_ for _ in ()).throw(RuntimeError('throttled')))
+    with pytest.raises(RuntimeError):
+        compactor.handler({'targets': [{'bucket': BUCKET, 'prefix': 'Workouts/'}]}, None)
+    assert len(keys(s3, prefix)) == 4
+    assert keys(s3, '_compaction/') == ['_compaction/Workouts/year=2025/month=1/day=30.json']
+
+    monkeypatch.setattr(compactor, 'delete_keys', delete_keys)
+    compactor.handler({'targets': [{'bucket': BUCKET, 'prefix': 'Workouts/'}], 'partitions': ['2025-01-31']}, None)
+
+    assert len(keys(s3, prefix)) == 1 and keys(s3, prefix)[0].split('/')[-1].startswith('compacted-')
+    assert read_partition(s3, prefix).num_rows == 30
+    assert keys(s3, '_compaction/') == []
+
+
+def test_interrupted_write_is_rolled_back_and_compacted_again(s3, monkeypatch):
+    prefix = 'HealthData/year=2025/month=1/day=30/'
+    for index in range(4):
+        put_parquet(s3, f'{prefix}part-{index}.snappy.parquet', 1000)
+    monkeypatch.setattr(compactor, 'TARGET_FILE_BYTES', 2 * s3.head_object(
+        Bucket=BUCKET, Key=f'{prefix}part-0.snappy.parquet')['ContentLength'])
+
+    # Falha no segundo arquivo novo: fica um arquivo compactado parcial
+    write_table = compactor.write_table
+    writes = []
+
+    def failing_write(*args):
+        writes.append(args[2])
+        if len(writes) == 2:
+            raise RuntimeError('timeout')
+        return write_table(*args)
+
+    monkeypatch.setattr(compactor, 'write_table', failing_write)
+    with pytest.raises(RuntimeError):
+        compactor.handler({'targets': [{'bucket': BUCKET, 'prefix': 'HealthData/'}]}, None)
+    assert len(keys(s3, prefix)) == 5
+
+    monkeypatch.setattr(compactor, 'write_table', write_table)
+    summary = compactor.handler({'targets': [{'bucket': BUCKET, 'prefix': 'HealthData/'}]}, None)
+
+    assert summary['files_before'] == 4 and summary['files_after'] == 2
+    assert read_partition(s3, prefix).num_rows == 4000
+
+
+def test_partitions_claimed_by_a_writer_are_skipped(s3, locks):
+    for dataset in ('Workouts', 'HealthData'):
+        for index in range(2):
+            put_parquet(s3, f'{dataset}/year=2025/month=1/day=30/part-{index}.snappy.parquet', 10)
+    targets = [{'bucket': BUCKET, 'prefix': 'Workouts/'}, {'bucket': BUCKET, 'prefix': 'HealthData/'}]
+    # Bucket configurado como curated: reserva por mes do process
+    locks.claim(['curated#2025-01'], 'process-execution')
+
+    summary = compactor.handler({'targets': targets}, None)
+
+    assert summary['partitions_compacted'] == 0
+    assert summary['skipped_partitions'] == [
+        'Workouts/year=2025/month=1/day=30/', 'HealthData/year=2025/month=1/day=30/'
+    ]
+
+    # Dentro da execucao que tem as reservas (owner no evento) a particao e compactada
+    summary = compactor.handler({'targets': targets, 'owner': 'process-execution'}, None)
+    assert summary['partitions_compacted'] == 2
+    assert locks.claim(['curated#2025-01'], 'other')['waiting'] == ['curated#2025-01']
+
+
+def test_cleaned_partitions_use_the_cleaner_keys(monkeypatch):
+    monkeypatch.setattr(compactor, 'CURATED_BUCKET', 'curated')
+
+    assert compactor.lock_keys('cleaned', 'Workouts/', 'Workouts/year=2025/month=1/day=30/') == ['Workouts#2025-01-30']
+    assert compactor.lock_keys('curated', 'HealthData/', 'HealthData/year=2025/month=3/day=15/') == \
+        ['curated#2025-02', 'curated#2025-03', 'curated#2025-04']
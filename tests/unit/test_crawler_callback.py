@@ -0,0 +1,115 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+import crawler_callback
+import invoke_crawler
+
+SUPPORT_BUCKET = 'health-datalake-test-support'
+CRAWLER_NAME = 'health-datalake-test-curated-crawler'
+
+
+class StepFunctionsRecorder:
+
+    # Guarda os callbacks enviados para as execucoes em espera
+    def __init__(self):
+        self.client = boto3.client('stepfunctions')
+        self.exceptions = self.client.exceptions
+        self.calls = []
+
+    def send_task_success(self, taskToken, output):
+        self.calls.append(('success', taskToken))
+
+    def send_task_failure(self, taskToken, error, cause):
+        self.calls.append(('failure', taskToken))
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    monkeypatch.setenv('CRAWLER_NAME', CRAWLER_NAME)
+    monkeypatch.setenv('CALLBACK_BUCKET_NAME', SUPPORT_BUCKET)
+    monkeypatch.setattr(crawler_callback, 'CALLBACK_BUCKET', SUPPORT_BUCKET)
+
+    with mock_aws():
+        boto3.client('s3').create_bucket(Bucket=SUPPORT_BUCKET)
+        boto3.client('glue').create_crawler(Name=CRAWLER_NAME, Role='arn:aws:iam::123456789012:role/glue',
+                                            Targets={'S3Targets': [{'Path': 's3://curated/HealthData/'}]})
+
+        recorder = StepFunctionsRecorder()
+        create_client = boto3.client
+
+        def client(name, *args, **kwargs):
+            return recorder if name == 'stepfunctions' else create_client(name, *args, **kwargs)
+
+        monkeypatch.setattr(crawler_callback.boto3, 'client', client)
+        yield recorder
+
+
+def crawler_event(state):
+    return {
+        'source': 'aws.glue',
+        'detail-type': 'Glue Crawler State Change',
+        'detail': {'crawlerName': CRAWLER_NAME, 'state': state, 'errorMessage': 'Internal error'}
+    }
+
+
+def end_crawl():
+    boto3.client('glue').stop_crawler(Name=CRAWLER_NAME)
+
+
+def test_crawl_end_resumes_every_waiting_execution(aws):
+    invoke_crawler.handler({'task_token': 'token-1', 'execution': 'execution-1'}, None)
+    assert boto3.client('glue').get_crawler(Name=CRAWLER_NAME)['Crawler']['State'] == 'RUNNING'
+    # Segunda execucao com o crawler rodando: o crawl atual pode ter comecado
+    # antes das particoes dela, espera o proximo
+    invoke_crawler.handler({'task_token': 'token-2', 'execution': 'execution-2'}, None)
+
+    end_crawl()
+    result = crawler_callback.handler(crawler_event('Succeeded'), None)
+
+    assert result == {'Status': 'Succeeded', 'resumed': 1, 'queued': 1}
+    assert aws.calls == [('success', 'token-1')]
+    assert boto3.client('glue').get_crawler(Name=CRAWLER_NAME)['Crawler']['State'] == 'RUNNING'
+
+    end_crawl()
+    result = crawler_callback.handler(crawler_event('Succeeded'), None)
+    assert result == {'Status': 'Succeeded', 'resumed': 1, 'queued': 0}
+    assert aws.calls == [('success', 'token-1'), ('success', 'token-2')]
+    # Tokens consumidos: o proximo evento nao retoma as mesmas execucoes
+    assert crawler_callback.handler(crawler_event('Succeeded'), None)['resumed'] == 0
+
+
+def test_crawl_started_by_another_execution_queues_the_token(aws, monkeypatch):
+    glue = boto3.client('glue')
+    glue.start_crawler(Name=CRAWLER_NAME)
+
+    class StaleGlue:
+        # get_crawler lido antes de outra execucao iniciar o crawler
+        exceptions = glue.exceptions
+
+        def get_crawler(self, Name):
+            return {'Crawler': {'State': 'READY'}}
+
+        def start_crawler(self, Name):
+            return glue.start_crawler(Name=Name)
+
+    create_client = boto3.client
+
+    def client(name, *args, **kwargs):
+        return StaleGlue() if name == 'glue' else create_client(name, *args, **kwargs)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(invoke_crawler.boto3, 'client', client)
+        invoke_crawler.handler({'task_token': 'token-1', 'execution': 'execution-1'}, None)
+
+    end_crawl()
+    assert crawler_callback.handler(crawler_event('Succeeded'), None)['queued'] == 1
+    assert aws.calls == []
+
+
+def test_failed_crawl_fails_the_waiting_task(aws):
+    invoke_crawler.handler({'task_token': 'token-1', 'execution': 'execution-1'}, None)
+
+    crawler_callback.handler(crawler_event('Failed'), None)
+
+    assert aws.calls == [('failure', 'token-1')]
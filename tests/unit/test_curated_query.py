@@ -0,0 +1,140 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+import cleaner
+import generate_data
+import process_light
+from datalake_common.curated_query import CuratedQuery
+from datalake_common.partition_index import load_index
+
+CLEANED_BUCKET = 'health-datalake-test-cleaned'
+CURATED_BUCKET = 'health-datalake-test-curated'
+
+
+@pytest.fixture(params=['local', 's3'])
+def curated(request, tmp_path):
+    # 5 dias de dados sinteticos no curated, gravados pelo process_light
+    def build(cleaned, destination):
+        for path, _ in generate_data.generate(str(tmp_path / 'raw'), days=5, health_rows_per_day=4, workouts_per_day=3):
+            cleaner.process_dataset(path, cleaned, cleaner.SCHEMAS[cleaner.get_dataset(path)])
+        process_light.run(cleaned, destination, '2025-01-01', '2025-01-05', rollups=False)
+        return {'source': cleaned, 'destination': destination}
+
+    if request.param == 'local':
+        yield build(str(tmp_path / 'cleaned'), str(tmp_path / 'curated'))
+        return
+    with mock_aws():
+        client = boto3.client('s3')
+        for bucket in (CLEANED_BUCKET, CURATED_BUCKET):
+            client.create_bucket(Bucket=bucket)
+        yield build(f's3://{CLEANED_BUCKET}', f's3://{CURATED_BUCKET}')
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    # Arquivos lidos pela consulta
+    paths = []
+    read_file = CuratedQuery._read_file
+
+    def counting(self, path, columns, row_filter):
+        paths.append(path)
+        return read_file(self, path, columns, row_filter)
+
+    monkeypatch.setattr(CuratedQuery, '_read_file', counting)
+    return paths
+
+
+def test_date_predicates_read_only_the_partitions_in_range(curated, reads):
+    query = CuratedQuery(curated['destination'])
+
+    result = query.query('HealthData', '2025-01-02', '2025-01-03', columns=['data', 'batimentos_max_bpm', 'day'])
+
+    assert result.column_names == ['data', 'batimentos_max_bpm', 'day']
+    assert result.num_rows == 2 * 4
+    assert sorted(set(result.column('day').to_pylist())) == [2, 3]
+    assert len(reads) == 2 and all('day=2/' in path or 'day=3/' in path for path in reads)
+    assert query.query('HealthData').num_rows == 5 * 4
+
+
+def test_value_filters_prune_partitions_with_the_index(curated, reads):
+    query = CuratedQuery(curated['destination'])
+    index = load_index(curated['destination'], 'Workouts')
+    workout_type = index.entries['2025-01-03']['values']['tipo_de_exercicio'][0]
+    expected_days = index.partitions(values={'tipo_de_exercicio': [workout_type]})
+
+    result = query.query('Workouts', values={'tipo_de_exercicio': [workout_type]})
+
+    assert set(result.column('tipo_de_exercicio').to_pylist()) == {workout_type}
+    assert sorted({(2025, 1, day) for day in result.column('day').to_pylist()}) == expected_days
+    assert len(reads) == len(expected_days) < 5
+
+    threshold = load_index(curated['destination'], 'HealthData').column_range('batimentos_max_bpm')[1]
+    assert query.query('HealthData', ranges={'batimentos_max_bpm': (threshold, None)}).num_rows >= 1
+
+
+def test_results_are_cached_until_a_partition_is_rewritten(curated, reads):
+    query = CuratedQuery(curated['destination'])
+
+    first = query.query('HealthData', '2025-01-01', '2025-01-05')
+    second = query.query('HealthData', '2025-01-01', '2025-01-05')
+
+    assert second is first
+    assert (query.hits, query.misses) == (1, 1)
+    assert len(reads) == 5
+
+    # Regravar um dia muda os arquivos da particao, a consulta le de novo
+    process_light.run(curated['source'], curated['destination'], '2025-01-03', '2025-01-03', rollups=False)
+    third = query.query('HealthData', '2025-01-01', '2025-01-05')
+
+    assert third is not first
+    assert third.num_rows == first.num_rows
+    assert query.misses == 2
+
+
+def test_cache_evicts_the_least_recently_used_query(curated):
+    query = CuratedQuery(curated['destination'], cache_size=2)
+
+    query.query('HealthData', '2025-01-01', '2025-01-01')
+    query.query('HealthData', '2025-01-02', '2025-01-02')
+    query.query('HealthData', '2025-01-01', '2025-01-01')
+    query.query('Workouts', '2025-01-01', '2025-01-01')
+    query.query('HealthData', '2025-01-01', '2025-01-01')
+    query.query('HealthData', '2025-01-02', '2025-01-02')
+
+    assert len(query.cache) == 2
+    assert (query.hits, query.misses) == (2, 4)
+
+
+def test_empty_range_returns_the_table_schema(curated):
+    result = CuratedQuery(curated['destination']).query('Workouts', '2024-06-01', '2024-06-30')
+
+    assert result.num_rows == 0
+    assert result.column_names[0] == 'tipo_de_exercicio'
+    assert result.column_names[-3:] == ['year', 'month', 'day']
+
+
+def test_open_start_lists_only_the_indexed_months(curated, monkeypatch):
+    query = CuratedQuery(curated['destination'])
+    prefixes = []
+    list_files = CuratedQuery._list_files
+
+    def listing(self, prefix):
+        prefixes.append(prefix)
+        return list_files(self, prefix)
+
+    monkeypatch.setattr(CuratedQuery, '_list_files', listing)
+
+    assert query.query('HealthData', end='2025-01-02').num_rows == 2 * 4
+    assert prefixes == ['HealthData/year=2025/month=1/']
+
+
+def test_files_are_concatenated_without_promote_options(curated, monkeypatch):
+    import pyarrow as pa
+
+    # concat_tables do pyarrow antigo (camada do awswrangler), sem promote_options
+    concat_tables = pa.concat_tables
+    monkeypatch.setattr(pa, 'concat_tables', lambda tables: concat_tables(tables))
+
+    result = CuratedQuery(curated['destination']).query('Workouts', '2025-01-01', '2025-01-03', columns=['day'])
+    assert sorted(set(result.column('day').to_pylist())) == [1, 2, 3]
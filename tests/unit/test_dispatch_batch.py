@@ -0,0 +1,122 @@
+import json
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+import dispatch_batch
+
+RAW_BUCKET = 'health-datalake-test-raw'
+
+
+@pytest.fixture
+def state_machine(monkeypatch):
+    with mock_aws():
+        arn = boto3.client('stepfunctions').create_state_machine(
+            name='health-datalake-test-state-machine',
+            definition=json.dumps({'StartAt': 'Done', 'States': {'Done': {'Type': 'Succeed'}}}),
+            roleArn='arn:aws:iam::123456789012:role/stepfunctions'
+        )['stateMachineArn']
+        monkeypatch.setattr(dispatch_batch, 'STATE_MACHINE_ARN', arn)
+        yield arn
+
+
+def sqs_record(key, etag='abc', sequencer='0055AED6DCD90281E5'):
+    body = {
+        'detail-type': 'Object Created',
+        'source': 'aws.s3',
+        'detail': {
+            'bucket': {'name': RAW_BUCKET},
+            'object': {'key': key, 'etag': etag, 'size': 100, 'sequencer': sequencer}
+        }
+    }
+    return {'messageId': key, 'body': json.dumps(body)}
+
+
+def execution_inputs(arn):
+    client = boto3.client('stepfunctions')
+    executions = client.list_executions(stateMachineArn=arn)['executions']
+    return [json.loads(client.describe_execution(executionArn=execution['executionArn'])['input'])
+            for execution in executions]
+
+
+def test_one_execution_per_batch_with_latest_version_of_each_key(state_machine):
+    response = dispatch_batch.handler({'Records': [
+        sqs_record('HealthAutoExport-a.csv', etag='old', sequencer='0055AED6DCD90281E5'),
+        sqs_record('Workouts-a.csv'),
+        sqs_record('HealthAutoExport-a.csv', etag='new', sequencer='0055AED6DCD90281F0'),
+        sqs_record('errors/processing-failed/2025/01/30/ingestion-data-stream-1.gz')
+    ]}, None)
+
+    assert response['objects'] == 2
+    assert execution_inputs(state_machine) == [{'objects': [
+        {'bucket': RAW_BUCKET, 'key': 'HealthAutoExport-a.csv', 'etag': 'new', 'size': 100},
+        {'bucket': RAW_BUCKET, 'key': 'Workouts-a.csv', 'etag': 'abc', 'size': 100}
+    ]}]
+
+
+def test_large_batches_are_split_and_names_are_deterministic(state_machine, monkeypatch):
+    monkeypatch.setattr(dispatch_batch, 'MAX_EXECUTION_OBJECTS', 2)
+    records = [sqs_record(f'Workouts-{index}.csv') for index in range(5)]
+
+    response = dispatch_batch.handler({'Records': records}, None)
+
+    assert len(response['executions']) == 3
+    assert sorted(len(batch['objects']) for batch in execution_inputs(state_machine)) == [1, 2, 2]
+
+    objects, _ = dispatch_batch.collect_objects(records)
+    assert dispatch_batch.execution_name(objects) == dispatch_batch.execution_name(list(objects))
+
+
+def test_batch_without_known_objects_starts_nothing(state_machine):
+    response = dispatch_batch.handler({'Records': [sqs_record('errors/format-conversion-failed/x.gz')]}, None)
+
+    assert response == {'objects': 0, 'executions': [], 'batchItemFailures': []}
+    assert execution_inputs(state_machine) == []
+
+
+def test_redelivery_after_the_execution_finished_is_not_a_failure(state_machine):
+    client = boto3.client('stepfunctions')
+    records = [sqs_record('Workouts-a.csv')]
+    execution_arn = dispatch_batch.handler({'Records': records}, None)['executions'][0]
+    client.stop_execution(executionArn=execution_arn)
+
+    response = dispatch_batch.handler({'Records': records}, None)
+
+    assert response == {'objects': 1, 'executions': [], 'batchItemFailures': []}
+    assert len(execution_inputs(state_machine)) == 1
+
+    # Novo upload da mesma chave e etag: outro sequencer, outra execucao
+    response = dispatch_batch.handler({'Records': [sqs_record('Workouts-a.csv', sequencer='0055AED6DCD90281F0')]}, None)
+    assert len(response['executions']) == 1
+
+
+def test_only_the_messages_of_a_failed_batch_are_reported(state_machine, monkeypatch):
+    monkeypatch.setattr(dispatch_batch, 'MAX_EXECUTION_OBJECTS', 1)
+    started = []
+    start_execution = dispatch_batch.boto3.client('stepfunctions').start_execution
+
+    class Client:
+        exceptions = boto3.client('stepfunctions').exceptions
+
+        def start_execution(self, **kwargs):
+            if 'HealthAutoExport' in kwargs['input']:
+                raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}},
+                                  'StartExecution')
+            started.append(kwargs['name'])
+            return start_execution(**kwargs)
+
+    monkeypatch.setattr(dispatch_batch.boto3, 'client', lambda service: Client())
+    records = [
+        sqs_record('HealthAutoExport-a.csv', sequencer='0055AED6DCD90281E5'),
+        sqs_record('Workouts-a.csv'),
+        dict(sqs_record('HealthAutoExport-a.csv', sequencer='0055AED6DCD90281F0'), messageId='redelivered'),
+        {'messageId': 'broken', 'body': 'not json'}
+    ]
+
+    response = dispatch_batch.handler({'Records': records}, None)
+
+    assert len(started) == len(response['executions']) == 1
+    assert sorted(failure['itemIdentifier'] for failure in response['batchItemFailures']) == \
+        ['HealthAutoExport-a.csv', 'broken', 'redelivered']
@@ -0,0 +1,36 @@
+import aws_cdk as core
+import aws_cdk.assertions as assertions
+from aws_cdk import aws_lambda as _lambda, aws_s3 as _s3, Duration
+
+from health_data_lake.datalake.orchestration.event_bridge import StfBatchedEventBridgeS3
+
+
+def batched_template(**kwargs):
+    app = core.App()
+    stack = core.Stack(app, 'test-stack')
+    dispatch = _lambda.Function(
+        stack, 'dispatch', runtime=_lambda.Runtime.PYTHON_3_9, handler='index.handler',
+        timeout=Duration.minutes(1), code=_lambda.Code.from_inline('def handler(event, context): pass'))
+    StfBatchedEventBridgeS3(stack, 'StfBatchedEventBridgeS3', raw_bucket=_s3.Bucket(stack, 'raw'),
+                            dispatch_batch_lambda=dispatch, **kwargs)
+    return assertions.Template.from_stack(stack)
+
+
+def test_object_created_events_are_buffered_in_a_queue():
+    template = batched_template(batch_window=Duration.minutes(2), batch_size=500)
+
+    template.has_resource_properties('AWS::Events::Rule', {
+        'EventPattern': {'source': ['aws.s3'], 'detail-type': ['Object Created']},
+        'Targets': [{'Arn': {'Fn::GetAtt': [assertions.Match.string_like_regexp('Rawobjectsqueue'), 'Arn']}}]
+    })
+    template.has_resource_properties('AWS::Lambda::EventSourceMapping', {
+        'BatchSize': 500,
+        'MaximumBatchingWindowInSeconds': 120,
+        'ScalingConfig': {'MaximumConcurrency': 2},
+        'FunctionResponseTypes': ['ReportBatchItemFailures']
+    })
+    # Janela mais 6x o timeout da lambda
+    template.has_resource_properties('AWS::SQS::Queue', {
+        'VisibilityTimeout': 120 + 6 * 60,
+        'RedrivePolicy': assertions.Match.object_like({'maxReceiveCount': 5})
+    })
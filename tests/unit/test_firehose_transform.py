@@ -0,0 +1,100 @@
+import base64
+import json
+
+import firehose_transform
+
+
+def firehose_event(*payloads):
+    # Lote como o firehose envia para a lambda de transformacao
+    records = []
+    for position, payload in enumerate(payloads):
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+        records.append({
+            'recordId': f'record-{position}',
+            'approximateArrivalTimestamp': 1735689600000,
+            'data': base64.b64encode(data).decode('utf-8')
+        })
+    return {
+        'invocationId': 'invocation',
+        'deliveryStreamArn': 'arn:aws:firehose:us-east-1:123456789012:deliverystream/test',
+        'region': 'us-east-1',
+        'records': records
+    }
+
+
+def decoded_lines(record):
+    return [json.loads(line) for line in base64.b64decode(record['data']).decode('utf-8').splitlines()]
+
+
+def test_every_record_gets_a_result_and_bad_ones_fail(monkeypatch):
+    monkeypatch.setattr(firehose_transform, 'MAX_RECORD_BYTES', 1024)
+    event = firehose_event(
+        {'Date': '2025-01-01 10:00:00 -0300', 'Active Energy (kJ)': 120.5},
+        b'{"date": "2025-01-01',
+        {'date': '2025-01-01 11:00:00', 'heart_rate_max_bpm': 'alto'},
+        {'active_energy_kj': 10},
+        ['2025-01-01 12:00:00'],
+        {'date': '2025-01-01 13:00:00', 'notes': 'x' * 2048}
+    )
+
+    records = firehose_transform.handler(event, None)['records']
+
+    assert [record['recordId'] for record in records] == [record['recordId'] for record in event['records']]
+    assert [record['result'] for record in records] == ['Ok'] + ['ProcessingFailed'] * 5
+    # Registros com falha voltam intactos para o prefixo de erros
+    assert [record['data'] for record in records[1:]] == [record['data'] for record in event['records'][1:]]
+
+
+def test_valid_records_are_normalized_to_the_registry_columns(monkeypatch):
+    monkeypatch.setattr(firehose_transform, 'AGGREGATE_MAX_BYTES', 0)
+    event = firehose_event(
+        {'Date': '2025-01-01 10:00:00 -0300', 'Active Energy (kJ)': '120.5', 'Unknown': 1},
+        {'date': '2025-01-02T08:30:00', 'heart_rate_min_bpm': 51}
+    )
+
+    records = firehose_transform.handler(event, None)['records']
+
+    assert [record['result'] for record in records] == ['Ok', 'Ok']
+    first, second = decoded_lines(records[0]), decoded_lines(records[1])
+    assert list(first[0]) == firehose_transform.SCHEMA.normalized_columns
+    assert first[0]['date'] == '2025-01-01 10:00:00'
+    assert first[0]['active_energy_kj'] == 120.5
+    assert first[0]['resting_energy_kj'] is None
+    assert second[0]['date'] == '2025-01-02 08:30:00'
+    assert second[0]['heart_rate_min_bpm'] == 51.0
+
+
+def test_small_records_of_the_same_day_are_aggregated(monkeypatch):
+    monkeypatch.setattr(firehose_transform, 'DYNAMIC_PARTITIONING', True)
+    event = firehose_event(*[
+        {'date': f'2025-01-0{day} {hour:02d}:00:00', 'active_energy_kj': hour}
+        for hour in range(3) for day in (1, 2)
+    ])
+
+    records = firehose_transform.handler(event, None)['records']
+
+    ok = [record for record in records if record['result'] == 'Ok']
+    assert [record['recordId'] for record in ok] == ['record-0', 'record-1']
+    assert sum(record['result'] == 'Dropped' for record in records) == 4
+    assert [line['date'] for line in decoded_lines(ok[0])] == [
+        '2025-01-01 00:00:00', '2025-01-01 01:00:00', '2025-01-01 02:00:00'
+    ]
+    assert [record['metadata']['partitionKeys'] for record in ok] == [
+        {'year': '2025', 'month': '1', 'day': '1'},
+        {'year': '2025', 'month': '1', 'day': '2'}
+    ]
+
+
+def test_aggregation_respects_the_size_limit_and_parquet_format(monkeypatch):
+    event = firehose_event(*[{'date': f'2025-01-01 {hour:02d}:00:00'} for hour in range(6)])
+    line_bytes = len(base64.b64decode(
+        firehose_transform.handler(firehose_event({'date': '2025-01-01 00:00:00'}), None)['records'][0]['data']))
+
+    monkeypatch.setattr(firehose_transform, 'AGGREGATE_MAX_BYTES', line_bytes * 2)
+    records = firehose_transform.handler(event, None)['records']
+    assert [len(decoded_lines(record)) for record in records if record['result'] == 'Ok'] == [2, 2, 2]
+
+    # A conversao para parquet espera um documento por registro
+    monkeypatch.setattr(firehose_transform, 'RECORD_FORMAT', 'parquet')
+    records = firehose_transform.handler(event, None)['records']
+    assert [record['result'] for record in records] == ['Ok'] * 6
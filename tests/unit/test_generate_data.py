@@ -0,0 +1,31 @@
+import os
+
+import pandas as pd
+
+import cleaner
+import generate_data
+
+
+def test_generated_files_follow_export_names_and_scale(tmp_path):
+    files = generate_data.generate(str(tmp_path), days=3, users=2, health_rows_per_day=24, workouts_per_day=3)
+
+    names = sorted(os.path.basename(path) for path, _ in files)
+
+    assert len(files) == 3 * 2 * 2
+    assert 'HealthAutoExport-2025-01-01-2025-01-01.csv' in names
+    assert 'Workouts-20250103_000000-20250103_235959.csv' in names
+    assert sum(rows for path, rows in files if 'HealthAutoExport' in path) == 3 * 2 * 24
+
+
+def test_generated_files_go_through_the_cleaner(tmp_path):
+    files = generate_data.generate(str(tmp_path / 'raw'), days=2, users=2, health_rows_per_day=24, workouts_per_day=2)
+
+    for path, rows in files:
+        stats = cleaner.process_dataset(path, str(tmp_path / 'cleaned'), cleaner.SCHEMAS[cleaner.get_dataset(path)])
+        assert stats['rows'] == rows
+
+    health = pd.read_parquet(tmp_path / 'cleaned' / 'HealthAutoExport')
+
+    # Linhas de usuarios diferentes nao colidem na chave natural do upsert
+    assert len(health) == 2 * 2 * 24
+    assert health['heart_rate_min_bpm'].le(health['heart_rate_max_bpm']).all()
@@ -0,0 +1,56 @@
+import aws_cdk as core
+import aws_cdk.assertions as assertions
+from aws_cdk import aws_s3 as _s3
+
+from datalake_common import transforms
+from health_data_lake.datalake.data.glue_crawlers import CURATED_TABLES, DATABASE_NAME, DataCatalogs
+
+
+def catalog_template(**kwargs):
+    app = core.App()
+    stack = core.Stack(app, 'test-stack')
+    DataCatalogs(stack, 'DataCatalogs', curated_bucket=_s3.Bucket(stack, 'curated'), **kwargs)
+    return assertions.Template.from_stack(stack)
+
+
+def test_tables_match_the_curated_definitions():
+    assert CURATED_TABLES == transforms.CURATED_TABLES
+
+
+def test_tables_are_created_at_deploy_time():
+    template = catalog_template()
+
+    tables = {
+        table['Properties']['TableInput']['Name']: table['Properties']['TableInput']
+        for table in template.find_resources('AWS::Glue::Table').values()
+    }
+    assert set(tables) == {table.lower() for table in CURATED_TABLES}
+    assert [key['Name'] for key in tables['healthdata']['PartitionKeys']] == transforms.PARTITION_COLS
+    assert [(column['Name'], column['Type']) for column in tables['workoutsrolling']['StorageDescriptor']['Columns']] \
+        == CURATED_TABLES['WorkoutsRolling']
+
+    crawler = next(iter(template.find_resources('AWS::Glue::Crawler').values()))['Properties']
+    assert crawler['Targets'] == {'CatalogTargets': [{
+        'DatabaseName': DATABASE_NAME, 'Tables': [table.lower() for table in CURATED_TABLES]
+    }]}
+
+
+def test_partition_projection_is_optional():
+    template = catalog_template()
+    parameters = next(iter(template.find_resources('AWS::Glue::Table').values()))['Properties']['TableInput']['Parameters']
+    assert 'projection.enabled' not in parameters
+
+    template = catalog_template(partition_projection=True)
+    tables = {
+        table['Properties']['TableInput']['Name']: table['Properties']['TableInput']['Parameters']
+        for table in template.find_resources('AWS::Glue::Table').values()
+    }
+    parameters = tables['healthdata']
+    assert parameters['projection.enabled'] == 'true'
+    assert parameters['projection.year.type'] == parameters['projection.month.type'] == 'integer'
+    assert parameters['projection.month.range'] == '1,12' and parameters['projection.day.range'] == '1,31'
+    # Caminho com o nome do bucket (token do cdk) e as chaves sem zero a esquerda
+    assert parameters['storage.location.template']['Fn::Join'][1][-1] == \
+        '/HealthData/year=${year}/month=${month}/day=${day}/'
+    assert tables['workouts']['storage.location.template']['Fn::Join'][1][-1] == \
+        '/Workouts/year=${year}/month=${month}/day=${day}/'
@@ -0,0 +1,41 @@
+import aws_cdk as core
+import aws_cdk.assertions as assertions
+from aws_cdk import aws_s3 as _s3
+
+from health_data_lake.datalake.process_pipeline.glue_job import DatalakeGlueJobs
+
+
+def glue_job_template(**kwargs):
+    app = core.App()
+    stack = core.Stack(app, 'test-stack')
+    DatalakeGlueJobs(
+        stack, 'DatalakeGlueJobs',
+        cleaned_bucket=_s3.Bucket(stack, 'cleaned'),
+        curated_bucket=_s3.Bucket(stack, 'curated'),
+        support_bucket=_s3.Bucket(stack, 'support'),
+        **kwargs
+    )
+    return assertions.Template.from_stack(stack)
+
+
+def test_process_job_uses_workers_with_auto_scaling():
+    template = glue_job_template()
+
+    job = next(iter(template.find_resources('AWS::Glue::Job').values()))['Properties']
+    assert job['WorkerType'] == 'G.1X'
+    assert job['NumberOfWorkers'] == 10
+    assert job['ExecutionClass'] == 'STANDARD'
+    assert job['DefaultArguments']['--enable-auto-scaling'] == 'true'
+    assert job['DefaultArguments']['--TARGET_FILE_BYTES'] == str(128 * 1024 * 1024)
+    assert 'MaxCapacity' not in job
+
+
+def test_flex_execution_class():
+    template = glue_job_template(worker_type='G.2X', number_of_workers=4, auto_scaling=False, flex=True)
+
+    template.has_resource_properties('AWS::Glue::Job', {
+        'WorkerType': 'G.2X',
+        'NumberOfWorkers': 4,
+        'ExecutionClass': 'FLEX',
+        'DefaultArguments': assertions.Match.object_like({'--enable-auto-scaling': 'false'})
+    })
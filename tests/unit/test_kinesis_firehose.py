@@ -0,0 +1,83 @@
+import aws_cdk as core
+import aws_cdk.assertions as assertions
+import pytest
+from aws_cdk import aws_lambda as _lambda, aws_s3 as _s3
+
+from datalake_common.schemas import HEALTH_AUTO_EXPORT, dataset_for_key
+from health_data_lake.datalake.data.kinesis_firehose import DatalakeDeliveryStream, INGEST_COLUMNS, INGEST_DATASET
+
+
+def delivery_stream_template(transform=False, **kwargs):
+    app = core.App()
+    stack = core.Stack(app, 'test-stack')
+    if transform:
+        kwargs['transform_lambda'] = _lambda.Function(
+            stack, 'transform', runtime=_lambda.Runtime.PYTHON_3_9, handler='index.handler',
+            code=_lambda.Code.from_inline('def handler(event, context): pass'))
+    DatalakeDeliveryStream(stack, 'DatalakeDeliveryStream', raw_bucket=_s3.Bucket(stack, 'raw'), **kwargs)
+    return assertions.Template.from_stack(stack)
+
+
+def destination(template):
+    stream = next(iter(template.find_resources('AWS::KinesisFirehose::DeliveryStream').values()))
+    return stream['Properties']['ExtendedS3DestinationConfiguration']
+
+
+def test_ingest_columns_match_the_dataset_registry():
+    assert INGEST_DATASET == HEALTH_AUTO_EXPORT.name
+    assert INGEST_COLUMNS == [(column.normalized, column.dtype) for column in HEALTH_AUTO_EXPORT.columns]
+
+
+def test_default_stream_keeps_row_format_and_small_buffer():
+    config = destination(delivery_stream_template())
+
+    assert config['Prefix'] == 'data/HealthAutoExport/'
+    # Chave que o firehose grava com o prefixo padrao chega ao cleaner pelo dataset
+    assert dataset_for_key(f"{config['Prefix']}2025/01/30/12/stream-1-2025-01-30-12-00-00-abc") == INGEST_DATASET
+    assert config['BufferingHints'] == {'IntervalInSeconds': 120, 'SizeInMBs': 2}
+    assert 'DataFormatConversionConfiguration' not in config
+    assert 'DynamicPartitioningConfiguration' not in config
+
+
+def test_parquet_conversion_with_dynamic_date_partitions():
+    template = delivery_stream_template(record_format='parquet', dynamic_partitioning=True, compression='GZIP')
+    config = destination(template)
+
+    assert config['Prefix'] == ('data/HealthAutoExport/year=!{partitionKeyFromQuery:year}/'
+                                'month=!{partitionKeyFromQuery:month}/day=!{partitionKeyFromQuery:day}/')
+    assert config['BufferingHints']['SizeInMBs'] == 128
+    assert config['CompressionFormat'] == 'UNCOMPRESSED'
+    assert config['FileExtension'] == '.parquet'
+    assert config['DynamicPartitioningConfiguration'] == {'Enabled': True}
+    assert config['DataFormatConversionConfiguration']['OutputFormatConfiguration'] == {
+        'Serializer': {'ParquetSerDe': {'Compression': 'GZIP'}}
+    }
+
+    table = next(iter(template.find_resources('AWS::Glue::Table').values()))
+    columns = table['Properties']['TableInput']['StorageDescriptor']['Columns']
+    assert [(column['Name'], column['Type']) for column in columns] == INGEST_COLUMNS
+
+
+def test_conversion_requires_a_64_mb_buffer():
+    with pytest.raises(ValueError):
+        delivery_stream_template(record_format='parquet', buffer_size_mb=2)
+
+
+def test_transform_lambda_replaces_the_query_for_partition_keys():
+    template = delivery_stream_template(transform=True, dynamic_partitioning=True)
+    config = destination(template)
+
+    assert config['Prefix'] == ('data/HealthAutoExport/year=!{partitionKeyFromLambda:year}/'
+                                'month=!{partitionKeyFromLambda:month}/day=!{partitionKeyFromLambda:day}/')
+    processors = config['ProcessingConfiguration']['Processors']
+    assert [processor['Type'] for processor in processors] == ['Lambda']
+
+    function = next(iter(template.find_resources('AWS::Lambda::Function').values()))
+    assert function['Properties']['Environment']['Variables'] == {
+        'RECORD_FORMAT': 'json', 'DYNAMIC_PARTITIONING': 'true'
+    }
+    template.has_resource_properties('AWS::IAM::Policy', {
+        'PolicyDocument': {'Statement': [assertions.Match.object_like({
+            'Action': ['lambda:InvokeFunction', 'lambda:GetFunctionConfiguration']
+        })]}
+    })
@@ -0,0 +1,45 @@
+import aws_cdk as core
+import aws_cdk.assertions as assertions
+import pytest
+from aws_cdk import aws_s3 as _s3
+
+from health_data_lake.datalake.process_pipeline.lambdas import DatalakeLambdas
+
+
+def lambdas_template(**kwargs):
+    # Sem bundling (docker) da camada do pacote otimizado
+    app = core.App(context={'aws:cdk:bundling-stacks': []})
+    stack = core.Stack(app, 'test-stack')
+    buckets = {name: _s3.Bucket(stack, name) for name in ['raw', 'cleaned', 'curated', 'support']}
+    DatalakeLambdas(
+        stack, 'DatalakeLambdas',
+        raw_bucket=buckets['raw'],
+        cleaned_bucket=buckets['cleaned'],
+        curated_bucket=buckets['curated'],
+        support_bucket=buckets['support'],
+        crawler_name='test-crawler',
+        **kwargs
+    )
+    return assertions.Template.from_stack(stack)
+
+
+def cleaner_function(template):
+    functions = template.find_resources('AWS::Lambda::Function', {
+        'Properties': {'Handler': 'cleaner.handler'}
+    })
+    return next(iter(functions.values()))['Properties']
+
+
+@pytest.mark.parametrize('package,io_backend,layers', [('legacy', 'wrangler', 2), ('optimized', 'arrow', 3)])
+def test_cleaner_package_selects_layer_and_io_backend(package, io_backend, layers):
+    template = lambdas_template(cleaner_package=package)
+    function = cleaner_function(template)
+
+    assert function['Environment']['Variables']['CLEANER_IO'] == io_backend
+    assert len(function['Layers']) == 2
+    template.resource_count_is('AWS::Lambda::LayerVersion', layers)
+
+
+def test_unknown_cleaner_package_is_rejected():
+    with pytest.raises(ValueError):
+        lambdas_template(cleaner_package='slim')
@@ -0,0 +1,178 @@
+import threading
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from datalake_common.locks import (
+    DynamoDBLockStore, MemoryLockStore, PartitionBusy, PartitionLocks, curated_lock_keys, partition_lock_keys
+)
+
+TABLE_NAME = 'health-datalake-test-partition-locks'
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def dynamodb_store():
+    with mock_aws():
+        client = boto3.client('dynamodb')
+        client.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[{'AttributeName': 'lock_key', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'lock_key', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        yield DynamoDBLockStore(TABLE_NAME, client=client)
+
+
+@pytest.fixture(params=['memory', 'dynamodb'])
+def store(request):
+    if request.param == 'memory':
+        return MemoryLockStore()
+    return request.getfixturevalue('dynamodb_store')
+
+
+def test_different_dates_are_claimed_in_parallel(store):
+    locks = PartitionLocks(store)
+
+    first = locks.claim(partition_lock_keys('Workouts', [(2025, 1, 30)]), 'exec-a')
+    second = locks.claim(partition_lock_keys('Workouts', [(2025, 1, 31)]), 'exec-b')
+
+    assert first == {'claimed': ['Workouts#2025-01-30'], 'waiting': []}
+    assert second == {'claimed': ['Workouts#2025-01-31'], 'waiting': []}
+
+
+def test_same_date_is_granted_in_arrival_order(store):
+    locks = PartitionLocks(store)
+    key = partition_lock_keys('Workouts', [(2025, 1, 30)])
+
+    assert locks.claim(key, 'exec-a')['waiting'] == []
+    assert locks.claim(key, 'exec-b')['waiting'] == key
+    assert locks.claim(key, 'exec-c')['waiting'] == key
+
+    locks.release(key, 'exec-a')
+
+    # exec-c chegou depois de exec-b e continua na fila
+    assert locks.claim(key, 'exec-c')['waiting'] == key
+    assert locks.claim(key, 'exec-b')['claimed'] == key
+
+
+def test_claims_stop_at_the_first_busy_key_and_resume(store):
+    locks = PartitionLocks(store)
+    keys = partition_lock_keys('HealthAutoExport', [(2025, 1, 29), (2025, 1, 30), (2025, 1, 31)])
+
+    locks.claim(keys[1:2], 'exec-a')
+    result = locks.claim(keys, 'exec-b')
+    assert result == {'claimed': keys[:1], 'waiting': keys[1:]}
+
+    locks.release(keys[1:2], 'exec-a')
+    assert locks.claim(keys, 'exec-b') == {'claimed': keys, 'waiting': []}
+
+
+def test_expired_claims_and_waiters_are_dropped(store):
+    clock = Clock()
+    locks = PartitionLocks(store, ttl_seconds=60, clock=clock)
+    key = ['curated#2025-01']
+
+    locks.claim(key, 'exec-a')
+    locks.claim(key, 'exec-b')
+    clock.now += 61
+
+    # exec-a morreu sem liberar e exec-b desistiu de esperar
+    assert locks.claim(key, 'exec-c')['claimed'] == key
+
+
+def test_a_waiter_that_stops_polling_leaves_the_queue_before_the_claim_expires(store):
+    clock = Clock()
+    locks = PartitionLocks(store, ttl_seconds=3600, waiter_ttl_seconds=90, clock=clock)
+    key = ['curated#2025-01']
+
+    locks.claim(key, 'exec-a')
+    locks.claim(key, 'exec-b')
+    locks.claim(key, 'exec-c')
+    locks.release(key, 'exec-a')
+
+    # exec-b foi abortada na espera; exec-c continua tentando e passa a frente
+    # depois do prazo da fila, muito antes do prazo da reserva
+    clock.now += 60
+    assert locks.claim(key, 'exec-c')['waiting'] == key
+    clock.now += 60
+    assert locks.claim(key, 'exec-c')['claimed'] == key
+
+    # O dono segura a chave pelo prazo da reserva, sem precisar renovar
+    clock.now += 1800
+    assert locks.claim(key, 'exec-d')['waiting'] == key
+
+
+def test_ttl_attribute_outlives_the_queue_after_release(dynamodb_store):
+    clock = Clock()
+    locks = PartitionLocks(dynamodb_store, ttl_seconds=900, waiter_ttl_seconds=60, clock=clock)
+    key = ['curated#2025-01']
+
+    locks.claim(key, 'exec-a')
+    locks.claim(key, 'exec-b')
+    clock.now += 30
+    locks.release(key, 'exec-a')
+
+    # Chave livre com expires_at no passado, mas exec-b continua na fila
+    item = dynamodb_store.client.get_item(TableName=TABLE_NAME, Key={'lock_key': {'S': key[0]}})['Item']
+    assert int(item['expires_at']['N']) == clock.now
+    assert int(item['purge_at']['N']) == 1000 + 60
+
+
+def test_release_only_frees_keys_of_the_owner(store):
+    locks = PartitionLocks(store)
+    key = ['curated#2025-01']
+
+    locks.claim(key, 'exec-a')
+    assert locks.release(key, 'exec-b') == []
+    assert locks.claim(key, 'exec-b')['waiting'] == key
+    assert locks.release(key, 'exec-a') == key
+
+
+def test_hold_serializes_writers_of_the_same_partition():
+    locks = PartitionLocks(MemoryLockStore())
+    key = partition_lock_keys('Workouts', [(2025, 1, 30)])
+    inside, overlaps = [], []
+
+    def writer(owner):
+        with locks.hold(key, owner, wait_seconds=10, poll_seconds=0.01):
+            inside.append(owner)
+            overlaps.append(len(inside))
+            inside.remove(owner)
+
+    threads = [threading.Thread(target=writer, args=(f'exec-{index}',)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert overlaps == [1, 1, 1, 1]
+
+
+def test_hold_gives_up_after_the_wait_time():
+    locks = PartitionLocks(MemoryLockStore())
+    key = ['Workouts#2025-01-30']
+    locks.claim(key, 'exec-a')
+
+    with pytest.raises(PartitionBusy):
+        with locks.hold(key, 'exec-b', wait_seconds=0, poll_seconds=0):
+            pass
+
+    # Quem desistiu sai da fila
+    locks.release(key, 'exec-a')
+    assert locks.claim(key, 'exec-c')['claimed'] == key
+
+
+def test_curated_keys_cover_the_rollup_months():
+    assert curated_lock_keys([(2025, 3, 15)], rollups=False) == ['curated#2025-03-15']
+    # Janela de 30 dias das medias moveis em volta do dia e o mes inteiro
+    assert curated_lock_keys([(2025, 3, 15)]) == ['curated#2025-02', 'curated#2025-03', 'curated#2025-04']
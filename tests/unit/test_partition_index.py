@@ -0,0 +1,92 @@
+import boto3
+import pandas as pd
+import pytest
+from moto import mock_aws
+
+from datalake_common.partition_index import (
+    PartitionIndex, frame_stats, index_aggregates, list_months, load_index, shard_path, update_index
+)
+from datalake_common.transforms import CURATED_TABLES
+
+CURATED_BUCKET = 'health-datalake-test-curated'
+
+
+def workouts_frame(rows):
+    # (dia, tipo, batimento maximo) no formato da tabela Workouts do curated
+    df = pd.DataFrame({column: [1.0] * len(rows) for column, _ in CURATED_TABLES['Workouts']})
+    df['tipo_de_exercicio'] = [workout_type for _, workout_type, _ in rows]
+    df['batimento_maximo_bpm'] = [heart_rate for _, _, heart_rate in rows]
+    df['quantidade_no_dia'] = 1
+    df['year'], df['month'], df['day'] = 2025, [int(day[5:7]) for day, _, _ in rows], [int(day[8:]) for day, _, _ in rows]
+    return df
+
+
+@pytest.fixture(params=['local', 's3'])
+def base_path(request, tmp_path):
+    if request.param == 'local':
+        yield str(tmp_path / 'curated')
+        return
+    with mock_aws():
+        boto3.client('s3').create_bucket(Bucket=CURATED_BUCKET)
+        yield f's3://{CURATED_BUCKET}'
+
+
+def test_index_aggregates_cover_numeric_and_category_columns():
+    aggregates = index_aggregates('Workouts')
+
+    assert aggregates[0] == ('rows', 'count', None)
+    assert ('max__batimento_maximo_bpm', 'max', 'batimento_maximo_bpm') in aggregates
+    assert ('values__tipo_de_exercicio', 'values', 'tipo_de_exercicio') in aggregates
+    assert not any(column == 'tipo_de_exercicio' for _, function, column in aggregates if function != 'values')
+
+
+def test_frame_stats_per_partition():
+    df = workouts_frame([
+        ('2025-01-30', 'Running', 170.0),
+        ('2025-01-30', 'Yoga', None),
+        ('2025-01-31', 'Cycling', 150.0)
+    ])
+
+    stats = frame_stats(df, 'Workouts')
+
+    assert sorted(stats) == ['2025-01-30', '2025-01-31']
+    assert stats['2025-01-30']['rows'] == 2
+    assert stats['2025-01-30']['max']['batimento_maximo_bpm'] == 170.0
+    assert stats['2025-01-30']['values']['tipo_de_exercicio'] == ['Running', 'Yoga']
+    assert isinstance(stats['2025-01-30']['max']['quantidade_no_dia'], int)
+
+
+def test_update_replaces_only_the_written_days(base_path):
+    update_index(base_path, 'Workouts', frame_stats(workouts_frame([
+        ('2025-01-30', 'Running', 170.0), ('2025-01-31', 'Cycling', 150.0), ('2025-02-01', 'Yoga', 110.0)
+    ]), 'Workouts'))
+    months = update_index(base_path, 'Workouts', frame_stats(workouts_frame([
+        ('2025-01-31', 'Swimming', 140.0)
+    ]), 'Workouts'))
+
+    index = load_index(base_path, 'Workouts')
+
+    assert months == ['2025-01']
+    assert list_months(base_path, 'Workouts') == ['2025-01', '2025-02']
+    assert len(index) == 3 and index.rows == 3
+    assert index.last_with_value('tipo_de_exercicio', 'Cycling') is None
+    assert index.last_with_value('tipo_de_exercicio', 'Swimming') == (2025, 1, 31)
+    assert len(load_index(base_path, 'Workouts', months=['2025-02'])) == 1
+    assert shard_path(base_path, 'Workouts', '2025-01').endswith('/_index/Workouts/2025-01.json')
+
+
+def test_lookups_and_pruning():
+    index = PartitionIndex('HealthData', {
+        '2025-01-01': {'rows': 4, 'min': {'batimentos_max_bpm': 120.0}, 'max': {'batimentos_max_bpm': 150.0}, 'values': {}},
+        '2025-01-02': {'rows': 4, 'min': {'batimentos_max_bpm': 130.0}, 'max': {'batimentos_max_bpm': 185.0}, 'values': {}},
+        '2025-01-03': {'rows': 2, 'min': {}, 'max': {}, 'values': {}},
+        '2025-01-04': {'rows': 4, 'min': {'batimentos_max_bpm': 90.0}, 'max': {'batimentos_max_bpm': 181.0}, 'values': {}}
+    })
+
+    assert index.days_with('batimentos_max_bpm', above=180) == [(2025, 1, 2), (2025, 1, 4)]
+    assert index.days_with('batimentos_max_bpm', below=100) == [(2025, 1, 4)]
+    assert index.column_range('batimentos_max_bpm') == (90.0, 185.0)
+    # So colunas nulas no dia 3: nenhum filtro de intervalo casa com ele
+    assert index.partitions(ranges={'batimentos_max_bpm': (160, None)}) == [(2025, 1, 2), (2025, 1, 4)]
+    assert index.partitions(start='2025-01-02', end='2025-01-03') == [(2025, 1, 2), (2025, 1, 3)]
+    assert index.partitions(ranges={'batimentos_max_bpm': (None, 125)}, end='2025-01-02') == [(2025, 1, 1)]
@@ -0,0 +1,29 @@
+import pytest
+
+import partition_locks
+from datalake_common.locks import MemoryLockStore
+
+
+@pytest.fixture
+def store(monkeypatch):
+    # Uma tabela em memoria compartilhada entre as chamadas das lambdas
+    store = MemoryLockStore()
+    monkeypatch.setattr(partition_locks, 'lock_store', lambda table_name: store)
+    return store
+
+
+def lock_event(owner, start_date='2025-03-10', end_date='2025-03-12'):
+    return {'start_date': start_date, 'end_date': end_date, 'owner': owner, 'ttl_seconds': 600}
+
+
+def test_overlapping_executions_wait_and_distant_months_run_together(store):
+    first = partition_locks.claim_handler(lock_event('exec-a'), None)
+    overlapping = partition_locks.claim_handler(lock_event('exec-b', '2025-03-20', '2025-03-20'), None)
+    distant = partition_locks.claim_handler(lock_event('exec-c', '2025-09-01', '2025-09-01'), None)
+
+    assert first['claimed'] == ['curated#2025-02', 'curated#2025-03', 'curated#2025-04']
+    assert overlapping['waiting'][0] == 'curated#2025-02'
+    assert distant['waiting'] == []
+
+    assert partition_locks.release_handler(lock_event('exec-a'), None)['released'] == first['claimed']
+    assert partition_locks.claim_handler(lock_event('exec-b', '2025-03-20', '2025-03-20'), None)['waiting'] == []
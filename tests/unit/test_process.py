@@ -0,0 +1,270 @@
+import glob
+import os
+import shutil
+from datetime import date
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyspark')
+
+# O pyspark sobe uma JVM: sem java o gateway nao inicia (JAVA_GATEWAY_EXITED)
+JAVA = os.path.join(os.environ['JAVA_HOME'], 'bin', 'java') if os.environ.get('JAVA_HOME') else shutil.which('java')
+if not JAVA or not os.access(JAVA, os.X_OK):
+    pytest.skip('testes do spark precisam de um runtime java (JAVA_HOME ou java no PATH)', allow_module_level=True)
+
+import cleaner
+import generate_data
+import process
+
+
+@pytest.fixture(scope='module')
+def spark():
+    from pyspark.sql import SparkSession
+
+    session = SparkSession.builder.master('local[2]').appName('test-process') \
+        .config('spark.sql.shuffle.partitions', '2') \
+        .config('spark.ui.enabled', 'false') \
+        .config('spark.ui.showConsoleProgress', 'false').getOrCreate()
+    session.sparkContext.setLogLevel('ERROR')
+    yield session
+    session.stop()
+
+
+@pytest.fixture
+def lake(tmp_path):
+    # 5 dias de dados sinteticos passados pelo cleaner
+    for path, _ in generate_data.generate(str(tmp_path / 'raw'), days=5, health_rows_per_day=4, workouts_per_day=3):
+        cleaner.process_dataset(path, str(tmp_path / 'cleaned'), cleaner.SCHEMAS[cleaner.get_dataset(path)])
+    return {'source': str(tmp_path / 'cleaned'), 'destination': str(tmp_path / 'curated')}
+
+
+def curated_partitions(lake, dataset):
+    base_path = f"{lake['destination']}/{dataset}"
+    return sorted(os.path.relpath(path, base_path) for path in glob.glob(f'{base_path}/year=*/month=*/day=*'))
+
+
+def job_args(lake, *args, rollups='false'):
+    return process.resolve_args(['--SOURCE_BUCKET', lake['source'], '--DESTINATION_BUCKET', lake['destination'],
+                                 '--ROLLUPS', rollups, '--JOB_ID', 'j_123', *args])
+
+
+def test_resolve_args_defaults_to_a_single_day():
+    args = process.resolve_args(['--START_DATE', '2025-01-30', '--job-bookmark-option', 'job-bookmark-disable'])
+
+    assert (args.MODE, args.START_DATE, args.END_DATE) == ('range', '2025-01-30', '2025-01-30')
+    assert process.date_range('2025-01-30', '2025-02-01') == [(2025, 1, 30), (2025, 1, 31), (2025, 2, 1)]
+
+    with pytest.raises(ValueError):
+        process.resolve_args(['--START_DATE', '2025-02-01', '--END_DATE', '2025-01-30'])
+
+
+def test_date_range_is_processed_in_one_run_with_per_day_aggregates(spark, lake):
+    process.run(spark, job_args(lake, '--START_DATE', '2025-01-02', '--END_DATE', '2025-01-04'))
+
+    workouts = pd.read_parquet(f"{lake['destination']}/Workouts")
+    health = pd.read_parquet(f"{lake['destination']}/HealthData")
+
+    assert curated_partitions(lake, 'HealthData') == [f'year=2025/month=1/day={day}' for day in (2, 3, 4)]
+    assert sorted(health['day'].astype(int).unique()) == [2, 3, 4]
+    assert len(health) == 3 * 4
+    # Um registro por dia e tipo, somando os 3 exercicios de cada dia
+    assert workouts.groupby('day', observed=True)['quantidade_no_dia'].sum().tolist() == [3, 3, 3]
+
+
+def test_reprocessing_a_range_replaces_only_its_partitions(spark, lake):
+    process.run(spark, job_args(lake, '--START_DATE', '2025-01-01', '--END_DATE', '2025-01-05'))
+    process.run(spark, job_args(lake, '--START_DATE', '2025-01-03', '--END_DATE', '2025-01-03'))
+
+    health = pd.read_parquet(f"{lake['destination']}/HealthData")
+
+    assert len(health) == 5 * 4
+    assert len(curated_partitions(lake, 'Workouts')) == 5
+
+
+def test_all_new_mode_processes_only_missing_partitions(spark, lake):
+    process.run(spark, job_args(lake, '--START_DATE', '2025-01-01', '--END_DATE', '2025-01-02'))
+
+    partitions = process.run(spark, job_args(lake, '--MODE', 'all_new'))
+
+    assert partitions == [(2025, 1, 3), (2025, 1, 4), (2025, 1, 5)]
+    assert len(curated_partitions(lake, 'HealthData')) == 5
+    assert process.run(spark, job_args(lake, '--MODE', 'all_new')) == []
+
+
+def test_all_new_mode_settles_on_days_with_a_single_dataset(spark, lake, tmp_path):
+    # 06/01 so tem dados de saude, nunca vai existir no Workouts do curated
+    for path, _ in generate_data.generate(str(tmp_path / 'raw-health'), days=1, start=date(2025, 1, 6)):
+        if cleaner.get_dataset(path) == 'HealthAutoExport':
+            cleaner.process_dataset(path, lake['source'], cleaner.SCHEMAS['HealthAutoExport'])
+
+    assert process.run(spark, job_args(lake, '--MODE', 'all_new'))[-1] == (2025, 1, 6)
+    assert curated_partitions(lake, 'Workouts')[-1] == 'year=2025/month=1/day=5'
+    assert process.run(spark, job_args(lake, '--MODE', 'all_new')) == []
+
+
+def test_rollup_days_cover_the_affected_buckets():
+    days = process.rollup_days([(2025, 1, 1)])
+
+    # 2025-01-01 e uma quarta, a semana vai de 30/12 a 05/01
+    assert days['weekly'][0] == (2024, 12, 30) and days['weekly'][-1] == (2025, 1, 5)
+    assert len(days['monthly']) == 31
+    assert days['rolling'][0] == (2024, 12, 3) and days['rolling'][-1] == (2025, 1, 30)
+    assert days['rolling_output'][0] == (2025, 1, 1) and len(days['rolling_output']) == 30
+
+
+def test_incremental_rollups_match_a_full_run(spark, lake, tmp_path):
+    process.run(spark, job_args(lake, '--START_DATE', '2025-01-01', '--END_DATE', '2025-01-03', rollups='true'))
+    process.run(spark, job_args(lake, '--START_DATE', '2025-01-04', '--END_DATE', '2025-01-05', rollups='true'))
+
+    full = dict(lake, destination=str(tmp_path / 'curated-full'))
+    process.run(spark, job_args(full, '--START_DATE', '2025-01-01', '--END_DATE', '2025-01-05', rollups='true'))
+
+    for table in ['HealthWeekly', 'HealthMonthly', 'HealthRolling', 'WorkoutsWeekly', 'WorkoutsMonthly', 'WorkoutsRolling']:
+        incremental = pd.read_parquet(f"{lake['destination']}/{table}")
+        expected = pd.read_parquet(f"{full['destination']}/{table}")
+        columns = sorted(expected.columns)
+        pd.testing.assert_frame_equal(
+            incremental[columns].astype(str).sort_values(columns).reset_index(drop=True),
+            expected[columns].astype(str).sort_values(columns).reset_index(drop=True)
+        )
+
+    daily = pd.read_parquet(f"{lake['destination']}/HealthData")
+    weekly = pd.read_parquet(f"{lake['destination']}/HealthWeekly").sort_values('inicio')
+    rolling = pd.read_parquet(f"{lake['destination']}/HealthRolling").sort_values('dia')
+
+    # 01/01 a 05/01 caem nas semanas de 30/12 (01 a 05) e nao ha dados de outros dias
+    assert weekly['dias_com_dados'].tolist() == [5]
+    assert weekly['distancia_km'].iloc[0] == pytest.approx(daily['distancia_km'].sum(), abs=0.05)
+    assert len(rolling) == 5
+    first_day = daily[daily['day'].astype(int) == 1]['calorias_gastas'].sum()
+    assert rolling['calorias_gastas_media_7d'].iloc[0] == pytest.approx(first_day, abs=0.01)
+
+
+def test_light_engine_output_matches_spark(spark, lake, tmp_path):
+    import pyarrow.parquet as pq
+
+    import process_light
+
+    process.run(spark, job_args(lake, '--START_DATE', '2025-01-01', '--END_DATE', '2025-01-05', rollups='true'))
+    light_path = str(tmp_path / 'curated-light')
+    process_light.run(lake['source'], light_path, '2025-01-01', '2025-01-05')
+
+    for table in process.CURATED_TABLES:
+        spark_files = glob.glob(f"{lake['destination']}/{table}/**/*.parquet", recursive=True)
+        light_files = glob.glob(f"{light_path}/{table}/**/*.parquet", recursive=True)
+
+        # Mesmos tipos fisicos (INT96, DATE, INT64...) e mesma ordem de colunas
+        spark_schema = pq.ParquetFile(spark_files[0]).schema
+        light_schema = pq.ParquetFile(light_files[0]).schema
+        assert [(c.name, c.physical_type, str(c.logical_type)) for c in light_schema] == \
+            [(c.name, c.physical_type, str(c.logical_type)) for c in spark_schema], table
+
+        expected = pd.read_parquet(f"{lake['destination']}/{table}")
+        result = pd.read_parquet(f"{light_path}/{table}")
+        columns = list(expected.columns)
+        pd.testing.assert_frame_equal(
+            result[columns].astype(str).sort_values(columns).reset_index(drop=True),
+            expected[columns].astype(str).sort_values(columns).reset_index(drop=True),
+            obj=table
+        )
+
+
+def test_partition_index_matches_the_curated_data_in_both_engines(spark, lake, tmp_path):
+    import process_light
+    from datalake_common.partition_index import load_index
+
+    process.run(spark, job_args(lake, '--START_DATE', '2025-01-01', '--END_DATE', '2025-01-05'))
+    light_path = str(tmp_path / 'curated-light')
+    process_light.run(lake['source'], light_path, '2025-01-01', '2025-01-05', rollups=False)
+
+    health = pd.read_parquet(f"{lake['destination']}/HealthData")
+    index = load_index(lake['destination'], 'HealthData')
+
+    assert index.rows == len(health)
+    threshold = health['batimentos_max_bpm'].median()
+    above = health[health['batimentos_max_bpm'] > threshold]
+    assert index.days_with('batimentos_max_bpm', above=threshold) == sorted({(2025, 1, int(day)) for day in above['day']})
+
+    # A camada de consulta le os arquivos gravados pelo Spark
+    from datalake_common.curated_query import CuratedQuery
+    assert CuratedQuery(lake['destination']).query('HealthData').num_rows == len(health)
+
+    # Os dois engines gravam o mesmo indice
+    assert index.entries == load_index(light_path, 'HealthData').entries
+    assert load_index(lake['destination'], 'Workouts').entries == load_index(light_path, 'Workouts').entries
+
+    shutil.rmtree(f"{lake['destination']}/_index")
+    process.run(spark, job_args(lake, '--START_DATE', '2025-01-03', '--END_DATE', '2025-01-03', '--PARTITION_INDEX', 'false'))
+    assert not os.path.exists(f"{lake['destination']}/_index")
+
+
+def files_per_partition(lake, table):
+    base_path = f"{lake['destination']}/{table}"
+    return {
+        partition: len(glob.glob(f'{base_path}/{partition}/*.parquet')) for partition in curated_partitions(lake, table)
+    }
+
+
+def test_each_day_is_written_to_a_single_file(spark, lake):
+    # 1 KiB por particao: shuffle largo, com os dias espalhados em varias particoes
+    process.run(spark, job_args(lake, '--START_DATE', '2025-01-01', '--END_DATE', '2025-01-05',
+                                '--SHUFFLE_BYTES_PER_PARTITION', '1024', rollups='true'))
+
+    for table in process.CURATED_TABLES:
+        files = files_per_partition(lake, table)
+        assert files and set(files.values()) == {1}, table
+
+    partitions = int(spark.conf.get('spark.sql.shuffle.partitions'))
+    assert 1 < partitions <= process.MAX_SHUFFLE_PARTITIONS
+    assert spark.conf.get('spark.sql.adaptive.enabled') == 'true'
+    assert spark.conf.get('spark.sql.adaptive.coalescePartitions.enabled') == 'true'
+
+
+def test_repartition_keeps_one_file_per_day_without_adaptive_execution(spark, tmp_path):
+    # Sem o AQE (padrao do Spark 3.1 do glue 3.0) cada dia fica espalhado nas 8
+    # particoes do round robin, o repartition junta o dia em uma task
+    df = spark.createDataFrame(
+        [(float(value), 2025, 1, value % 3 + 1) for value in range(48)], 'valor double, year int, month int, day int'
+    ).repartition(8)
+
+    spark.conf.set('spark.sql.adaptive.enabled', 'false')
+    try:
+        process.write_partitions(df, str(tmp_path / 'table'))
+    finally:
+        spark.conf.unset('spark.sql.adaptive.enabled')
+
+    for day in (1, 2, 3):
+        assert len(glob.glob(str(tmp_path / f'table/year=2025/month=1/day={day}/*.parquet'))) == 1
+    assert len(pd.read_parquet(tmp_path / 'table')) == 48
+
+
+def test_only_days_with_data_count_as_written(spark, lake):
+    process.run(spark, job_args(lake, '--START_DATE', '2025-01-01', '--END_DATE', '2025-01-02'))
+
+    written = process.written_partitions(spark, f"{lake['destination']}/HealthData/",
+                                         process.date_range('2024-12-31', '2025-01-03'))
+    assert written == [(2025, 1, 1), (2025, 1, 2)]
+
+
+def test_days_above_the_target_file_size_are_split(spark, lake):
+    # Alvo de 2 linhas por arquivo: os 4 registros de cada dia viram 2 arquivos
+    target = 2 * process.ROW_BYTES_PER_COLUMN * len(process.CURATED_TABLES['HealthData'])
+
+    process.run(spark, job_args(lake, '--START_DATE', '2025-01-02', '--END_DATE', '2025-01-03',
+                                '--TARGET_FILE_BYTES', str(target)))
+
+    assert files_per_partition(lake, 'HealthData') == {'year=2025/month=1/day=2': 2, 'year=2025/month=1/day=3': 2}
+    assert len(pd.read_parquet(f"{lake['destination']}/HealthData")) == 2 * 4
+
+
+def test_shuffle_partitions_follow_the_input_size(spark, lake):
+    source = f"{lake['source']}/{process.HEALTH_AUTO_EXPORT.name}/"
+    files = glob.glob(f'{source}year=2025/month=1/day=[23]/*.parquet')
+
+    assert process.input_bytes(spark, source, [(2025, 1, 2), (2025, 1, 3), (2024, 12, 31)]) == \
+        sum(os.path.getsize(file) for file in files) > 0
+
+    assert process.shuffle_partitions(0) == 1
+    assert process.shuffle_partitions(100 * 1024 * 1024, 32 * 1024 * 1024) == 4
+    assert process.shuffle_partitions(1024 ** 4) == process.MAX_SHUFFLE_PARTITIONS
@@ -0,0 +1,92 @@
+import io
+
+import boto3
+import pyarrow.parquet as pq
+import pytest
+from moto import mock_aws
+
+import cleaner
+from datalake_common.transforms import CURATED_TABLES, PARTITION_COLS
+import generate_data
+import process_light
+
+CLEANED_BUCKET = 'health-datalake-test-cleaned'
+CURATED_BUCKET = 'health-datalake-test-curated'
+
+
+@pytest.fixture
+def s3(tmp_path):
+    with mock_aws():
+        client = boto3.client('s3')
+        for bucket in (CLEANED_BUCKET, CURATED_BUCKET):
+            client.create_bucket(Bucket=bucket)
+
+        for path, _ in generate_data.generate(str(tmp_path / 'raw'), days=3, health_rows_per_day=4):
+            cleaner.process_dataset(path, f's3://{CLEANED_BUCKET}', cleaner.SCHEMAS[cleaner.get_dataset(path)])
+        yield client
+
+
+def keys(s3, bucket, prefix):
+    return [item['Key'] for item in s3.list_objects_v2(Bucket=bucket, Prefix=prefix).get('Contents', [])]
+
+
+def test_plan_picks_the_engine_by_input_bytes(s3, monkeypatch):
+    monkeypatch.setattr(process_light, 'SOURCE_BUCKET', f's3://{CLEANED_BUCKET}')
+
+    plan = process_light.plan_handler({'start_date': '2025-01-01', 'end_date': '2025-01-02'}, None)
+    assert plan['engine'] == 'light'
+    assert plan['partitions'] == 2 and plan['input_bytes'] > 0
+
+    monkeypatch.setattr(process_light, 'LIGHT_ENGINE_MAX_BYTES', plan['input_bytes'] - 1)
+    assert process_light.plan_handler({'start_date': '2025-01-01', 'end_date': '2025-01-02'}, None)['engine'] == 'spark'
+
+
+def test_glue_workers_follow_input_bytes_within_bounds(monkeypatch):
+    monkeypatch.setattr(process_light, 'GLUE_BYTES_PER_WORKER', 100)
+    monkeypatch.setattr(process_light, 'GLUE_MIN_WORKERS', 2)
+    monkeypatch.setattr(process_light, 'GLUE_MAX_WORKERS', 8)
+
+    assert process_light.glue_workers(0) == 2
+    assert process_light.glue_workers(450) == 5
+    assert process_light.glue_workers(10 ** 6) == 8
+
+
+def test_light_engine_writes_curated_tables_on_s3(s3):
+    result = process_light.run(f's3://{CLEANED_BUCKET}', f's3://{CURATED_BUCKET}', '2025-01-02', '2025-01-03')
+
+    assert result == {'engine': 'light', 'partitions': 2, 'rows': 2 * 4 + 2 * 2}
+    assert len(keys(s3, CURATED_BUCKET, 'HealthData/')) == 2
+    assert keys(s3, CURATED_BUCKET, 'HealthWeekly/year=2024/month=12/day=30/')
+    assert len(keys(s3, CURATED_BUCKET, 'WorkoutsRolling/')) > 0
+
+    body = s3.get_object(Bucket=CURATED_BUCKET, Key=keys(s3, CURATED_BUCKET, 'HealthData/')[0])['Body'].read()
+    schema = pq.ParquetFile(io.BytesIO(body)).schema
+    assert schema.column(0).name == 'data' and schema.column(0).physical_type == 'INT96'
+
+    # Reprocessar o mesmo intervalo substitui as particoes
+    process_light.run(f's3://{CLEANED_BUCKET}', f's3://{CURATED_BUCKET}', '2025-01-02', '2025-01-03')
+    assert len(keys(s3, CURATED_BUCKET, 'HealthData/')) == 2
+    assert keys(s3, CURATED_BUCKET, '_index/') == ['_index/HealthData/2025-01.json', '_index/Workouts/2025-01.json']
+
+
+def test_light_engine_registers_the_written_partitions(s3):
+    glue = boto3.client('glue')
+    glue.create_database(DatabaseInput={'Name': 'heath_data'})
+    for table in CURATED_TABLES:
+        glue.create_table(DatabaseName='heath_data', TableInput={
+            'Name': table.lower(),
+            'PartitionKeys': [{'Name': name, 'Type': 'int'} for name in PARTITION_COLS],
+            'StorageDescriptor': {'Location': f's3://{CURATED_BUCKET}/{table}/'}
+        })
+
+    # O intervalo passa dos dias com dados: so as particoes gravadas sao registradas
+    process_light.run(f's3://{CLEANED_BUCKET}', f's3://{CURATED_BUCKET}', '2025-01-02', '2025-01-07',
+                      catalog_database='heath_data')
+
+    daily = glue.get_partitions(DatabaseName='heath_data', TableName='healthdata')['Partitions']
+    assert sorted(partition['Values'] for partition in daily) == [['2025', '1', '2'], ['2025', '1', '3']]
+
+    partitions = glue.get_partitions(DatabaseName='heath_data', TableName='healthweekly')['Partitions']
+    assert [partition['Values'] for partition in partitions] == [['2024', '12', '30']]
+    assert partitions[0]['StorageDescriptor']['Location'] == \
+        f's3://{CURATED_BUCKET}/HealthWeekly/year=2024/month=12/day=30/'
@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from datalake_common.quality import NotNull, Pattern, Range, split_quality
+from datalake_common.schemas import SCHEMAS
+
+
+def test_rules_are_evaluated_per_column_and_reasons_are_joined():
+    df = pd.DataFrame({
+        'start': pd.to_datetime(['2025-01-30 07:00', None, '2025-01-30 09:00', '2025-01-30 10:00']),
+        'duration': ['00:30:00', '00:10:00', 'abc', None],
+        'max_heart_rate_bpm': [150.0, 300.0, None, 10.0]
+    })
+    rules = [NotNull('start'), Pattern('duration', r'\d{1,3}:[0-5]\d:[0-5]\d'),
+             Range('max_heart_rate_bpm', min=25, max=250)]
+
+    valid, quarantine, counts = split_quality(df, rules)
+
+    assert list(valid.index) == [0]
+    assert list(quarantine['dq_reasons']) == [
+        'not_null:start;range:max_heart_rate_bpm', 'type:duration', 'range:max_heart_rate_bpm'
+    ]
+    assert counts == {'not_null:start': 1, 'type:duration': 1, 'range:max_heart_rate_bpm': 2}
+
+
+def test_clean_frame_passes_untouched():
+    df = pd.DataFrame({'distance_km': [1.0, None, 3.0]})
+
+    valid, quarantine, counts = split_quality(df, [Range('distance_km', min=0)])
+
+    assert valid is df
+    assert quarantine.empty
+    assert counts == {'range:distance_km': 0}
+
+
+@pytest.mark.parametrize('schema', SCHEMAS.values(), ids=list(SCHEMAS))
+def test_schema_rules_reference_schema_columns(schema):
+    assert schema.rules
+    for rule in schema.rules:
+        assert rule.column in schema.normalized_columns
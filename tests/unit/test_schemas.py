@@ -0,0 +1,39 @@
+import re
+
+import pytest
+
+from datalake_common.schemas import HEALTH_AUTO_EXPORT, SCHEMAS, WORKOUTS, get_schema
+
+
+def legacy_normalize(name):
+    # Normalizacao que o cleaner fazia com regex em cada arquivo
+    return re.sub(r'[^a-zA-Z0-9\s]', '', name).replace(' ', '_').lower()
+
+
+@pytest.mark.parametrize('schema', SCHEMAS.values(), ids=list(SCHEMAS))
+def test_normalized_names_match_legacy_cleaner_names(schema):
+    for column in schema.columns:
+        assert column.normalized == legacy_normalize(column.source)
+
+
+@pytest.mark.parametrize('schema', SCHEMAS.values(), ids=list(SCHEMAS))
+def test_curated_names_are_unique(schema):
+    curated = [column.curated for column in schema.columns]
+
+    assert len(curated) == len(set(curated))
+
+
+def test_registry_lookup():
+    assert get_schema('HealthAutoExport') is HEALTH_AUTO_EXPORT
+    assert get_schema('Workouts') is WORKOUTS
+    assert HEALTH_AUTO_EXPORT.column('dietary_energy_kj').factor == 0.239
+    assert WORKOUTS.curated_rename_map['workout_type'] == 'tipo_de_exercicio'
+
+
+def test_arrow_read_types_keep_dates_as_text():
+    pa = pytest.importorskip('pyarrow')
+
+    types = WORKOUTS.arrow_read_types()
+
+    assert types['Start'] == pa.string()
+    assert types['Step Count'] == pa.float64()
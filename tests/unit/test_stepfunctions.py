@@ -0,0 +1,197 @@
+import json
+
+import aws_cdk as core
+import aws_cdk.assertions as assertions
+from aws_cdk import aws_glue as _glue, aws_iam as _iam, aws_lambda as _lambda
+
+from health_data_lake.datalake.orchestration.stepfunctions import DatalakeProcessSTF
+
+
+def inline_function(stack, name):
+    return _lambda.Function(
+        stack, name,
+        runtime=_lambda.Runtime.PYTHON_3_9,
+        handler='index.handler',
+        code=_lambda.Code.from_inline('def handler(event, context):\n    return event\n')
+    )
+
+
+def state_machine_definition(light_engine=False, locks=False, glue_worker_type=None, **kwargs):
+    app = core.App()
+    stack = core.Stack(app, 'test-stack')
+
+    if locks:
+        kwargs.update(
+            claim_partitions_lambda=inline_function(stack, 'claim-partitions'),
+            release_partitions_lambda=inline_function(stack, 'release-partitions')
+        )
+
+    if light_engine:
+        kwargs.update(
+            plan_process_lambda=inline_function(stack, 'plan-process'),
+            process_light_lambda=inline_function(stack, 'process-light')
+        )
+
+    glue_job = _glue.CfnJob(
+        stack, 'process-job',
+        name='process-job',
+        role=_iam.Role(stack, 'glue-role', assumed_by=_iam.ServicePrincipal('glue.amazonaws.com')).role_arn,
+        command=_glue.CfnJob.JobCommandProperty(name='glueetl', script_location='s3://bucket/process.py'),
+        worker_type=glue_worker_type,
+        number_of_workers=10 if glue_worker_type else None
+    )
+
+    DatalakeProcessSTF(
+        stack, 'DatalakeProcessSTF',
+        cleaner_lambda=inline_function(stack, 'cleaner'),
+        process_glue_job=glue_job,
+        invoke_crawler_lambda=inline_function(stack, 'invoke-crawler'),
+        compactor_lambda=inline_function(stack, 'compactor'),
+        **kwargs
+    )
+
+    template = assertions.Template.from_stack(stack)
+    state_machine = next(iter(template.find_resources('AWS::StepFunctions::StateMachine').values()))
+    definition = state_machine['Properties']['DefinitionString']['Fn::Join'][1]
+
+    # Os ARNs viram tokens no template, so o texto da definicao interessa aqui
+    return json.loads(''.join(part if isinstance(part, str) else 'TOKEN' for part in definition))
+
+
+def test_compaction_step_is_optional():
+    assert 'Compact Partitions Task' not in state_machine_definition()['States']
+
+
+def test_compaction_step_runs_after_process_job():
+    states = state_machine_definition(enable_compaction=True)['States']
+
+    assert states['Process Data Task']['Next'] == 'Compact Partitions Task'
+    assert states['Compact Partitions Task']['Parameters']['Payload'] == {'results.$': '$.results'}
+
+    # Dentro das reservas do curated a compactacao usa o dono da execucao
+    states = state_machine_definition(enable_compaction=True, locks=True)['States']
+    compaction = states['Process Partitions']['Branches'][0]['States']['Compact Partitions Task']
+    assert compaction['Parameters']['Payload'] == {'results.$': '$.results', 'owner.$': '$$.Execution.Name'}
+
+
+def test_process_job_receives_the_cleaned_date_range():
+    states = state_machine_definition()['States']
+
+    assert states['Clear Data Task']['Next'] == 'New Partitions?'
+    assert states['New Partitions?']['Choices'][0]['Next'] == 'Process Data Task'
+    assert states['New Partitions?']['Default'] == 'No New Partitions'
+    assert states['Process Data Task']['Parameters']['Arguments'] == {
+        '--MODE': 'range', '--START_DATE.$': '$.start_date', '--END_DATE.$': '$.end_date'
+    }
+
+
+def test_crawler_only_runs_when_enabled():
+    states = state_machine_definition()['States']
+
+    assert states['Process Data Task']['Next'] == 'Succeeded'
+    assert not any('Crawler' in state for state in states)
+
+    # Sem polling: a execucao espera o task token devolvido pela regra de fim do crawler
+    states = state_machine_definition(run_crawler=True)['States']
+    assert states['Process Data Task']['Next'] == 'Run Crawler Catalog Task'
+    crawler_task = states['Run Crawler Catalog Task']
+    assert crawler_task['Resource'].endswith(':states:::lambda:invoke.waitForTaskToken')
+    assert crawler_task['Parameters']['Payload'] == {'task_token.$': '$$.Task.Token', 'execution.$': '$$.Execution.Name'}
+    assert crawler_task['TimeoutSeconds'] == 600
+    assert crawler_task['Next'] == 'Succeeded'
+    assert not any(state['Type'] == 'Wait' for state in states.values())
+
+
+def test_light_engine_is_chosen_by_the_plan_step():
+    states = state_machine_definition(light_engine=True, enable_compaction=True)['States']
+
+    assert states['New Partitions?']['Choices'][0]['Next'] == 'Plan Process Task'
+    assert states['Plan Process Task']['Next'] == 'Process Engine?'
+    assert states['Process Engine?']['Choices'][0] == {
+        'Variable': '$.plan.engine', 'StringEquals': 'light', 'Next': 'Process Light Task'
+    }
+    assert states['Process Engine?']['Default'] == 'Process Data Task'
+    assert states['Process Light Task']['Next'] == states['Process Data Task']['Next'] == 'Compact Partitions Task'
+
+
+def test_object_lists_are_cleaned_in_parallel_batches():
+    definition = state_machine_definition(clean_batch_size=5, max_concurrency=2, max_objects=100)
+    states = definition['States']
+
+    assert definition['StartAt'] == 'Objects Batch?'
+    assert states['Objects Batch?']['Choices'][0]['Next'] == 'Split Objects Batches'
+    assert states['Objects Batch?']['Default'] == 'Clear Data Task'
+    assert states['Split Objects Batches']['Parameters'] == {'batches.$': 'States.ArrayPartition($.objects, 5)'}
+
+    clean_map = states['Clear Data Batches Map']
+    assert clean_map['ItemsPath'] == '$.batches'
+    assert clean_map['ItemSelector'] == {'objects.$': '$$.Map.Item.Value', 'batch': True}
+    assert clean_map['MaxConcurrency'] == 2
+    assert clean_map['ResultSelector'] == {'results.$': '$[*].results[*]'}
+    assert clean_map['Next'] == 'Summarize Clear Data Task'
+
+    # O process roda uma vez sobre o resultado de todos os lotes
+    assert states['Summarize Clear Data Task']['Parameters']['Payload'] == {'results.$': '$.results'}
+    assert states['Summarize Clear Data Task']['Next'] == 'New Partitions?'
+
+
+def test_cleaner_tasks_retry_busy_partitions():
+    states = state_machine_definition()['States']
+    batch_task = states['Clear Data Batches Map']['ItemProcessor']['States']['Clear Data Batch Task']
+
+    for task in (states['Clear Data Task'], batch_task):
+        assert {'ErrorEquals': ['PartitionBusy'], 'IntervalSeconds': 30, 'MaxAttempts': 6, 'BackoffRate': 2} \
+            in task['Retry']
+
+
+def test_execution_timeout_is_sized_to_the_batch():
+    # 100 objetos em lotes de 5 com 2 em paralelo: 10 ondas da lambda (3 s) + 15 min do process
+    # + 6 retries do PartitionBusy (30 s com backoff 2, mais a lambda de novo em cada um)
+    busy_retries = 30 * (1 + 2 + 4 + 8 + 16 + 32) + 6 * 3
+    definition = state_machine_definition(clean_batch_size=5, max_concurrency=2, max_objects=100)
+    assert definition['TimeoutSeconds'] == 10 * 3 + 15 * 60 + busy_retries
+
+    definition = state_machine_definition(clean_batch_size=5, max_concurrency=2, max_objects=100, run_crawler=True)
+    assert definition['TimeoutSeconds'] == 10 * 3 + 15 * 60 + 10 * 60 + busy_retries
+
+
+def test_process_waits_for_partition_claims_and_always_releases():
+    definition = state_machine_definition(locks=True)
+    states = definition['States']
+
+    assert states['New Partitions?']['Choices'][0]['Next'] == 'Claim Partitions Task'
+    claim = states['Claim Partitions Task']
+    assert claim['Parameters']['Payload']['owner.$'] == '$$.Execution.Name'
+    assert claim['Parameters']['Payload']['ttl_seconds'] == definition['TimeoutSeconds']
+    assert claim['Parameters']['Payload']['waiter_ttl_seconds'] == 3 * states['Wait For Partitions']['Seconds']
+    assert claim['Next'] == 'Partitions Claimed?'
+
+    choice = states['Partitions Claimed?']
+    assert choice['Choices'][0] == {'Variable': '$.locks.waiting[0]', 'IsPresent': True, 'Next': 'Wait For Partitions'}
+    assert states['Wait For Partitions']['Next'] == 'Claim Partitions Task'
+    assert choice['Default'] == 'Process Partitions'
+
+    process = states['Process Partitions']
+    assert 'Process Data Task' in process['Branches'][0]['States']
+    assert process['Next'] == 'Release Partitions Task'
+    assert process['Catch'][0]['Next'] == 'Release Partitions On Error Task'
+    assert states['Release Partitions On Error Task']['Next'] == 'Process Failed'
+    assert states['Release Partitions Task']['Next'] == 'Succeeded'
+
+
+def test_process_job_retries_when_concurrent_runs_are_exceeded():
+    retry = state_machine_definition()['States']['Process Data Task']['Retry']
+
+    assert retry[0]['ErrorEquals'] == ['Glue.ConcurrentRunsExceededException']
+
+
+def test_glue_runs_are_sized_by_the_plan_step():
+    states = state_machine_definition(light_engine=True, glue_worker_type='G.1X')['States']
+
+    assert states['Plan Process Task']['ResultSelector']['workers.$'] == '$.Payload.workers'
+    assert states['Process Data Task']['Parameters']['WorkerType'] == 'G.1X'
+    assert states['Process Data Task']['Parameters']['NumberOfWorkers.$'] == '$.plan.workers'
+
+    # Sem o plan o job roda com a capacidade definida nele
+    states = state_machine_definition(glue_worker_type='G.1X')['States']
+    assert 'NumberOfWorkers.$' not in states['Process Data Task']['Parameters']